@@ -0,0 +1,126 @@
+"""
+Persistent registry of bad channels.
+
+Every channel that fails (error or timeout without any video) is recorded with
+its failure count, first and last failure time and last error. A channel that
+failed failure_threshold times in a row is backed off exponentially, base_delay
+at first and twice as long after each further failure, capped at max_delay, so
+dead channels stop costing timeouts on every run but are still retried
+periodically, while a single transient error doesn't hide a channel. A
+successful crawl removes the entry. `vidcrawler bad-channels list|reset` inspects and clears it.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
+
+from .cache_dir import cache_path
+
+DB_BAD_CHANNELS = cache_path("bad_channels.db")
+# Consecutive failures before a channel is backed off.
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_BASE_DELAY = 60 * 60
+DEFAULT_MAX_DELAY = 7 * 24 * 60 * 60
+
+
+class BadChannelRegistry:
+    """Sqlite backed (source, channel_id) -> failure record."""
+
+    def __init__(self, path: str = DB_BAD_CHANNELS, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD) -> None:
+        assert 0 < base_delay <= max_delay and failure_threshold > 0
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = KeyValueDB(path, "bad_channels")
+
+    def backoff(self, failures: int) -> float:
+        """Seconds a channel with this many consecutive failures is skipped."""
+        if failures < self.failure_threshold:
+            return 0.0
+        return min(self.max_delay, self.base_delay * 2 ** min(failures - self.failure_threshold, 32))
+
+    def record_failure(self, channel_name: str, source: str, channel_id: str, error: str, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        key = f"{source}|{channel_id}"
+        with self._lock:
+            entry = self._db.get(key) or {"channel_name": channel_name, "source": source, "channel_id": channel_id, "failures": 0, "first_failure": now}
+            entry["channel_name"] = channel_name
+            entry["failures"] += 1
+            entry["last_failure"] = now
+            entry["last_error"] = error
+            entry["retry_after"] = now + self.backoff(entry["failures"])
+            self._db.set(key, entry)
+        return entry
+
+    def record_success(self, source: str, channel_id: str) -> None:
+        key = f"{source}|{channel_id}"
+        with self._lock:
+            if self._db.has_key(key):
+                self._db.remove(key)
+
+    def get(self, source: str, channel_id: str) -> Optional[Dict[str, Any]]:
+        return self._db.get(f"{source}|{channel_id}")
+
+    def split(self, channels: List[Tuple[str, str, str]], now: Optional[float] = None) -> Tuple[List[Tuple[str, str, str]], List[Tuple[Tuple[str, str, str], Dict[str, Any]]]]:
+        """Splits (channel_name, source, channel_id) entries into (due, [(backed off channel, its entry)])."""
+        now = now or time.time()
+        entries = self._db.get_many({f"{source}|{channel_id}" for _, source, channel_id in channels}) if channels else {}
+        due: List[Tuple[str, str, str]] = []
+        backed_off: List[Tuple[Tuple[str, str, str], Dict[str, Any]]] = []
+        for channel in channels:
+            entry = entries.get(f"{channel[1]}|{channel[2]}")
+            if entry is not None and now < entry["retry_after"]:
+                backed_off.append((channel, entry))
+            else:
+                due.append(channel)
+        return due, backed_off
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return sorted(self._db.to_dict().values(), key=lambda entry: (entry["source"], entry["channel_name"]))
+
+    def reset(self, source: Optional[str] = None, channel: Optional[str] = None) -> int:
+        """Removes the entries matching source and channel (name or id), all of them without filters."""
+        removed = 0
+        with self._lock:
+            for key, entry in self._db.to_dict().items():
+                if source is not None and entry["source"] != source:
+                    continue
+                if channel is not None and channel not in (entry["channel_name"], entry["channel_id"]):
+                    continue
+                self._db.remove(key)
+                removed += 1
+        return removed
+
+
+_REGISTRY_LOCK = threading.Lock()
+_REGISTRY: Optional[BadChannelRegistry] = None
+
+
+def enable_bad_channel_registry(
+    path: str = DB_BAD_CHANNELS,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+) -> BadChannelRegistry:
+    global _REGISTRY  # pylint: disable=global-statement
+    with _REGISTRY_LOCK:
+        _REGISTRY = BadChannelRegistry(path, base_delay=base_delay, max_delay=max_delay, failure_threshold=failure_threshold)
+        return _REGISTRY
+
+
+def disable_bad_channel_registry() -> None:
+    global _REGISTRY  # pylint: disable=global-statement
+    with _REGISTRY_LOCK:
+        _REGISTRY = None
+
+
+def get_bad_channel_registry() -> Optional[BadChannelRegistry]:
+    return _REGISTRY
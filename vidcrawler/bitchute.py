@@ -8,19 +8,26 @@ Scraper for bitchute
 import html
 import re
 import sys
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-import feedparser  # type: ignore
-from bs4 import BeautifulSoup  # type: ignore
+from bs4 import BeautifulSoup, SoupStrainer  # type: ignore
 
+from .conditional_get import fetch_if_modified, store_if_modified
 from .date import iso_fmt, now_local
 from .error import log_error
+from .feed_reader import RSS, parse_feed
 
 # bitchute is bombing out on CURL so switch to the request-lib get version.
 from .fetch_html import fetch_html_using_request_lib
+from .html_parser import make_soup
+from .parse_cache import cached_parse
+from .parse_pool import run_parse
 from .video_info import VideoInfo
 
 _EMBED_BITCHUTE_PATT = r"/video/(.+)/"
+# Only the video tiles and the channel details (rss url) of a channel page are built.
+CHANNEL_PAGE_STRAINER = SoupStrainer(class_=["channel-videos-container", "details"])
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
 
 
@@ -29,7 +36,10 @@ def fetch_html(url: str) -> str:
 
 
 def parse_rss_url(html_doc: str) -> Optional[str]:
-    top_dom = BeautifulSoup(html_doc, "html.parser")
+    return _parse_rss_url(make_soup(html_doc, parse_only=SoupStrainer("div", class_="details")))
+
+
+def _parse_rss_url(top_dom: BeautifulSoup) -> Optional[str]:
     details_dom = top_dom.find("div", class_="details")
     if not details_dom:
         return None
@@ -48,8 +58,10 @@ def fetch_rss_url(channel_name: str, channel_id: str) -> Optional[str]:  # pylin
     return parse_rss_url(html_doc)
 
 
-def parse_rss_feed(content: str) -> List[dict]:
-    feed = feedparser.parse(content)
+@cached_parse(version=1)
+def parse_rss_feed(content: str, after: Optional[datetime] = None) -> List[dict]:
+    """Parses the videos of a channel feed published since after, runs in the parse pool."""
+    feed = parse_feed(content, RSS, after=after)
     channel_url = feed["feed"]["link"]
     # from pprint import pprint
     output: List[dict] = []
@@ -84,39 +96,56 @@ def parse_rss_feed(content: str) -> List[dict]:
 # type: ignore
 
 
+@cached_parse(version=1)
+def parse_channel_page(html_doc: str) -> Tuple[Optional[str], List[dict]]:
+    """Parses the rss url and the listed videos of a channel page in one pass, runs in the parse pool."""
+    soup = make_soup(html_doc, parse_only=CHANNEL_PAGE_STRAINER)
+    videos: List[dict] = []
+    for vd in soup.find_all(class_="channel-videos-container"):
+        title_dom = vd.find(class_="channel-videos-title")
+        spa_dom = title_dom.find(class_="spa")
+        video_src = spa_dom["href"]
+        vid_id = re.findall(_EMBED_BITCHUTE_PATT, video_src)[0]
+        # poster_dom = plyr__poster
+        poster_dom = vd.find(class_="channel-videos-image")
+        videos.append(
+            dict(  # pylint: disable=R1735
+                title=spa_dom.text,
+                views=vd.find(class_="video-views").text.strip(),
+                iframe_src="https://www.bitchute.com/embed/%s" % vid_id,
+                url="https://www.bitchute.com/video/%s" % vid_id,
+                duration=vd.find(class_="video-duration").text,
+                img_src=poster_dom.find("img")["data-src"],
+            )
+        )
+    return _parse_rss_url(soup), videos
+
+
 def fetch_bitchute_today(channel_name: str, channel_id: str) -> List[VideoInfo]:
     output: List[VideoInfo] = []
     channel_url = "https://www.bitchute.com/channel/%s/" % channel_id
     sys.stdout.write("Bitchute visiting %s (%s)\n" % (channel_name, channel_url))
     html_doc = fetch_html(channel_url)
-    rss_url = parse_rss_url(html_doc)
+    rss_url, videos = run_parse(parse_channel_page, html_doc)
     date_published_map = {}
     if rss_url is None:
         sys.stderr.write("---- ERROR ---- Failed to parse rss_channel for %s\n" % channel_url)
     else:
-        rss_content = fetch_html(rss_url)
         # These objects contain the video publishing date.
-        rss_objects: List[dict] = parse_rss_feed(rss_content)
+        rss_objects: List[dict]
+        conditional = fetch_if_modified(rss_url, user_agent=USER_AGENT, raise_for_status=True)
+        if conditional.cached is not None:  # Not modified.
+            rss_objects = conditional.cached
+        else:
+            rss_objects = run_parse(parse_rss_feed, conditional.result.html, conditional.window_start)
+            store_if_modified(rss_url, conditional, rss_objects)
         rss_obj: dict
         for rss_obj in rss_objects:
             key = rss_obj["url"]
             date_published_map[key] = iso_fmt(rss_obj["date_published"])
-    soup = BeautifulSoup(html_doc, "html.parser")
-    vid_divs = soup.find_all(class_="channel-videos-container")
     skipped_vid_urls: List[str] = []
-    for vd in vid_divs:
-        title_dom = vd.find(class_="channel-videos-title")
-        spa_dom = title_dom.find(class_="spa")
-        title_text = spa_dom.text
-        views_text = vd.find(class_="video-views").text.strip()
-        video_src = spa_dom["href"]
-        vid_id = re.findall(_EMBED_BITCHUTE_PATT, video_src)[0]
-        iframe_src = "https://www.bitchute.com/embed/%s" % vid_id
-        url = "https://www.bitchute.com/video/%s" % vid_id
-        duration = vd.find(class_="video-duration").text  # type: ignore
-        # poster_dom = plyr__poster
-        poster_dom = vd.find(class_="channel-videos-image")
-        img_src = poster_dom.find("img")["data-src"]
+    for video in videos:
+        url = video["url"]
         now_datestr = now_local().isoformat()
         date_published = date_published_map.get(url)
         if date_published is None:
@@ -130,12 +159,12 @@ def fetch_bitchute_today(channel_name: str, channel_id: str) -> List[VideoInfo]:
             date_lastupdated=now_datestr,
             url=url,
             channel_url=channel_url,
-            title=title_text,
-            duration=duration,
+            title=video["title"],
+            duration=video["duration"],
             description="TODO",
-            img_src=img_src,
-            iframe_src=iframe_src,
-            views=views_text,
+            img_src=video["img_src"],
+            iframe_src=video["iframe_src"],
+            views=video["views"],
             profile_img_src="",
         )
         output.append(o)
@@ -12,18 +12,27 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import partial
 from typing import List
 
-import requests
 from bs4 import BeautifulSoup  # type: ignore
-from feedparser import FeedParserDict, parse
+from feedparser import FeedParserDict
 from PIL import Image  # type: ignore
 
+from .conditional_get import fetch_if_modified, store_if_modified
+from .crawl_state import channel_state
 from .date import iso_fmt, now_local
-
-# from .fetch_html import fetch_html_using_request_lib as fetch_html
+from .deadline import bind_deadline
+from .feed_reader import RSS, iter_feed_entries
+from .fetch_html import RegexFieldMatcher, fetch_html_streaming, http_get
+from .html_parser import make_soup
 from .video_info import VideoInfo
 
 # https://www.brighteon.com/api-v3/channels/hrreport/rss/rss.xml
 
+# pattern is like "3798 views"
+_PATTERN_VIEWS = re.compile(r"(\d+) views")
+# "duration":"22:27"
+# also "duration":"02:34:18"
+_PATTERN_DURATION = re.compile(r'"duration":"(\d+:\d+:\d+|\d+:\d+)"')
+
 
 def get_rss_url(channel: str) -> str:
     return f"https://www.brighteon.com/api-v3/channels/{channel}/rss/rss.xml"
@@ -43,7 +52,7 @@ def parse_entry(url: str, channel_name: str, entry: FeedParserDict) -> VideoInfo
     video_url = entry.link
     title = entry.title
     summary_html = entry.summary
-    summary_soup = BeautifulSoup(summary_html, "html.parser")
+    summary_soup = make_soup(summary_html)
     image_src = parse_thumbnail_url(summary_soup)
     # print(summary_html)
     # image_src = entry.media_thumbnail[0]["url"]
@@ -73,9 +82,9 @@ def fetch_image_size(vid: VideoInfo) -> None:
     """fetches the height and width by downloading the image"""
     try:
         url: str = vid.img_src
-        response = requests.get(url, stream=True, timeout=10)
-        response.raw.decode_content = True
-        img = Image.open(response.raw)
+        with http_get(url, timeout=10, stream=True) as response:
+            response.raw.decode_content = True
+            img = Image.open(response.raw)
         vid.img_width = img.width
         vid.img_height = img.height
         vid.img_status = 200
@@ -84,28 +93,11 @@ def fetch_image_size(vid: VideoInfo) -> None:
 
 
 def fetch_views_and_duration(vid: VideoInfo) -> None:
-    url = vid.url
-    response = requests.get(url, timeout=10)
-    text = response.text
-    # pattern is like "3798 views"
-
-    pattern = re.compile(r"(\d+) views")
-    match = pattern.search(text)
-    if match:
-        out = str(match.group(1))
-        vid.views = out
-    else:
-        vid.views = "?"
-
-    # "duration":"22:27"
-    # also "duration":"02:34:18"
-    pattern = re.compile(r'"duration":"(\d+:\d+:\d+|\d+:\d+)"')
-    match = pattern.search(text)
-    if match:
-        out = str(match.group(1))
-        vid.duration = out
-    else:
-        vid.duration = "?"
+    # Stop reading the page as soon as both fields have been seen.
+    matcher = RegexFieldMatcher({"views": _PATTERN_VIEWS, "duration": _PATTERN_DURATION})
+    fetch_html_streaming(vid.url, matcher, timeout=10, user_agent=None)
+    vid.views = matcher.fields.get("views", "?")
+    vid.duration = matcher.fields.get("duration", "?")
 
 
 def fetch_brighteon_today(channel_name: str, channel: str) -> List[VideoInfo]:
@@ -113,26 +105,47 @@ def fetch_brighteon_today(channel_name: str, channel: str) -> List[VideoInfo]:
     output: List[VideoInfo] = []
     url = get_rss_url(channel)
     sys.stdout.write("Brighteon visiting %s (%s)\n" % (channel, url))
-    feed = parse(url)
-    entry: FeedParserDict
-    for entry in feed.entries:
-        try:
-            vid = parse_entry(url, channel_name, entry)
-            output.append(vid)
-        except Exception as verr:  # pylint: disable=broad-except
-            sys.stderr.write(f"Error parsing entry: {verr} during {entry}\n")
-
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        fetch_size = partial(fetch_image_size)
-        futures = [executor.submit(fetch_size, vid) for vid in output]
-        for future in as_completed(futures):
-            future.result()  # This will raise any exceptions that occurred during execution
-
-    # now bulk fetch the views
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        fetch_views_partial = partial(fetch_views_and_duration)
-        futures = [executor.submit(fetch_views_partial, vid) for vid in output]
-        for future in as_completed(futures):
-            future.result()  # This will raise any exceptions that occurred during execution
+    cache_key = f"{channel_name}|{url}"
+    conditional = fetch_if_modified(url, key=cache_key, user_agent=None, raise_for_status=True)
+    if conditional.cached is not None:  # Not modified.
+        output = VideoInfo.from_list_of_dicts(conditional.cached)
+    else:
+        entry: FeedParserDict
+        for entry in iter_feed_entries(conditional.result.html, RSS, after=conditional.window_start):
+            try:
+                vid = parse_entry(url, channel_name, entry)
+                output.append(vid)
+            except Exception as verr:  # pylint: disable=broad-except
+                sys.stderr.write(f"Error parsing entry: {verr} during {entry}\n")
+        store_if_modified(cache_key, conditional, VideoInfo.to_plain_list(output))
+
+    with channel_state("brighteon", channel) as state:
+        # Known videos reuse their image size, views and duration, only new ones are looked up.
+        unresolved: List[VideoInfo] = []
+        for vid in output:
+            known = state.lookup(vid.url)
+            if known is None:
+                unresolved.append(vid)
+                continue
+            vid.img_status, vid.img_width, vid.img_height = known.img_status, known.img_width, known.img_height
+            vid.views, vid.duration = known.views, known.duration
+            vid.date_discovered = known.date_discovered
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            fetch_size = bind_deadline(partial(fetch_image_size))
+            futures = [executor.submit(fetch_size, vid) for vid in unresolved]
+            for future in as_completed(futures):
+                future.result()  # This will raise any exceptions that occurred during execution
+
+        # now bulk fetch the views
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            fetch_views_partial = bind_deadline(partial(fetch_views_and_duration))
+            futures = [executor.submit(fetch_views_partial, vid) for vid in unresolved]
+            for future in as_completed(futures):
+                future.result()  # This will raise any exceptions that occurred during execution
+
+        for vid in unresolved:
+            if vid.img_status == 200:  # Failed lookups are retried on the next run.
+                state.store(vid.url, vid)
 
     return output
@@ -0,0 +1,28 @@
+"""
+Where the crawler keeps the databases that persist between runs.
+
+They live in the user's cache directory rather than in the installed package,
+which may be read only and is shared by every user of the environment.
+$VIDCRAWLER_CACHE_DIR, read at import time, moves them elsewhere.
+"""
+
+# pylint: disable=line-too-long
+
+import os
+
+from appdirs import user_cache_dir as _platform_cache_dir
+
+ENV_CACHE_DIR = "VIDCRAWLER_CACHE_DIR"
+
+
+def user_cache_dir() -> str:
+    """$VIDCRAWLER_CACHE_DIR, otherwise the platform's per user cache directory."""
+    configured = os.environ.get(ENV_CACHE_DIR)
+    if configured:
+        return os.path.abspath(os.path.expanduser(configured))
+    return _platform_cache_dir("vidcrawler")
+
+
+def cache_path(filename: str) -> str:
+    """Default path of a database, the directory is created by whoever opens it."""
+    return os.path.join(user_cache_dir(), filename)
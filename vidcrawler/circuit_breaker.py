@@ -0,0 +1,161 @@
+"""
+Circuit breakers per source and per host.
+
+A breaker opens after failure_threshold consecutive failures. While it is open
+the work behind it is skipped right away instead of timing out one item at a
+time: the spider skips the remaining channels of a source and reuses their last
+good results, http_get fails fast for a host. Once the cooldown has passed one
+half-open probe is let through, its success closes the breaker and its failure
+opens it for another cooldown. Source breakers are persisted so that a site that
+was down stays skipped on the next runs until a probe finds it back up, the last
+good results come from the last results store. Host breakers only live in memory.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
+
+from .cache_dir import cache_path
+
+DB_CIRCUIT_BREAKER = cache_path("circuit_breaker.db")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_SOURCE_THRESHOLD = 5
+DEFAULT_SOURCE_COOLDOWN = 30 * 60
+DEFAULT_HOST_THRESHOLD = 5
+DEFAULT_HOST_COOLDOWN = 60
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of contacting a host whose breaker is open."""
+
+
+@dataclass
+class CircuitBreaker:
+    failure_threshold: int
+    cooldown: float
+    state: str = CLOSED
+    failures: int = 0
+    opened_at: float = 0.0
+    probe_started: float = 0.0
+
+    def allow(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        # A probe that never reported back (crashed run) is replaced after a cooldown.
+        since = self.opened_at if self.state == OPEN else self.probe_started
+        if now - since < self.cooldown:
+            return False
+        self.state = HALF_OPEN
+        self.probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+
+
+class BreakerBoard:
+    """Thread safe key -> CircuitBreaker map, persisted in sqlite when a path is given."""
+
+    def __init__(self, failure_threshold: int, cooldown: float, path: Optional[str] = None) -> None:
+        assert failure_threshold > 0
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.path = path
+        self.lock = threading.Lock()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.skipped: Dict[str, int] = {}
+        self._db: Optional[KeyValueDB] = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = KeyValueDB(path, "circuit_breaker")
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        # Called with self.lock held.
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            stored = self._db.get(f"breaker|{key}") if self._db is not None else None
+            breaker = CircuitBreaker(self.failure_threshold, self.cooldown)
+            if stored:
+                breaker.state, breaker.failures = stored["state"], stored["failures"]
+                breaker.opened_at, breaker.probe_started = stored["opened_at"], stored["probe_started"]
+            self.breakers[key] = breaker
+        return breaker
+
+    def _update(self, key: str, change: Any) -> None:
+        with self.lock:
+            breaker = self._breaker(key)
+            before = asdict(breaker)
+            change(breaker)
+            if self._db is not None and asdict(breaker) != before:
+                self._db.set(f"breaker|{key}", asdict(breaker))
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        """True if the work behind key may run, counts a skip otherwise."""
+        allowed = [True]
+
+        def change(breaker: CircuitBreaker) -> None:
+            allowed[0] = breaker.allow(now or time.time())
+            if not allowed[0]:
+                self.skipped[key] = self.skipped.get(key, 0) + 1
+
+        self._update(key, change)
+        return allowed[0]
+
+    def record_success(self, key: str) -> None:
+        self._update(key, lambda breaker: breaker.record_success())
+
+    def record_failure(self, key: str, now: Optional[float] = None) -> None:
+        self._update(key, lambda breaker: breaker.record_failure(now or time.time()))
+
+    def state(self, key: str) -> str:
+        with self.lock:
+            return self._breaker(key).state
+
+    def take_skipped(self) -> Dict[str, int]:
+        """Skips per key since the last call."""
+        with self.lock:
+            skipped, self.skipped = self.skipped, {}
+            return skipped
+
+
+_BOARDS_LOCK = threading.Lock()
+_SOURCE_BREAKERS: Optional[BreakerBoard] = None
+_HOST_BREAKERS = BreakerBoard(DEFAULT_HOST_THRESHOLD, DEFAULT_HOST_COOLDOWN)
+
+
+def enable_source_breakers(path: str = DB_CIRCUIT_BREAKER, failure_threshold: int = DEFAULT_SOURCE_THRESHOLD, cooldown: float = DEFAULT_SOURCE_COOLDOWN) -> BreakerBoard:
+    global _SOURCE_BREAKERS  # pylint: disable=global-statement
+    with _BOARDS_LOCK:
+        _SOURCE_BREAKERS = BreakerBoard(failure_threshold, cooldown, path=path)
+        return _SOURCE_BREAKERS
+
+
+def disable_source_breakers() -> None:
+    global _SOURCE_BREAKERS  # pylint: disable=global-statement
+    with _BOARDS_LOCK:
+        _SOURCE_BREAKERS = None
+
+
+def get_source_breakers() -> Optional[BreakerBoard]:
+    return _SOURCE_BREAKERS
+
+
+def get_host_breakers() -> BreakerBoard:
+    return _HOST_BREAKERS
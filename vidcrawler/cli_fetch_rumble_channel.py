@@ -9,6 +9,7 @@ from datetime import datetime
 from pathlib import Path
 
 from vidcrawler.date import parse_datetime
+from vidcrawler.response_cache import ENV_HTTP_CACHE, enable_response_cache
 from vidcrawler.rumble import PartialVideo, fetch_rumble_channel_all_partial_result
 
 
@@ -20,7 +21,10 @@ def main() -> int:
     parser.add_argument("--after-date", help="Fetch videos after this date.", default=None)
     # add --output-json
     parser.add_argument("--output-json", help="Output to this file.", default=None)
+    parser.add_argument("--http-cache", help=f"Path of the on-disk response cache, also read from ${ENV_HTTP_CACHE}.", default=None)
     args = parser.parse_args()
+    if args.http_cache:
+        enable_response_cache(args.http_cache)
     after_date: datetime | None = None
     if args.after_date:
         after_date = parse_datetime(args.after_date)
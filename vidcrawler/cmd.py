@@ -7,39 +7,298 @@ Command entry point.
 import argparse
 import json
 import os
+import sys
 import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from vidcrawler.spider import CRAWLER_MAP, crawl_video_sites
+from vidcrawler.bad_channels import (
+    DB_BAD_CHANNELS,
+    DEFAULT_BASE_DELAY,
+    DEFAULT_FAILURE_THRESHOLD,
+    DEFAULT_MAX_DELAY,
+    BadChannelRegistry,
+    enable_bad_channel_registry,
+)
+from vidcrawler.circuit_breaker import (
+    DB_CIRCUIT_BREAKER,
+    DEFAULT_SOURCE_COOLDOWN,
+    DEFAULT_SOURCE_THRESHOLD,
+    enable_source_breakers,
+)
+from vidcrawler.crawl_state import (
+    DB_CRAWL_STATE,
+    DEFAULT_REFRESH_FRACTION,
+    enable_crawl_state,
+    get_crawl_state,
+)
+from vidcrawler.daemon import DEFAULT_INTERVAL, CrawlDaemon
+from vidcrawler.feed_reader import enable_crawl_window
+from vidcrawler.fetch_html import fetch_coalescing_stats
+from vidcrawler.html_parser import ENV_HTML_PARSER, HTML_PARSERS, set_html_parser
+from vidcrawler.http_stats import get_http_stats
+from vidcrawler.io import write_utf8_atomic
+from vidcrawler.job_queue import (
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_LEASE,
+    coordinate,
+    run_worker,
+)
+from vidcrawler.last_results import DB_LAST_RESULTS, enable_last_results
+from vidcrawler.parse_cache import DB_PARSE_CACHE
+from vidcrawler.parse_cache import DEFAULT_MAX_BYTES as PARSE_CACHE_MAX_BYTES
+from vidcrawler.parse_cache import enable_parse_cache, get_parse_cache
+from vidcrawler.poll_schedule import (
+    DB_POLL_SCHEDULE,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    PollSchedule,
+)
+from vidcrawler.progress import DEFAULT_STATUS_INTERVAL, StatusPublisher
+from vidcrawler.response_cache import (
+    DEFAULT_MAX_BYTES,
+    ENV_HTTP_CACHE,
+    enable_response_cache,
+    get_response_cache,
+)
+from vidcrawler.spider import (
+    DEFAULT_CHANNEL_TIMEOUT,
+    DEFAULT_MAX_PER_HOST,
+    DEFAULT_MAX_PER_SOURCE,
+    DEFAULT_MAX_WORKERS,
+    crawl_video_sites,
+    load_crawl_channels,
+    stream_video_sites,
+)
+from vidcrawler.ytdlp import DEFAULT_MAX_PROCESSES_PER_HOST, set_max_processes_per_host
 
-CRAWLERS = CRAWLER_MAP.keys()
+
+def _report_crawl(output_path: str, prometheus_textfile: str) -> None:
+    """Writes the http timings next to the output and prints the crawl statistics."""
+    http_stats = get_http_stats()
+    http_stats_json = os.path.splitext(output_path)[0] + ".http_stats.json"
+    http_stats.write_summary_json(http_stats_json)
+    print(f"Http timings written to {http_stats_json}")
+    if prometheus_textfile:
+        http_stats.write_prometheus_textfile(prometheus_textfile)
+    hosts = http_stats.summary()["hosts"]
+    for host, stats in sorted(hosts.items(), key=lambda item: -item[1]["phases"]["total"]["sum"])[:10]:
+        total = stats["phases"]["total"]
+        print(f"  {host}: {stats['requests']} requests, {total['sum']:.1f}s total, p50 {total['p50']:.3f}s, p90 {total['p90']:.3f}s")
+    coalescing = fetch_coalescing_stats()
+    print(f"Fetches: {coalescing['calls']}, served by an identical in-flight fetch: {coalescing['coalesced']}")
+    crawl_state = get_crawl_state()
+    if crawl_state is not None:
+        state_stats = crawl_state.stats()
+        print(f"Crawl state {crawl_state.path}: {state_stats['known']} known videos reused, {state_stats['resolved']} resolved")
+    cache = get_response_cache()
+    if cache is not None:
+        print(f"Response cache {cache.path} ({cache.size_bytes() // 1024} KB):")
+        for rule, stats in cache.stats().items():
+            print(f"  {rule}: {stats}")
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        print(f"Parse cache {parse_cache.path} ({parse_cache.size_bytes() // 1024} KB):")
+        for parser, stats in parse_cache.stats().items():
+            print(f"  {parser}: {stats}")
+
+
+def _add_state_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--parse-processes", type=int, default=None, help="Processes used to parse html, defaults to the core count, 0 parses in the crawl threads.")
+    parser.add_argument(
+        "--html-parser", type=str, choices=HTML_PARSERS, default=None, help=f"Html parser backend, also read from ${ENV_HTML_PARSER}. auto (the default) uses lxml when it is installed."
+    )
+    parser.add_argument("--http-cache", type=str, default=None, help=f"Path of the on-disk response cache, also read from ${ENV_HTTP_CACHE}.")
+    parser.add_argument("--http-cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Byte budget of the response cache.")
+    parser.add_argument("--parse-cache", type=str, default=DB_PARSE_CACHE, help="Cache of parse results keyed by a hash of the page, so identical pages are not parsed again.")
+    parser.add_argument("--no-parse-cache", action="store_true", help="Parse every page, ignoring the parse cache.")
+    parser.add_argument("--parse-cache-max-mb", type=int, default=PARSE_CACHE_MAX_BYTES // (1024 * 1024), help="Byte budget of the parse cache.")
+    parser.add_argument("--crawl-window-days", type=float, default=None, help="Only read feed entries published in the last N days, feeds stop being read at the first older entry.")
+    parser.add_argument("--ytdlp-per-host", type=int, default=DEFAULT_MAX_PROCESSES_PER_HOST, help="Max yt-dlp processes running at once against one host, across all channels.")
+    parser.add_argument("--crawl-state", type=str, default=DB_CRAWL_STATE, help="Store of already resolved videos, so that only new videos are resolved.")
+    parser.add_argument("--no-crawl-state", action="store_true", help="Resolve every video, ignoring the crawl state.")
+    parser.add_argument("--refresh-fraction", type=float, default=DEFAULT_REFRESH_FRACTION, help="Fraction of the known videos resolved again to refresh view counts.")
+    parser.add_argument("--bad-channels", type=str, default=DB_BAD_CHANNELS, help="Registry of failing channels, which are backed off exponentially.")
+    parser.add_argument("--no-bad-channels", action="store_true", help="Crawl every channel, even the ones that keep failing.")
+    parser.add_argument("--backoff-after-failures", type=int, default=DEFAULT_FAILURE_THRESHOLD, help="Consecutive failures before a channel is skipped.")
+    parser.add_argument("--backoff-base-minutes", type=float, default=DEFAULT_BASE_DELAY / 60, help="Time a channel is first skipped for, doubled on every further failure.")
+    parser.add_argument("--backoff-max-hours", type=float, default=DEFAULT_MAX_DELAY / 3600, help="Longest time a failing channel is skipped before it is retried.")
+    parser.add_argument("--circuit-breaker", type=str, default=DB_CIRCUIT_BREAKER, help="Store of the per source circuit breakers.")
+    parser.add_argument("--last-results", type=str, default=DB_LAST_RESULTS, help="Store of the last good results of every channel, reused for the channels that are skipped or backed off.")
+    parser.add_argument("--no-circuit-breaker", action="store_true", help="Crawl every channel, even of sources that keep failing.")
+    parser.add_argument("--breaker-threshold", type=int, default=DEFAULT_SOURCE_THRESHOLD, help="Consecutive channel failures that open the circuit of a source.")
+    parser.add_argument("--breaker-cooldown-minutes", type=float, default=DEFAULT_SOURCE_COOLDOWN / 60, help="Time an open circuit waits before a probe channel is crawled again.")
+
+
+def _enable_state(args: argparse.Namespace) -> None:
+    if args.html_parser:
+        set_html_parser(args.html_parser)
+    if not args.no_parse_cache:
+        enable_parse_cache(args.parse_cache, max_bytes=args.parse_cache_max_mb * 1024 * 1024)
+    if args.crawl_window_days:
+        enable_crawl_window(args.crawl_window_days * 24 * 60 * 60)
+    set_max_processes_per_host(args.ytdlp_per_host)
+    if args.http_cache:
+        enable_response_cache(args.http_cache, max_bytes=args.http_cache_max_mb * 1024 * 1024)
+    if not args.no_crawl_state:
+        enable_crawl_state(args.crawl_state, refresh_fraction=args.refresh_fraction)
+    if not args.no_bad_channels:
+        enable_bad_channel_registry(args.bad_channels, base_delay=args.backoff_base_minutes * 60, max_delay=args.backoff_max_hours * 3600, failure_threshold=args.backoff_after_failures)
+    if not args.no_circuit_breaker:
+        enable_source_breakers(args.circuit_breaker, failure_threshold=args.breaker_threshold, cooldown=args.breaker_cooldown_minutes * 60)
+    if not (args.no_bad_channels and args.no_circuit_breaker):
+        enable_last_results(args.last_results)
+
+
+def worker_main(argv: List[str]) -> None:
+    """`vidcrawler worker`, crawls the jobs of a queue written by a --job-queue coordinator."""
+    parser = argparse.ArgumentParser("vidcrawler worker")
+    parser.add_argument("--job-queue", type=str, required=True, help="Job queue database written by the coordinator.")
+    parser.add_argument("--threads", type=int, default=4, help="Jobs crawled concurrently by this worker.")
+    parser.add_argument("--worker-id", type=str, default=None, help="Name of this worker in the queue, defaults to host-pid.")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE, help="A job not heartbeated for this long is handed to another worker.")
+    parser.add_argument("--channel-timeout-minutes", type=float, default=DEFAULT_CHANNEL_TIMEOUT / 60, help="Deadline of one channel, it keeps the videos resolved in time. 0 disables it.")
+    _add_state_arguments(parser)
+    args = parser.parse_args(argv)
+    _enable_state(args)
+    run_worker(
+        args.job_queue,
+        worker_id=args.worker_id,
+        threads=args.threads,
+        lease_seconds=args.lease_seconds,
+        parse_processes=args.parse_processes,
+        channel_timeout=args.channel_timeout_minutes * 60 or None,
+    )
+
+
+def bad_channels_main(argv: List[str]) -> None:
+    """`vidcrawler bad-channels list|reset`, inspects and clears the bad channel registry."""
+    parser = argparse.ArgumentParser("vidcrawler bad-channels")
+    parser.add_argument("action", choices=["list", "reset"])
+    parser.add_argument("--bad-channels", type=str, default=DB_BAD_CHANNELS, help="Registry of failing channels.")
+    parser.add_argument("--source", type=str, default=None, help="Only the channels of this source.")
+    parser.add_argument("--channel", type=str, default=None, help="Only the channel with this name or id.")
+    parser.add_argument("--all", action="store_true", help="Reset every entry.")
+    parser.add_argument("--json", action="store_true", help="List the entries as json.")
+    args = parser.parse_args(argv)
+    registry = BadChannelRegistry(args.bad_channels)
+    if args.action == "reset":
+        if not (args.all or args.source or args.channel):
+            parser.error("reset needs --source, --channel or --all")
+        removed = registry.reset(source=args.source, channel=args.channel)
+        print(f"Reset {removed} bad channels")
+        return
+    entries = [entry for entry in registry.entries() if args.source in (None, entry["source"]) and args.channel in (None, entry["channel_name"], entry["channel_id"])]
+    if args.json:
+        print(json.dumps(entries, indent=2, sort_keys=True))
+        return
+    for entry in entries:
+        last = datetime.fromtimestamp(entry["last_failure"]).isoformat(timespec="minutes")
+        retry = datetime.fromtimestamp(entry["retry_after"]).isoformat(timespec="minutes")
+        print(f"{entry['source']:10} {entry['channel_name']:30} failures {entry['failures']:3}  last {last}  retry {retry}  {entry['last_error']}")
+    print(f"{len(entries)} bad channels")
 
 
 def main() -> None:
     """Main function."""
+    argv = sys.argv[1:]
+    if argv[:1] == ["worker"]:
+        worker_main(argv[1:])
+        return
+    if argv[:1] == ["bad-channels"]:
+        bad_channels_main(argv[1:])
+        return
+    if argv[:1] == ["serve"]:
+        argv = ["--daemon"] + argv[1:]
     parser = argparse.ArgumentParser("vidcrawler")
     parser.add_argument("--input_crawl_json", type=str)
     parser.add_argument("--output_json", type=str)
+    parser.add_argument("--output-ndjson", type=str, default=None, help="Stream videos to this newline delimited json file as channels complete, instead of --output_json.")
     parser.add_argument("--singlethreaded", action="store_true")
-    args = parser.parse_args()
+    parser.add_argument("--max-per-source", type=int, default=DEFAULT_MAX_PER_SOURCE, help="Max concurrent channels per source.")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS, help="Number of crawl threads.")
+    parser.add_argument("--max-per-host", type=int, default=DEFAULT_MAX_PER_HOST, help="Max concurrent connections per host, 0 for no limit.")
+    _add_state_arguments(parser)
+    parser.add_argument(
+        "--poll-schedule", type=str, nargs="?", const=DB_POLL_SCHEDULE, default=None, help="Only crawl channels that are due according to their upload history, reusing the last results of the others."
+    )
+    parser.add_argument("--poll-min-minutes", type=float, default=DEFAULT_MIN_INTERVAL / 60, help="Shortest interval between two polls of a channel.")
+    parser.add_argument("--poll-max-hours", type=float, default=DEFAULT_MAX_INTERVAL / 3600, help="Longest interval between two polls of a channel.")
+    parser.add_argument("--prometheus-textfile", type=str, default=None, help="Also write the http timing histograms to this Prometheus textfile.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and crawl every --interval-minutes, also started with `vidcrawler serve`.")
+    parser.add_argument("--interval-minutes", type=float, default=DEFAULT_INTERVAL / 60, help="Time between the starts of two crawls in daemon mode.")
+    parser.add_argument("--channel-timeout-minutes", type=float, default=DEFAULT_CHANNEL_TIMEOUT / 60, help="Deadline of one channel, it keeps the videos resolved in time. 0 disables it.")
+    parser.add_argument("--status-json", type=str, default=None, help="Rewrite this file with the live crawl progress every --status-interval seconds.")
+    parser.add_argument("--status-interval", type=float, default=DEFAULT_STATUS_INTERVAL, help="Seconds between two rewrites of --status-json.")
+    parser.add_argument("--status-port", type=int, default=None, help="Serve the live crawl progress at http://127.0.0.1:PORT/status.")
+    parser.add_argument("--crawl-timeout-minutes", type=float, default=None, help="Deadline of the whole crawl, channels not finished by then are reported as bad channels.")
+    parser.add_argument("--job-queue", type=str, default=None, help="Coordinate: queue the channels in this database for `vidcrawler worker` processes and merge their results.")
+    parser.add_argument("--job-queue-idle-minutes", type=float, default=DEFAULT_IDLE_TIMEOUT / 60, help="Give up the queued jobs after this long without a running worker. 0 waits forever.")
+    args = parser.parse_args(argv)
+    _enable_state(args)
     input_crawl_json = args.input_crawl_json or input("input_crawl_json: ")
     assert os.path.exists(input_crawl_json), f"{input_crawl_json} doesn't exist"
-    output_json = args.output_json or input("output_json: ")
-    with open(input_crawl_json, encoding="utf-8", mode="r") as filed:
-        input_crawl_data = json.loads(filed.read())
-    # Type check! We expect an array of tuples
-    # List[Tuple[str, str, str]]
-    tmp = []
-    for tup in input_crawl_data:
-        assert len(tup) == 3, "expected a List[Tuple[str, str, str]]"
-        if tup[1] not in CRAWLERS:
-            print(f"Unknown source: {tup[1]} (ignoring)")
-            continue
-        tmp.append(tup)
-    input_crawl_data = tmp
+    output_ndjson = args.output_ndjson
+    output_json = output_ndjson or args.output_json or input("output_json: ")
+    poll_schedule = None
+    if args.poll_schedule:
+        poll_schedule = PollSchedule(args.poll_schedule, min_interval=args.poll_min_minutes * 60, max_interval=args.poll_max_hours * 3600)
+    crawl_options = dict(  # pylint: disable=R1735
+        use_threads=not args.singlethreaded,
+        max_per_source=args.max_per_source,
+        max_per_host=args.max_per_host or None,
+        max_workers=args.max_workers,
+        parse_processes=args.parse_processes,
+        poll_schedule=poll_schedule,
+        channel_timeout=args.channel_timeout_minutes * 60 or None,
+        crawl_timeout=args.crawl_timeout_minutes * 60 if args.crawl_timeout_minutes else None,
+    )
+    status = None
+    if args.status_json or args.status_port is not None:
+        status = StatusPublisher(args.status_json, port=args.status_port, interval=args.status_interval).start()
+    try:
+        _crawl(args, input_crawl_json, output_json, output_ndjson, crawl_options)
+    finally:
+        if status is not None:
+            status.stop()
+
+
+def _crawl(args: argparse.Namespace, input_crawl_json: str, output_json: str, output_ndjson: Optional[str], crawl_options: Dict[str, Any]) -> None:
+    if args.daemon:
+
+        def on_crawl() -> None:
+            _report_crawl(output_json, args.prometheus_textfile)
+            get_http_stats().reset()  # Each crawl reports its own timings.
+
+        daemon = CrawlDaemon(
+            input_crawl_json,
+            output_json,
+            interval=args.interval_minutes * 60,
+            ndjson=bool(output_ndjson),
+            crawl_options=crawl_options,
+            on_crawl=on_crawl,
+        )
+        daemon.serve(parse_processes=args.parse_processes)
+        return
+    input_crawl_data = load_crawl_channels(input_crawl_json)
     # Execute the crawl
     time_start = time.time()
-    json_str: str = crawl_video_sites(input_crawl_data, use_threads=not args.singlethreaded)
+    if args.job_queue:
+        json_str = coordinate(
+            input_crawl_data,
+            args.job_queue,
+            poll_schedule=crawl_options["poll_schedule"],
+            crawl_timeout=crawl_options["crawl_timeout"],
+            idle_timeout=args.job_queue_idle_minutes * 60 or None,
+        )
+        write_utf8_atomic(output_json, json_str)
+    elif output_ndjson:
+        count = stream_video_sites(input_crawl_data, output_ndjson, **crawl_options)
+        print(f"Streamed {count} videos to {output_ndjson}")
+    else:
+        json_str = crawl_video_sites(input_crawl_data, **crawl_options)
+        with open(output_json, encoding="utf-8", mode="w") as filed:
+            filed.write(json_str)
     time_delta = time.time() - time_start
     print("\nTook %.1f seconds to fetch content\n" % time_delta)
-    with open(output_json, encoding="utf-8", mode="w") as filed:
-        filed.write(json_str)
+    _report_crawl(output_json, args.prometheus_textfile)
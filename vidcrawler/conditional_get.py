@@ -0,0 +1,109 @@
+"""
+Conditional GET (ETag / Last-Modified) support for feeds that rarely change.
+
+The validators from the last 200 response are stored together with the parsed
+result of that response. The next fetch sends If-None-Match / If-Modified-Since
+and when the server answers 304 the stored parse result is handed back so that
+the document is neither downloaded nor parsed again. Feeds are parsed only as
+far back as the crawl window, so a parse result is replayed only while the
+window it was cut to is the current one.
+"""
+
+# pylint: disable=line-too-long
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
+
+from .cache_dir import cache_path as _cache_path
+from .feed_reader import get_crawl_window_start
+from .fetch_html import CURL_USER_AGENT, FetchResult, http_get
+
+DB_CONDITIONAL_GET = _cache_path("conditional_get.db")
+
+
+@dataclass
+class ConditionalFetch:
+    """Result of a conditional fetch, cached is the stored parse result when the server answered 304.
+
+    window_start is the crawl window the response is to be parsed with.
+    """
+
+    result: FetchResult
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    cached: Optional[Any] = None
+    window_start: Optional[datetime] = None
+
+
+def _get_store(cache_path: str) -> KeyValueDB:
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    return KeyValueDB(cache_path, "conditional_get_validators")
+
+
+def _window_key(window_start: Optional[datetime]) -> Optional[str]:
+    return window_start.isoformat() if window_start is not None else None
+
+
+def fetch_if_modified(
+    url: str,
+    key: Optional[str] = None,
+    timeout: Optional[int] = None,
+    user_agent: Optional[str] = CURL_USER_AGENT,
+    raise_for_status: bool = False,
+    cache_path: Optional[str] = DB_CONDITIONAL_GET,
+) -> ConditionalFetch:
+    """
+    Fetches the url, sending the validators stored under key (defaults to the url).
+    When raise_for_status is set, errors other than 304 raise requests.HTTPError.
+    """
+    key = key or url
+    window_start = get_crawl_window_start()
+    headers: Dict[str, str] = {}
+    if user_agent:
+        headers["User-Agent"] = user_agent
+    stored: Optional[Dict[str, Any]] = None
+    if cache_path is not None:
+        stored = _get_store(cache_path).get(key)
+    # Validators are only useful if the parse result they vouch for is still around
+    # and was cut to the current crawl window.
+    if stored and (stored.get("payload") is None or stored.get("window_start") != _window_key(window_start)):
+        stored = None
+    if stored:
+        if stored.get("etag"):
+            headers["If-None-Match"] = stored["etag"]
+        if stored.get("last_modified"):
+            headers["If-Modified-Since"] = stored["last_modified"]
+    resp = http_get(url, timeout=timeout, headers=headers)
+    result = FetchResult(html=resp.text, status_code=resp.status_code)
+    if resp.status_code == 304 and stored:
+        return ConditionalFetch(result=result, etag=stored.get("etag"), last_modified=stored.get("last_modified"), cached=stored["payload"], window_start=window_start)
+    if raise_for_status:
+        resp.raise_for_status()
+    return ConditionalFetch(result=result, etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"), window_start=window_start)
+
+
+def store_if_modified(
+    key: str,
+    fetch: ConditionalFetch,
+    payload: Any,
+    cache_path: Optional[str] = DB_CONDITIONAL_GET,
+) -> None:
+    """
+    Stores the json serializable parse result of a 200 response, parsed with
+    fetch.window_start, so that a later 304 can return it. Responses without
+    validators are not stored.
+    """
+    if cache_path is None or not fetch.result.ok:
+        return
+    if not fetch.etag and not fetch.last_modified:
+        return
+    _get_store(cache_path)[key] = {
+        "etag": fetch.etag,
+        "last_modified": fetch.last_modified,
+        "payload": payload,
+        "window_start": _window_key(fetch.window_start),
+    }
@@ -0,0 +1,145 @@
+"""
+Incremental crawl state.
+
+Remembers, per (source, channel), the videos that were already resolved together
+with their resolved VideoInfo, so a scraper only spends per-video requests
+(yt-dlp calls, episode pages, view and image lookups) on videos it has never
+seen. A random refresh sample of the known videos is resolved again on every run
+to keep view counts moving. Videos that have not been listed for a while are
+dropped so the state stays as small as the channel listings.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
+
+from .cache_dir import cache_path
+from .deadline import DeadlineExceeded
+from .video_info import VideoInfo
+
+DB_CRAWL_STATE = cache_path("crawl_state.db")
+ENV_CRAWL_STATE = "VIDCRAWLER_CRAWL_STATE"
+# Fraction of the known videos that are resolved again on each run.
+DEFAULT_REFRESH_FRACTION = 0.1
+# Known videos that were not listed for this long are forgotten.
+FORGET_AFTER = 45 * 24 * 60 * 60
+
+
+class ChannelState:
+    """Known videos of one channel, loaded when the channel crawl starts and saved when it ends."""
+
+    def __init__(self, videos: Dict[str, Dict[str, Any]], refresh_fraction: float) -> None:
+        self.videos = videos
+        self.refresh_fraction = refresh_fraction
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str) -> Optional[VideoInfo]:
+        """The stored VideoInfo for key, None if it must be resolved (unknown or picked for a refresh)."""
+        entry = self.videos.get(key)
+        if entry is not None:
+            entry["seen"] = time.time()
+        if entry is None or random.random() < self.refresh_fraction:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return VideoInfo.from_dict(entry["info"])
+
+    def known(self, key: str) -> Optional[VideoInfo]:
+        """The stored VideoInfo for key, also when lookup() picked it for a refresh."""
+        entry = self.videos.get(key)
+        return VideoInfo.from_dict(entry["info"]) if entry is not None else None
+
+    def store(self, key: str, vid: VideoInfo) -> None:
+        """Remembers the resolved vid, a refreshed video keeps the date it was first discovered."""
+        entry = self.videos.get(key)
+        if entry is not None and entry["info"].get("date_discovered"):
+            vid.date_discovered = entry["info"]["date_discovered"]
+        self.videos[key] = {"info": vid.to_dict(), "seen": time.time()}
+
+
+class CrawlState:
+    """Sqlite backed map of (source, channel) -> known videos."""
+
+    def __init__(self, path: str = DB_CRAWL_STATE, refresh_fraction: float = DEFAULT_REFRESH_FRACTION) -> None:
+        self.path = path
+        self.refresh_fraction = refresh_fraction
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = KeyValueDB(path, "crawl_state")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, source: str, channel: str) -> ChannelState:
+        data = self._db.get(f"{source}|{channel}") or {}
+        return ChannelState(data.get("videos", {}), self.refresh_fraction)
+
+    def save(self, source: str, channel: str, state: ChannelState) -> None:
+        cutoff = time.time() - FORGET_AFTER
+        videos = {key: entry for key, entry in state.videos.items() if entry["seen"] >= cutoff}
+        self._db.set(f"{source}|{channel}", {"videos": videos})
+        with self._lock:
+            self.hits += state.hits
+            self.misses += state.misses
+
+    def stats(self) -> Dict[str, int]:
+        """Videos served from the state and videos resolved, over this process."""
+        with self._lock:
+            return {"known": self.hits, "resolved": self.misses}
+
+
+_STATE_LOCK = threading.Lock()
+_STATE: Optional[CrawlState] = None
+_STATE_FROM_ENV_CHECKED = False
+
+
+def enable_crawl_state(path: str = DB_CRAWL_STATE, refresh_fraction: float = DEFAULT_REFRESH_FRACTION) -> CrawlState:
+    global _STATE  # pylint: disable=global-statement
+    with _STATE_LOCK:
+        _STATE = CrawlState(path, refresh_fraction=refresh_fraction)
+        return _STATE
+
+
+def disable_crawl_state() -> None:
+    global _STATE  # pylint: disable=global-statement
+    with _STATE_LOCK:
+        _STATE = None
+
+
+def get_crawl_state() -> Optional[CrawlState]:
+    """Returns the active crawl state, enabling it from $VIDCRAWLER_CRAWL_STATE on first use."""
+    global _STATE, _STATE_FROM_ENV_CHECKED  # pylint: disable=global-statement
+    with _STATE_LOCK:
+        if _STATE is None and not _STATE_FROM_ENV_CHECKED:
+            _STATE_FROM_ENV_CHECKED = True
+            env_path = os.environ.get(ENV_CRAWL_STATE)
+            if env_path:
+                _STATE = CrawlState(env_path)
+        return _STATE
+
+
+@contextmanager
+def channel_state(source: str, channel: str) -> Iterator[ChannelState]:
+    """
+    Yields the known videos of the channel and saves them when the block exits
+    without an error or runs out of time (what was resolved until then is still
+    valid). Without an active crawl state every lookup misses.
+    """
+    state = get_crawl_state()
+    if state is None:
+        yield ChannelState({}, refresh_fraction=1.0)
+        return
+    channel_data = state.load(source, channel)
+    try:
+        yield channel_data
+    except DeadlineExceeded:
+        state.save(source, channel, channel_data)
+        raise
+    state.save(source, channel, channel_data)
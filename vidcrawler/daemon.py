@@ -0,0 +1,173 @@
+"""
+Long running crawl daemon.
+
+Instead of paying interpreter startup, imports, the curl probe and cold
+connections on every run, the daemon stays up and crawls the channels of the
+input json every interval. The http connection pools, the parse pool, the
+response cache and the crawl state stay warm between crawls. The input is
+re-read when its modification time changes (an edit also starts the next crawl
+early) and every output is replaced atomically, so readers never see a partial
+file. SIGTERM (or SIGINT) drains: channels already being crawled finish, the
+rest are skipped and the daemon exits. A drained crawl is not written, the
+previous complete output stays in place. A second signal gets the default handling.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .io import write_utf8_atomic
+from .parse_pool import disable_parse_pool, enable_parse_pool
+from .spider import crawl_video_sites, load_crawl_channels, stream_video_sites
+
+DEFAULT_INTERVAL = 15 * 60
+# How often the input file is checked for changes between crawls.
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class CrawlDaemon:
+    """Crawls input_crawl_json into output_path every interval seconds until stopped."""
+
+    def __init__(
+        self,
+        input_crawl_json: str,
+        output_path: str,
+        interval: float = DEFAULT_INTERVAL,
+        ndjson: bool = False,
+        crawl_options: Optional[Dict[str, Any]] = None,
+        on_crawl: Optional[Callable[[], None]] = None,
+    ) -> None:
+        assert interval >= 0
+        self.input_crawl_json = input_crawl_json
+        self.output_path = output_path
+        self.interval = interval
+        self.ndjson = ndjson
+        self.crawl_options: Dict[str, Any] = dict(crawl_options or {})
+        self.on_crawl = on_crawl
+        self.channels: List[Tuple[str, str, str]] = []
+        # Until the input was read once the channel list is not known, not empty.
+        self.input_loaded = False
+        self.crawls = 0
+        self._input_mtime: Optional[float] = None
+        self._stop = threading.Event()
+
+    def input_changed(self) -> bool:
+        return _mtime(self.input_crawl_json) != self._input_mtime
+
+    def reload_input(self) -> bool:
+        """Re-reads the input if it changed, returns True if the channel list was replaced."""
+        mtime = _mtime(self.input_crawl_json)
+        if mtime is None or mtime == self._input_mtime:
+            return False
+        try:
+            channels = load_crawl_channels(self.input_crawl_json)
+        except Exception as err:  # pylint: disable=broad-except
+            # Most likely caught mid-write, the next check picks up the finished file.
+            sys.stderr.write(f"Could not read {self.input_crawl_json} ({err}), keeping {len(self.channels)} channels\n")
+            return False
+        self._input_mtime = mtime
+        self.channels = channels
+        self.input_loaded = True
+        print(f"Loaded {len(channels)} channels from {self.input_crawl_json}")
+        return True
+
+    def crawl_once(self) -> bool:
+        """Crawls the current channels, returns True if the output was replaced."""
+        if not self.input_loaded:
+            print(f"No valid input read from {self.input_crawl_json} yet, keeping the previous {self.output_path}")
+            return False
+        options = dict(self.crawl_options, stop=self._stop)
+        if self.ndjson:
+            # Consumers can tail the partial file, the output is swapped in once complete.
+            partial_path = f"{self.output_path}.partial"
+            count = stream_video_sites(self.channels, partial_path, **options)
+            if self._stop.is_set():
+                print(f"Drained, leaving {partial_path} in place")
+                return False
+            os.replace(partial_path, self.output_path)
+            print(f"Streamed {count} videos to {self.output_path}")
+        else:
+            json_str = crawl_video_sites(self.channels, **options)
+            if self._stop.is_set():
+                print(f"Drained, keeping the previous {self.output_path}")
+                return False
+            write_utf8_atomic(self.output_path, json_str)
+        self.crawls += 1
+        return True
+
+    def stop(self) -> None:
+        """Drains: the crawl in progress skips the channels it has not started, then serve() returns."""
+        self._stop.set()
+
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _wait_for_next_crawl(self, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self._stop.wait(min(remaining, RELOAD_CHECK_INTERVAL)):
+                return
+            if self.input_changed():
+                print(f"{self.input_crawl_json} changed, crawling now")
+                return
+
+    def _install_signal_handlers(self) -> Dict[int, Any]:
+        """Returns the previous handlers."""
+        previous: Dict[int, Any] = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        def on_signal(signum: int, _frame: Any) -> None:
+            print(f"Received {signal.Signals(signum).name}, draining (send it again to exit now)")
+            self.stop()
+            signal.signal(signum, previous[signum])
+
+        for signum in previous:
+            signal.signal(signum, on_signal)
+        return previous
+
+    def serve(self, max_crawls: Optional[int] = None, parse_processes: Optional[int] = 0) -> None:
+        """
+        Crawls until stop() or a signal, or until max_crawls crawls were attempted.
+        A parse pool of parse_processes processes (None: one per core) is started once
+        and shared by every crawl, 0 (the default) parses on the crawl threads.
+        """
+        # Signal handlers can only be installed from the main thread.
+        previous_handlers = self._install_signal_handlers() if threading.current_thread() is threading.main_thread() else {}
+        if parse_processes != 0:
+            enable_parse_pool(parse_processes)
+        attempts = 0
+        try:
+            while not self._stop.is_set():
+                attempts += 1
+                started = time.monotonic()
+                self.reload_input()
+                try:
+                    self.crawl_once()
+                    if self.on_crawl is not None:
+                        self.on_crawl()
+                except Exception:  # pylint: disable=broad-except
+                    # One failed crawl must not take the daemon down, the next one retries.
+                    traceback.print_exc()
+                if max_crawls is not None and attempts >= max_crawls:
+                    break
+                self._wait_for_next_crawl(self.interval - (time.monotonic() - started))
+        finally:
+            disable_parse_pool()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+        print(f"Daemon stopped after {self.crawls} crawls")
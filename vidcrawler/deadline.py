@@ -0,0 +1,111 @@
+"""
+Per-thread deadlines for channel crawls.
+
+The spider runs every channel under deadline(seconds). Blocking calls (http
+requests, curl, yt-dlp) clamp their own timeout to the time that is left with
+clamp_timeout(), so a hung server or a stuck subprocess is cut off, killed in
+the case of a subprocess, when the channel's time is up and DeadlineExceeded is
+raised. Scrapers wrap their per-video loops in keep_partial() so that the
+videos resolved before the deadline travel with the exception and are kept.
+A scraper that loses some of a channel's videos for another reason raises
+PartialResultError with the rest, they are kept and the channel is reported.
+Threads do not inherit the deadline, work handed to an executor is wrapped with
+bind_deadline().
+"""
+
+# pylint: disable=line-too-long
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+_LOCAL = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """The deadline of the current channel passed, partial holds what was collected before."""
+
+    def __init__(self, message: str, partial: Optional[List[Any]] = None) -> None:
+        super().__init__(message)
+        self.partial: List[Any] = list(partial or [])
+
+
+class PartialResultError(RuntimeError):
+    """Some videos of the channel could not be fetched, partial holds the others."""
+
+    def __init__(self, message: str, partial: Optional[List[Any]] = None) -> None:
+        super().__init__(message)
+        self.partial: List[Any] = list(partial or [])
+
+
+def current_deadline() -> Optional[float]:
+    """Absolute time.monotonic() deadline of the calling thread, None without one."""
+    return getattr(_LOCAL, "deadline", None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, None without one."""
+    end = current_deadline()
+    return None if end is None else end - time.monotonic()
+
+
+def deadline_passed() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check_deadline(what: str = "") -> None:
+    if deadline_passed():
+        raise DeadlineExceeded(f"deadline exceeded{' ' + what if what else ''}")
+
+
+def clamp_timeout(timeout: Optional[float], what: str = "") -> Optional[float]:
+    """The timeout limited to the time left before the deadline, raises if no time is left."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(f"deadline exceeded{' ' + what if what else ''}")
+    return left if timeout is None else min(timeout, left)
+
+
+@contextmanager
+def deadline_at(end: Optional[float]) -> Iterator[None]:
+    """Runs the block under the absolute deadline end, an enclosing earlier deadline still wins."""
+    previous = current_deadline()
+    if end is not None and previous is not None:
+        end = min(end, previous)
+    _LOCAL.deadline = end if end is not None else previous
+    try:
+        yield
+    finally:
+        _LOCAL.deadline = previous
+
+
+def deadline(seconds: Optional[float]) -> Any:
+    """Runs the block with at most seconds left, None adds no limit."""
+    return deadline_at(None if seconds is None else time.monotonic() + seconds)
+
+
+def bind_deadline(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wraps fn so that it runs under the caller's deadline on whatever thread calls it."""
+    end = current_deadline()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        with deadline_at(end):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+@contextmanager
+def keep_partial(items: List[Any]) -> Iterator[None]:
+    """A DeadlineExceeded raised in the block carries the items collected so far."""
+    try:
+        yield
+    except DeadlineExceeded as err:
+        err.partial = list(items)
+        raise
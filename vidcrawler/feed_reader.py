@@ -0,0 +1,259 @@
+"""
+Streaming reader for the rss and atom feeds the scrapers know.
+
+feedparser.parse() sniffs encodings, sanitizes html and handles every feed
+dialect, which makes it the slowest step of the feed based scrapers. The feeds
+read here come in two fixed shapes, youtube's atom feed and plain rss 2.0
+(bitchute, brighteon, spreaker, odysee), so they are read incrementally with
+an XMLPullParser and each entry is built as a FeedParserDict with the keys
+feedparser would give it. Html in descriptions is passed through as published
+rather than sanitized. Entries are yielded as soon as they are read, and
+reading stops at the first entry published before the crawl window (feeds list
+the newest entries first). Anything unexpected (malformed xml, another shape,
+an entry without its required fields) falls back to feedparser.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple, cast
+
+import feedparser  # type: ignore
+from feedparser import FeedParserDict
+
+from .date import parse_datetime
+from .parse_cache import cached_parse, get_parse_cache
+
+YOUTUBE = "youtube"
+RSS = "rss"
+FEED_SHAPES = (YOUTUBE, RSS)
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_YT = "{http://www.youtube.com/xml/schemas/2015}"
+_MEDIA = "{http://search.yahoo.com/mrss/}"
+_ITUNES = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+# Characters handed to the xml parser at a time, so entries are yielded while the rest is unread.
+_CHUNK = 64 * 1024
+
+
+class FeedShapeError(ValueError):
+    """The feed does not have the shape its reader expects."""
+
+
+def _text(elem: Optional[ET.Element]) -> str:
+    if elem is None:
+        return ""
+    return "".join(elem.itertext()).strip()
+
+
+def _detail(value: str, type_: str) -> FeedParserDict:
+    return FeedParserDict(type=type_, language=None, base="", value=value)
+
+
+def _required(elem: ET.Element, tag: str) -> ET.Element:
+    child = elem.find(tag)
+    if child is None:
+        raise FeedShapeError(f"{elem.tag} without {tag}")
+    return child
+
+
+def _youtube_entry(elem: ET.Element) -> FeedParserDict:
+    title = _text(_required(elem, f"{_ATOM}title"))
+    link = _required(elem, f"{_ATOM}link[@rel='alternate']").attrib["href"]
+    group = _required(elem, f"{_MEDIA}group")
+    thumbnails = [FeedParserDict(thumbnail.attrib) for thumbnail in group.iter(f"{_MEDIA}thumbnail")]
+    if not thumbnails:
+        raise FeedShapeError("youtube entry without media:thumbnail")
+    author = FeedParserDict(name=_text(elem.find(f"{_ATOM}author/{_ATOM}name")), href=_text(elem.find(f"{_ATOM}author/{_ATOM}uri")))
+    summary = _text(group.find(f"{_MEDIA}description"))
+    entry = FeedParserDict(
+        id=_text(elem.find(f"{_ATOM}id")),
+        yt_videoid=_text(_required(elem, f"{_YT}videoId")),
+        yt_channelid=_text(elem.find(f"{_YT}channelId")),
+        title=title,
+        title_detail=_detail(title, "text/plain"),
+        link=link,
+        links=[FeedParserDict(href=link, rel="alternate", type="text/html")],
+        author=author["name"],
+        author_detail=author,
+        authors=[author],
+        published=_text(_required(elem, f"{_ATOM}published")),
+        updated=_text(elem.find(f"{_ATOM}updated")),
+        media_content=[FeedParserDict(content.attrib) for content in group.iter(f"{_MEDIA}content")],
+        media_thumbnail=thumbnails,
+        summary=summary,
+        summary_detail=_detail(summary, "text/html"),
+        media_statistics=FeedParserDict(_required(group, f"{_MEDIA}community/{_MEDIA}statistics").attrib),
+    )
+    rating = group.find(f"{_MEDIA}community/{_MEDIA}starRating")
+    if rating is not None:
+        entry["media_starrating"] = FeedParserDict(rating.attrib)
+    return entry
+
+
+def _rss_item(elem: ET.Element) -> FeedParserDict:
+    title = _text(_required(elem, "title"))
+    link = _text(_required(elem, "link"))
+    links = [FeedParserDict(href=link, rel="alternate", type="text/html")]
+    for enclosure in elem.iter("enclosure"):
+        attrs = dict(enclosure.attrib)
+        links.append(FeedParserDict(attrs, href=attrs.pop("url", ""), rel="enclosure"))
+    summary = _text(elem.find("description"))
+    entry = FeedParserDict(
+        title=title,
+        title_detail=_detail(title, "text/plain"),
+        link=link,
+        links=links,
+        summary=summary,
+        summary_detail=_detail(summary, "text/html"),
+        published=_text(_required(elem, "pubDate")),
+    )
+    guid = elem.find("guid")
+    if guid is not None:
+        entry["id"] = _text(guid)
+    subtitle = elem.find(f"{_ITUNES}subtitle")
+    if subtitle is not None:
+        entry["subtitle"] = _text(subtitle)
+        entry["subtitle_detail"] = _detail(entry["subtitle"], "text/plain")
+    duration = elem.find(f"{_ITUNES}duration")
+    if duration is not None:
+        entry["itunes_duration"] = _text(duration)
+    image = elem.find(f"{_ITUNES}image")
+    if image is not None and "href" in image.attrib:
+        entry["image"] = FeedParserDict(href=image.attrib["href"])
+    return entry
+
+
+def _read_events(parser: ET.XMLPullParser) -> Iterator[Tuple[str, ET.Element]]:
+    # Only start and end events are requested, both carry an element.
+    return cast(Iterator[Tuple[str, ET.Element]], parser.read_events())
+
+
+def _iter_events(content: str) -> Iterator[Tuple[str, ET.Element]]:
+    parser: "ET.XMLPullParser[ET.Element]" = ET.XMLPullParser(events=("start", "end"))
+    for offset in range(0, len(content), _CHUNK):
+        parser.feed(content[offset : offset + _CHUNK])
+        yield from _read_events(parser)
+    parser.close()
+    yield from _read_events(parser)
+
+
+def _iter_fast(content: str, shape: str, feed: Dict[str, Any]) -> Iterator[FeedParserDict]:
+    root_tag, entry_tag, parse_entry = (f"{_ATOM}feed", f"{_ATOM}entry", _youtube_entry) if shape == YOUTUBE else ("rss", "item", _rss_item)
+    depth = 0
+    in_entry = False
+    for event, elem in _iter_events(content):
+        if event == "start":
+            if depth == 0 and elem.tag != root_tag:
+                raise FeedShapeError(f"expected a {root_tag} feed, got {elem.tag}")
+            depth += 1
+            in_entry = in_entry or elem.tag == entry_tag
+            continue
+        depth -= 1
+        if elem.tag == entry_tag:
+            in_entry = False
+            entry = parse_entry(elem)
+            elem.clear()
+            yield entry
+        elif not in_entry and elem.tag in ("title", f"{_ATOM}title") and "title" not in feed:
+            feed["title"] = _text(elem)
+        elif not in_entry and elem.tag == "link" and "link" not in feed:
+            feed["link"] = _text(elem)
+        elif not in_entry and elem.tag == f"{_ATOM}link" and elem.attrib.get("rel") == "alternate" and "link" not in feed:
+            feed["link"] = elem.attrib.get("href", "")
+
+
+def _published(entry: FeedParserDict) -> Optional[datetime]:
+    try:
+        return parse_datetime(entry["published"], tzinfo="UTC")
+    except Exception:  # pylint: disable=broad-except
+        return None  # An undated entry does not end the window.
+
+
+def _in_window(entry: FeedParserDict, after: Optional[datetime]) -> bool:
+    if after is None:
+        return True
+    published = _published(entry)
+    return published is None or published >= after
+
+
+def iter_feed_entries(content: str, shape: str, after: Optional[datetime] = None, feed: Optional[Dict[str, Any]] = None) -> Iterator[FeedParserDict]:
+    """Yields the entries of a feed of the given shape lazily, stopping at the first one published before after.
+
+    Feed level fields (title, link) are stored in feed as they are read.
+    """
+    if shape not in FEED_SHAPES:
+        raise ValueError(f"Unknown feed shape {shape!r}, expected one of {', '.join(FEED_SHAPES)}")
+    if get_parse_cache() is not None:
+        # Through the parse cache the feed is read whole, an identical feed is then not read at all.
+        parsed = parse_feed(content, shape, after)
+        if feed is not None:
+            feed.update(parsed.feed)
+        return iter(parsed.entries)
+    return _iter_entries(content, shape, after, {} if feed is None else feed)
+
+
+def _iter_entries(content: str, shape: str, after: Optional[datetime], feed: Dict[str, Any]) -> Iterator[FeedParserDict]:
+    if after is not None and after.tzinfo is None:
+        after = after.replace(tzinfo=timezone.utc)
+    yielded = 0
+    try:
+        for entry in _iter_fast(content, shape, feed):
+            if not _in_window(entry, after):
+                return
+            yielded += 1
+            yield entry
+        return
+    except (ET.ParseError, FeedShapeError, KeyError) as err:
+        sys.stderr.write(f"Fast {shape} feed reader failed ({err}), falling back to feedparser\n")
+    parsed = feedparser.parse(content)
+    for key in ("title", "link"):
+        if key in parsed.feed:
+            feed[key] = parsed.feed[key]
+    # The entries read before the failure were already handed out.
+    for entry in parsed.entries[yielded:]:
+        if not _in_window(entry, after):
+            return
+        yield entry
+
+
+@cached_parse(version=1)
+def parse_feed(content: str, shape: str, after: Optional[datetime] = None) -> FeedParserDict:
+    """Drop in for feedparser.parse() on a known feed shape: {"feed": {...}, "entries": [...]}."""
+    if shape not in FEED_SHAPES:
+        raise ValueError(f"Unknown feed shape {shape!r}, expected one of {', '.join(FEED_SHAPES)}")
+    feed = FeedParserDict()
+    entries: List[FeedParserDict] = list(_iter_entries(content, shape, after, feed))
+    return FeedParserDict(feed=feed, entries=entries)
+
+
+_WINDOW_LOCK = threading.Lock()
+_WINDOW: Optional[float] = None
+
+
+def enable_crawl_window(max_age_seconds: float) -> None:
+    """Feeds are read only as far back as max_age_seconds."""
+    global _WINDOW  # pylint: disable=global-statement
+    assert max_age_seconds > 0
+    with _WINDOW_LOCK:
+        _WINDOW = max_age_seconds
+
+
+def disable_crawl_window() -> None:
+    global _WINDOW  # pylint: disable=global-statement
+    with _WINDOW_LOCK:
+        _WINDOW = None
+
+
+def get_crawl_window_start() -> Optional[datetime]:
+    """The oldest publish time a feed entry may have, None without a crawl window.
+
+    Rounded down to the hour, so that the runs of an hour share their parse cache entries.
+    """
+    window = _WINDOW
+    if window is None:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(seconds=window)).replace(minute=0, second=0, microsecond=0)
@@ -3,18 +3,54 @@
 Fetcher for html
 """
 
+import codecs
+import math
 import subprocess
 import tempfile
+import threading
+import time
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
-try:
-    subprocess.check_output("curl --version", shell=True)
-    USE_CURL = True
-except BaseException:  # pylint: disable=broad-except
-    USE_CURL = False
+from .circuit_breaker import CircuitOpenError, get_host_breakers
+from .deadline import DeadlineExceeded, clamp_timeout, deadline_passed
+from .http_stats import (
+    TimedHTTPAdapter,
+    begin_request,
+    get_http_stats,
+    record_request,
+)
+from .rate_limit import MAX_RETRY_AFTER, MAX_THROTTLE_RETRIES, get_rate_limiter
+from .response_cache import (  # noqa: F401  pylint: disable=unused-import
+    disable_response_cache,
+    enable_response_cache,
+    get_response_cache,
+)
+from .single_flight import SingleFlight
+
+# The crawled sites were originally tuned against curl, so the pooled client
+# presents the same user agent unless the caller asks for something else.
+CURL_USER_AGENT = "curl/8.5.0"
+
+# Responses that count against the host's circuit breaker, after the throttle retries.
+HOST_DOWN_STATUS_CODES = (502, 503, 504)
+
+# Number of distinct hosts that keep a connection pool alive.
+POOL_CONNECTIONS = 64
+# Number of keep-alive connections retained per host.
+POOL_MAXSIZE = 16
+
+_ADAPTER_LOCK = threading.Lock()
+_ADAPTER: Optional[HTTPAdapter] = None
+_ADAPTER_GENERATION = 0
+_MAX_PER_HOST: Optional[int] = None
+_THREAD_LOCAL = threading.local()
+_FETCH_FLIGHT = SingleFlight()
 
 
 @dataclass
@@ -24,26 +60,242 @@ class FetchResult:
     ok = property(lambda self: 200 <= self.status_code < 300)
 
 
+@lru_cache(maxsize=None)
+def curl_available() -> bool:
+    try:
+        subprocess.check_output("curl --version", shell=True)
+        return True
+    except BaseException:  # pylint: disable=broad-except
+        return False
+
+
+def configure_http_pool(max_per_host: Optional[int] = None) -> None:
+    """
+    Sets the maximum number of concurrent connections per host. When set, callers
+    block until a connection to that host frees up. None removes the limit.
+    """
+    global _ADAPTER, _ADAPTER_GENERATION, _MAX_PER_HOST  # pylint: disable=global-statement
+    with _ADAPTER_LOCK:
+        _MAX_PER_HOST = max_per_host
+        _ADAPTER = None
+        _ADAPTER_GENERATION += 1
+
+
+def _get_adapter() -> Tuple[HTTPAdapter, int]:
+    """Process wide adapter, urllib3 keeps one thread safe pool per host inside of it."""
+    global _ADAPTER  # pylint: disable=global-statement
+    with _ADAPTER_LOCK:
+        if _ADAPTER is None:
+            if _MAX_PER_HOST is None:
+                _ADAPTER = TimedHTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            else:
+                _ADAPTER = TimedHTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=_MAX_PER_HOST, pool_block=True)
+        return _ADAPTER, _ADAPTER_GENERATION
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session for the calling thread. Sessions are not shared between
+    threads (cookies and headers are not thread safe) but they all mount the same
+    adapter so that keep-alive connections are shared by every scraper.
+    """
+    session: Optional[requests.Session] = getattr(_THREAD_LOCAL, "session", None)
+    if session is None or getattr(_THREAD_LOCAL, "generation", None) != _ADAPTER_GENERATION:
+        session = requests.Session()
+        adapter, generation = _get_adapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _THREAD_LOCAL.session = session
+        _THREAD_LOCAL.generation = generation
+    return session
+
+
+def http_get(
+    url: str,
+    timeout: Optional[float] = None,
+    headers: Optional[Dict[str, str]] = None,
+    stream: bool = False,
+) -> requests.Response:
+    """
+    Issues a GET through the shared connection pool, throttled by the per-host rate
+    limiter. Throttled responses (429/503) are retried after the Retry-After pause.
+    Every attempt is recorded in the http stats, streamed responses are recorded
+    when their headers arrive with the advertised Content-Length as size. The
+    timeout is cut to what is left of the calling channel's deadline. A host that
+    keeps failing to answer opens its circuit breaker and is failed fast.
+    """
+    timeout = timeout or 10
+    limiter = get_rate_limiter()
+    host = urlparse(url).hostname or ""
+    breakers = get_host_breakers()
+    if not breakers.allow(host):
+        raise CircuitOpenError(f"circuit open for {host}, not fetching {url}")
+    attempt = 0
+    while True:
+        limiter.acquire(url)
+        phases = begin_request()
+        start = time.perf_counter()
+        try:
+            with get_http_stats().track_in_flight(url):
+                resp = get_session().get(url, timeout=clamp_timeout(timeout, f"fetching {url}"), headers=headers, stream=stream)
+                # The body is read here so that a stall while it downloads is handled like one before the headers.
+                nbytes = int(resp.headers.get("Content-Length") or 0) if stream else len(resp.content)
+        except requests.Timeout as err:
+            if deadline_passed():
+                raise DeadlineExceeded(f"deadline exceeded fetching {url}") from err
+            breakers.record_failure(host)
+            raise
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as err:
+            # requests reports a read timeout in the body as a ConnectionError.
+            if deadline_passed():
+                raise DeadlineExceeded(f"deadline exceeded fetching {url}") from err
+            breakers.record_failure(host)
+            raise
+        record_request(url, resp.status_code, time.perf_counter() - start, ttfb=resp.elapsed.total_seconds(), nbytes=nbytes, phases=phases)
+        pause = limiter.report(url, resp.status_code, resp.headers.get("Retry-After"))
+        if pause is None or attempt >= MAX_THROTTLE_RETRIES or pause > MAX_RETRY_AFTER:
+            if resp.status_code in HOST_DOWN_STATUS_CODES:
+                breakers.record_failure(host)
+            else:
+                breakers.record_success(host)
+            return resp
+        resp.close()
+        attempt += 1
+
+
+def fetch_coalescing_stats() -> Dict[str, int]:
+    """Number of fetches issued and how many of them were served by an identical in-flight fetch."""
+    return _FETCH_FLIGHT.stats()
+
+
+def _fetch_through_cache(url: str, timeout: Optional[int], headers: Dict[str, str], raise_for_status: bool) -> FetchResult:
+    # Identical concurrent requests share one round trip and one FetchResult.
+    key = (url, tuple(sorted(headers.items())), raise_for_status)
+    try:
+        return _FETCH_FLIGHT.do(key, lambda: _fetch_through_cache_impl(url, timeout, headers, raise_for_status))
+    except DeadlineExceeded:
+        if deadline_passed():
+            raise
+        # The thread that led the shared fetch ran out of its time, not this one.
+        return _fetch_through_cache_impl(url, timeout, headers, raise_for_status)
+
+
+def _fetch_through_cache_impl(url: str, timeout: Optional[int], headers: Dict[str, str], raise_for_status: bool) -> FetchResult:
+    cache = get_response_cache()
+    if cache is not None:
+        cached = cache.get(url)
+        if cached is not None:
+            status_code, html = cached
+            return FetchResult(html=html, status_code=status_code)
+    resp = http_get(url, timeout=timeout, headers=headers)
+    if raise_for_status:
+        resp.raise_for_status()
+    result = FetchResult(html=resp.text, status_code=resp.status_code)
+    if cache is not None and result.ok:
+        cache.put(url, result.status_code, result.html)
+    return result
+
+
+def fetch_html_pooled(
+    url: str,
+    timeout: Optional[int] = None,
+    user_agent: Optional[str] = CURL_USER_AGENT,
+    headers: Optional[Dict[str, str]] = None,
+) -> FetchResult:
+    """Fetches the url using the keep-alive pool, non 2xx status codes are returned and not raised."""
+    all_headers: Dict[str, str] = dict(headers or {})
+    if user_agent:
+        all_headers["User-Agent"] = user_agent
+    return _fetch_through_cache(url, timeout, all_headers, raise_for_status=False)
+
+
 def fetch_html_using_request_lib(
     url: str,
     timeout: Optional[int] = None,
     user_agent: Optional[str] = None,
 ) -> FetchResult:
     timeout = timeout or 10
-    # Workaround for long request time on windows
-    # see https://github.com/psf/requests/issues/4023
-    headers = {"Connection": "close"}
-    # headers = {"Connection": "close"}
+    headers = {}
     if user_agent:
         headers["User-Agent"] = user_agent
-    resp = requests.get(url, timeout=timeout, params={}, headers=headers)
-    resp.raise_for_status()
-    return FetchResult(html=resp.text, status_code=resp.status_code)
+    return _fetch_through_cache(url, timeout, headers, raise_for_status=True)
+
+
+class RegexFieldMatcher:
+    """
+    Streaming matcher that extracts the first group of each named pattern. Every
+    chunk is searched together with the tail of the previous chunk so that matches
+    spanning a chunk boundary are still found.
+    """
+
+    def __init__(self, patterns: Dict[str, Pattern[str]], overlap: int = 1024) -> None:
+        self.patterns = patterns
+        self.overlap = overlap
+        self.fields: Dict[str, str] = {}
+        self._tail = ""
+
+    @property
+    def done(self) -> bool:
+        return len(self.fields) == len(self.patterns)
+
+    def __call__(self, chunk: str) -> bool:
+        text = self._tail + chunk
+        for name, pattern in self.patterns.items():
+            if name in self.fields:
+                continue
+            match = pattern.search(text)
+            if match:
+                self.fields[name] = match.group(1)
+        self._tail = text[-self.overlap :]
+        return self.done
+
+
+def fetch_html_streaming(
+    url: str,
+    matcher: Callable[[str], bool],
+    timeout: Optional[int] = None,
+    user_agent: Optional[str] = CURL_USER_AGENT,
+    chunk_size: int = 16 * 1024,
+) -> FetchResult:
+    """
+    Streams the body of url into matcher chunk by chunk and closes the connection as
+    soon as matcher returns True. The returned html is only the part that was read.
+    """
+    headers = {"User-Agent": user_agent} if user_agent else {}
+    chunks: List[str] = []
+    with http_get(url, timeout=timeout, headers=headers, stream=True) as resp:
+        # Decoded here rather than with decode_unicode=True, which may hand out bytes.
+        decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(errors="replace")
+        for data in resp.iter_content(chunk_size=chunk_size):
+            chunk = decoder.decode(data)
+            chunks.append(chunk)
+            if matcher(chunk):
+                break
+        else:
+            chunks.append(decoder.decode(b"", final=True))
+        return FetchResult(html="".join(chunks), status_code=resp.status_code)
+
+
+# Status code, then curl's cumulative timings and the body size.
+_CURL_WRITE_OUT = "%{http_code} %{time_namelookup} %{time_connect} %{time_appconnect} %{time_starttransfer} %{time_total} %{size_download}"
+
+
+def _parse_curl_write_out(text: str) -> Tuple[int, Dict]:
+    fields = text.strip().replace("'", "").split()
+    status_code = int(fields[0])
+    if len(fields) < 7:
+        return status_code, {}
+    namelookup, connect, appconnect, starttransfer, total = (float(f) for f in fields[1:6])
+    phases = {"dns": namelookup, "connect": connect - namelookup}
+    if appconnect > 0:
+        phases["tls"] = appconnect - connect
+    return status_code, {"total": total, "ttfb": starttransfer, "nbytes": int(float(fields[6])), "phases": phases}
 
 
 def fetch_html_using_curl(url: str, timeout: Optional[int] = None) -> FetchResult:
     """Uses the curl library to fetch HTML and return HTML content and status code."""
-    timeout = int(timeout or 10)
+    # curl only takes whole seconds.
+    timeout = max(1, math.ceil(clamp_timeout(timeout or 10, f"fetching {url}") or 10))
     # Create a temporary directory to store the response and the status code
     with tempfile.TemporaryDirectory() as temp_dir:
         # Define file paths within the temporary directory
@@ -51,12 +303,22 @@ def fetch_html_using_curl(url: str, timeout: Optional[int] = None) -> FetchResul
         status_code_file_path = f"{temp_dir}/status_code.txt"
 
         # Construct curl command to write body to a file and status code to another file
-        command = f"curl --max-time {timeout} -s -o {body_file_path} -w '%{{http_code}}' -X GET {url} > {status_code_file_path}"
-        subprocess.check_output(command, shell=True)
+        command = f"curl --max-time {timeout} -s -o {body_file_path} -w '{_CURL_WRITE_OUT}' -X GET {url} > {status_code_file_path}"
+        get_rate_limiter().acquire(url)
+        try:
+            with get_http_stats().track_in_flight(url):
+                subprocess.check_output(command, shell=True)
+        except subprocess.CalledProcessError as err:
+            if deadline_passed():
+                raise DeadlineExceeded(f"deadline exceeded fetching {url}") from err
+            raise
 
-        # Read the status code from its file
+        # Read the status code and the timings from its file
         with open(status_code_file_path, encoding="utf-8", mode="r") as file:
-            status_code = int(file.read().strip().replace("'", ""))
+            status_code, timings = _parse_curl_write_out(file.read())
+        get_rate_limiter().report(url, status_code)
+        if timings:
+            record_request(url, status_code, **timings)
 
         # Read the response body from its file
         with open(body_file_path, encoding="utf-8", mode="r") as file:
@@ -65,8 +327,5 @@ def fetch_html_using_curl(url: str, timeout: Optional[int] = None) -> FetchResul
     return FetchResult(html=body, status_code=status_code)
 
 
-def fetch_html(url: str) -> FetchResult:
-    if USE_CURL:
-        return fetch_html_using_curl(url)
-    else:
-        return fetch_html_using_request_lib(url)
+def fetch_html(url: str, timeout: Optional[int] = None, user_agent: Optional[str] = CURL_USER_AGENT) -> FetchResult:
+    return fetch_html_pooled(url, timeout=timeout, user_agent=user_agent)
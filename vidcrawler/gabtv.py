@@ -7,32 +7,44 @@ Scraper for gabtv.com
 
 import json
 import re
-import subprocess
 import sys
 from typing import Dict, List
 
-from bs4 import BeautifulSoup  # type: ignore
+import requests
+from bs4 import SoupStrainer  # type: ignore
 
+from .conditional_get import fetch_if_modified, store_if_modified
 from .date import iso_fmt, now_local
 from .error import log_error
+from .fetch_html import CURL_USER_AGENT, fetch_html_pooled
+from .html_parser import make_soup
+from .parse_cache import cached_parse
+from .parse_pool import run_parse
 from .video_info import VideoInfo
 
 _PATTERN_DATA_EPISODE_ID = re.compile('data-episode-id="([^"]*)"')
+# Only the episode list of a channel page is built.
+EPISODE_LIST_STRAINER = SoupStrainer("div", class_="tv-channel-episode-list")
 
 
-def _fetch_html_using_curl(url: str) -> str:
+def _fetch_html(url: str) -> str:
     try:
-        out: bytes = subprocess.check_output("curl --max-time 10 -s -X GET " + url, shell=True)
-        return out.decode("utf-8")
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to fetch {url} with curl: exit code {e.returncode}") from e
+        return fetch_html_pooled(url, timeout=10, user_agent=CURL_USER_AGENT).html
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Failed to fetch {url}: {e}") from e
 
 
 def fetch_views(channel: str) -> Dict[str, str]:
-    out: Dict[str, str] = {}
     html_url: str = f"https://tv.gab.com/channel/{channel}"
-    html_doc: str = _fetch_html_using_curl(html_url)
-    soup = BeautifulSoup(html_doc, "html.parser")
+    html_doc: str = _fetch_html(html_url)
+    return run_parse(parse_views, html_doc, html_url)
+
+
+@cached_parse(version=1)
+def parse_views(html_doc: str, html_url: str) -> Dict[str, str]:
+    """Maps episode ids to their view counts, runs in the parse pool."""
+    out: Dict[str, str] = {}
+    soup = make_soup(html_doc, parse_only=EPISODE_LIST_STRAINER)
     top_dom = soup.find("div", {"class": "tv-channel-episode-list"})
     dom_episodes = top_dom.findAll("div")
     for i, dom_episode in enumerate(dom_episodes):
@@ -50,51 +62,69 @@ def fetch_views(channel: str) -> Dict[str, str]:
     return out
 
 
-def fetch_gabtv_today(channel_name: str, channel_id: str) -> List[VideoInfo]:
-    now_datestr = iso_fmt(now_local())
-    # GabTV does not PUBLISH VIEWS IN IT'S FEED, so scrape them from the html
-    # here.
-    out: List[VideoInfo] = []
-    view_data = fetch_views(channel_id)
-    channel_url = f"https://tv.gab.com/channel/{channel_id}"
-    json_feed_url: str = f"https://tv.gab.com/channel/{channel_id}/feed/json"
-    # Note: Gab.TV currently returns 403 when using the request lib. The
-    # work-around (for now) is to use the curl alternative. Gab should be
-    # notified of this limitation and if possible, we should go back to using
-    # the request lib to fetch this data.
-    json_str = _fetch_html_using_curl(json_feed_url)
+def _parse_json_feed(json_str: str, channel_id: str) -> List[Dict[str, str]]:
+    out: List[Dict[str, str]] = []
     data = json.loads(json_str)
     for item in data["items"]:
         try:
-            url: str = item["url"]
-            id: str = item["id"]
-            title: str = item["title"]
-            # Summary is sometimes empty.
-            summary: str = item.get("summary", "")
-            image: str = item["image"]
-            published_date: str = item["date_modified"]
+            out.append(
+                {
+                    "url": item["url"],
+                    "id": item["id"],
+                    "title": item["title"],
+                    # Summary is sometimes empty.
+                    "summary": item.get("summary", ""),
+                    "image": item["image"],
+                    "published_date": item["date_modified"],
+                }
+            )
         except KeyError as ke:
             log_error(err_str=f"Error while parsing {channel_id} because of {ke}\n")
             continue
+    return out
 
+
+def _fetch_json_feed(channel_id: str) -> List[Dict[str, str]]:
+    json_feed_url: str = f"https://tv.gab.com/channel/{channel_id}/feed/json"
+    # Note: Gab.TV currently returns 403 when using the request lib's default
+    # user agent. The work-around (for now) is to present the curl user agent.
+    try:
+        conditional = fetch_if_modified(json_feed_url, timeout=10, user_agent=CURL_USER_AGENT)
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Failed to fetch {json_feed_url}: {e}") from e
+    if conditional.cached is not None:  # Not modified.
+        return conditional.cached
+    items = _parse_json_feed(conditional.result.html, channel_id)
+    store_if_modified(json_feed_url, conditional, items)
+    return items
+
+
+def fetch_gabtv_today(channel_name: str, channel_id: str) -> List[VideoInfo]:
+    now_datestr = iso_fmt(now_local())
+    # GabTV does not PUBLISH VIEWS IN IT'S FEED, so scrape them from the html
+    # here.
+    out: List[VideoInfo] = []
+    view_data = fetch_views(channel_id)
+    channel_url = f"https://tv.gab.com/channel/{channel_id}"
+    for item in _fetch_json_feed(channel_id):
+        url: str = item["url"]
         # GabTV does not PUBLISH VIEWS IN IT'S FEED.
-        # print(url)
-        views = view_data.get(id)
+        views = view_data.get(item["id"])
         if views is None:
             sys.stderr.write(f"{__file__}: Warning, views for {url} is None\n")
             views = "?"
         vi = VideoInfo(
             channel_name=channel_name,
-            title=title,
-            date_published=published_date,
+            title=item["title"],
+            date_published=item["published_date"],
             date_discovered=now_datestr,
             date_lastupdated=now_datestr,
             channel_url=channel_url,
             source="tv.gab.com",
             url=url,
             duration="?",  # TODO: get this
-            description=summary,
-            img_src=image,
+            description=item["summary"],
+            img_src=item["image"],
             iframe_src="",  # No iframe source yet
             views=views,
             profile_img_src="",
@@ -0,0 +1,70 @@
+"""
+Html parser backend of the scrapers.
+
+Every scraper builds its BeautifulSoup through make_soup() instead of naming a
+parser. The default "auto" uses lxml, a C parser several times faster than the
+pure python html.parser, when it is installed (pip install vidcrawler[fast])
+and falls back to html.parser otherwise. The backend is chosen with
+$VIDCRAWLER_HTML_PARSER or --html-parser. selectolax is not offered: it is not a
+BeautifulSoup tree builder, so it would need a second copy of every scraper.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import importlib.util
+import os
+import sys
+import threading
+from typing import Any, Optional
+
+from bs4 import BeautifulSoup  # type: ignore
+
+ENV_HTML_PARSER = "VIDCRAWLER_HTML_PARSER"
+AUTO = "auto"
+LXML = "lxml"
+HTML_PARSER = "html.parser"
+HTML_PARSERS = (AUTO, LXML, HTML_PARSER)
+
+_PARSER_LOCK = threading.Lock()
+_PARSER: Optional[str] = None
+
+
+def lxml_available() -> bool:
+    return importlib.util.find_spec("lxml") is not None
+
+
+def resolve_html_parser(name: str) -> str:
+    """Maps a requested backend to the BeautifulSoup feature that will parse with it."""
+    if name not in HTML_PARSERS:
+        raise ValueError(f"Unknown html parser {name!r}, expected one of {', '.join(HTML_PARSERS)}")
+    if name == HTML_PARSER:
+        return HTML_PARSER
+    if lxml_available():
+        return LXML
+    if name == LXML:
+        sys.stderr.write(f"lxml is not installed, parsing with {HTML_PARSER}\n")
+    return HTML_PARSER
+
+
+def set_html_parser(name: str) -> str:
+    """Selects the backend of make_soup(), also for the parse pool processes started afterwards."""
+    global _PARSER  # pylint: disable=global-statement
+    with _PARSER_LOCK:
+        _PARSER = resolve_html_parser(name)
+        # Parse pool workers are spawned, they pick the choice up from the environment.
+        os.environ[ENV_HTML_PARSER] = name
+        return _PARSER
+
+
+def get_html_parser() -> str:
+    """The backend of make_soup(), resolved from $VIDCRAWLER_HTML_PARSER on first use."""
+    global _PARSER  # pylint: disable=global-statement
+    with _PARSER_LOCK:
+        if _PARSER is None:
+            _PARSER = resolve_html_parser(os.environ.get(ENV_HTML_PARSER) or AUTO)
+        return _PARSER
+
+
+def make_soup(markup: str, parser: Optional[str] = None, **kwargs: Any) -> BeautifulSoup:
+    """BeautifulSoup(markup) with the selected backend, kwargs (e.g. parse_only) are passed through."""
+    return BeautifulSoup(markup, resolve_html_parser(parser) if parser else get_html_parser(), **kwargs)
@@ -0,0 +1,307 @@
+"""
+Per host http timing statistics.
+
+Every network fetch records its DNS, connect, TLS, time to first byte and total
+time together with the response size and status. New connections are timed by
+the urllib3 connection classes below, the curl fetcher reports the same phases
+through its -w write-out. The collected histograms are exported as a summary
+json and, optionally, as a Prometheus textfile.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import json
+import math
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+PHASES = ("dns", "connect", "tls", "ttfb", "total")
+# Histogram bucket upper bounds in seconds, Prometheus style.
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+_PHASES_LOCAL = threading.local()
+
+
+@dataclass
+class RequestTiming:
+    """Timings in seconds of one request, connection phases are None when a kept-alive connection was reused."""
+
+    host: str
+    status_code: int
+    total: float
+    ttfb: Optional[float] = None
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    tls: Optional[float] = None
+    nbytes: int = 0
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile, capped at the observed max."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        out = []
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            out.append((bound, seen))
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+            "buckets": {_format_bound(bound): count for bound, count in self.cumulative()},
+        }
+
+
+class HostStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.bytes = 0
+        self.new_connections = 0
+        self.status_codes: Dict[int, int] = {}
+        self.phases: Dict[str, Histogram] = {phase: Histogram() for phase in PHASES}
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "new_connections": self.new_connections,
+            "status_codes": {str(code): count for code, count in sorted(self.status_codes.items())},
+            "phases": {phase: hist.to_dict() for phase, hist in self.phases.items()},
+        }
+
+
+class HttpStats:
+    """Thread safe collection of per host request timings."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.hosts: Dict[str, HostStats] = {}
+        self.in_flight: Dict[str, int] = {}
+
+    def record(self, timing: RequestTiming) -> None:
+        with self.lock:
+            host = self.hosts.setdefault(timing.host, HostStats())
+            host.requests += 1
+            host.bytes += timing.nbytes
+            host.status_codes[timing.status_code] = host.status_codes.get(timing.status_code, 0) + 1
+            if timing.connect is not None:
+                host.new_connections += 1
+            for phase in PHASES:
+                value = getattr(timing, phase)
+                if value is not None:
+                    host.phases[phase].observe(value)
+
+    @contextmanager
+    def track_in_flight(self, url: str) -> Iterator[None]:
+        """Counts the request as in flight for the duration of the block."""
+        host = urlparse(url).hostname or ""
+        with self.lock:
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight[host] -= 1
+                if not self.in_flight[host]:
+                    del self.in_flight[host]
+
+    def in_flight_counts(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(sorted(self.in_flight.items()))
+
+    def summary(self) -> Dict:
+        with self.lock:
+            return {"hosts": {name: host.to_dict() for name, host in sorted(self.hosts.items())}}
+
+    def write_summary_json(self, path: str) -> None:
+        _write_atomic(path, json.dumps(self.summary(), indent=2, sort_keys=True))
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP vidcrawler_http_phase_seconds Time spent in each phase of an http request.",
+            "# TYPE vidcrawler_http_phase_seconds histogram",
+        ]
+        with self.lock:
+            hosts = sorted(self.hosts.items())
+            for name, host in hosts:
+                for phase, hist in host.phases.items():
+                    labels = f'host="{name}",phase="{phase}"'
+                    for bound, count in hist.cumulative():
+                        lines.append(f'vidcrawler_http_phase_seconds_bucket{{{labels},le="{_format_bound(bound)}"}} {count}')
+                    lines.append(f"vidcrawler_http_phase_seconds_sum{{{labels}}} {hist.sum:.6f}")
+                    lines.append(f"vidcrawler_http_phase_seconds_count{{{labels}}} {hist.count}")
+            lines.append("# HELP vidcrawler_http_responses_total Responses received per status code.")
+            lines.append("# TYPE vidcrawler_http_responses_total counter")
+            for name, host in hosts:
+                for code, count in sorted(host.status_codes.items()):
+                    lines.append(f'vidcrawler_http_responses_total{{host="{name}",code="{code}"}} {count}')
+            lines.append("# HELP vidcrawler_http_response_bytes_total Response body bytes received.")
+            lines.append("# TYPE vidcrawler_http_response_bytes_total counter")
+            for name, host in hosts:
+                lines.append(f'vidcrawler_http_response_bytes_total{{host="{name}"}} {host.bytes}')
+            lines.append("# HELP vidcrawler_http_new_connections_total Connections opened, the rest reused a kept-alive connection.")
+            lines.append("# TYPE vidcrawler_http_new_connections_total counter")
+            for name, host in hosts:
+                lines.append(f'vidcrawler_http_new_connections_total{{host="{name}"}} {host.new_connections}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_textfile(self, path: str) -> None:
+        # The node exporter may read the file at any time, so it is replaced atomically.
+        _write_atomic(path, self.prometheus_text())
+
+    def reset(self) -> None:
+        with self.lock:
+            self.hosts.clear()
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(bound)
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, encoding="utf-8", mode="w") as filed:
+        filed.write(text)
+    os.replace(tmp_path, path)
+
+
+_HTTP_STATS = HttpStats()
+
+
+def get_http_stats() -> HttpStats:
+    return _HTTP_STATS
+
+
+def begin_request() -> Dict[str, float]:
+    """Starts collecting connection phases for the request about to be issued on this thread."""
+    phases: Dict[str, float] = {}
+    _PHASES_LOCAL.current = phases
+    return phases
+
+
+def _current_phases() -> Dict[str, float]:
+    phases = getattr(_PHASES_LOCAL, "current", None)
+    if phases is None:
+        phases = begin_request()
+    return phases
+
+
+def record_request(url: str, status_code: int, total: float, ttfb: Optional[float] = None, nbytes: int = 0, phases: Optional[Dict[str, float]] = None) -> None:
+    phases = phases or {}
+    get_http_stats().record(
+        RequestTiming(
+            host=urlparse(url).hostname or "",
+            status_code=status_code,
+            total=total,
+            ttfb=ttfb,
+            dns=phases.get("dns"),
+            connect=phases.get("connect"),
+            tls=phases.get("tls"),
+            nbytes=nbytes,
+        )
+    )
+
+
+class _TimedConnectionMixin:
+    """Resolves the host itself so that DNS and TCP connect are timed separately."""
+
+    _dns_host: str
+    port: int
+
+    def _new_conn(self) -> socket.socket:
+        phases = _current_phases()
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            addresses = []
+        resolved = time.perf_counter()
+        phases["dns"] = resolved - start
+        if not addresses:
+            # Let urllib3 raise its usual NameResolutionError.
+            return super()._new_conn()  # type: ignore
+        dns_host = self._dns_host
+        self._dns_host = str(addresses[0][4][0])  # The sockaddr host, ports are ints.
+        try:
+            sock = super()._new_conn()  # type: ignore
+        except (NewConnectionError, ConnectTimeoutError):
+            # The first address is unreachable, fall back to urllib3 trying every address.
+            self._dns_host = dns_host
+            sock = super()._new_conn()  # type: ignore
+        finally:
+            self._dns_host = dns_host
+        phases["connect"] = time.perf_counter() - resolved
+        return sock
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self) -> None:
+        phases = _current_phases()
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        phases["tls"] = max(0.0, elapsed - phases.get("dns", 0.0) - phases.get("connect", 0.0))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections record their DNS, connect and TLS time."""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:  # type: ignore
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
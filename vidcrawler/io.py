@@ -29,6 +29,18 @@ def write_utf8(out_path: str, content: str) -> None:
         fd.write(content)
 
 
+def write_utf8_atomic(out_path: str, content: str) -> None:
+    """Readers see either the previous file or the complete new one, never a partial write."""
+    out_path = os.path.normpath(out_path)
+    dir_path: str = os.path.dirname(out_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fd:
+        fd.write(content)
+    os.replace(tmp_path, out_path)
+
+
 def make_export_json(now: datetime, content: List[Any], network_name: str, telegram: str) -> Dict[str, Any]:
     # Type check, do we have a list of VideoInfo objects? If so convert to a list of dicts.
     if len(content) > 0:
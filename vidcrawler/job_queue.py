@@ -0,0 +1,369 @@
+"""
+Lease based job queue for crawling one channel list with many worker processes.
+
+The coordinator writes one (channel_name, source, channel_id) job per channel
+into a sqlite file. Any number of `vidcrawler worker` processes, on this machine
+or on others that mount the same filesystem, claim jobs under a lease, keep the
+lease alive with heartbeats while they crawl, and store the videos (or the
+error) back into the job. A job whose lease expires, because its worker crashed
+or hung, is handed to the next worker that asks, up to MAX_ATTEMPTS times. Once
+every job is finished the coordinator merges the results into the usual output
+json. Jobs nobody works on for idle_timeout seconds, or still unfinished at the
+crawl deadline, are given up as bad channels so the coordinator always returns. The database uses the rollback journal rather than WAL, which is not safe
+on network filesystems.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .parse_pool import disable_parse_pool, enable_parse_pool
+from .poll_schedule import PollSchedule
+from .spider import (
+    DEFAULT_CHANNEL_TIMEOUT,
+    STRAGGLER_GRACE,
+    crawl_channel,
+    print_bad_channels,
+    select_channels_to_crawl,
+)
+from .video_info import VideoInfo
+
+DEFAULT_LEASE = 120.0
+# A job whose lease expired this many times is given up as a bad channel.
+MAX_ATTEMPTS = 3
+DEFAULT_POLL_INTERVAL = 2.0
+# The coordinator gives up the remaining jobs after this long without a live lease.
+DEFAULT_IDLE_TIMEOUT = 30 * 60.0
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    channel_name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+"""
+
+
+@dataclass
+class Job:
+    job_id: int
+    channel_name: str
+    source: str
+    channel_id: str
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """Thread and process safe sqlite job queue with leases."""
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE, max_attempts: int = MAX_ATTEMPTS) -> None:
+        self.path = os.path.abspath(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit, every write below opens its own BEGIN IMMEDIATE transaction.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql: str, params: Tuple) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rowcount = conn.execute(sql, params).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rowcount
+
+    def enqueue(self, channels: List[Tuple[str, str, str]], crawl_deadline: Optional[float] = None) -> None:
+        """Replaces the queue with one pending job per channel, crawl_deadline (time.time()) is shared with the workers."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM jobs")
+            conn.executemany(
+                "INSERT INTO jobs (channel_name, source, channel_id, state) VALUES (?, ?, ?, ?)",
+                [(name, source, channel_id, PENDING) for name, source, channel_id in channels],
+            )
+            conn.execute("DELETE FROM meta")
+            if crawl_deadline is not None:
+                conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", ("crawl_deadline", crawl_deadline))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def crawl_deadline(self) -> Optional[float]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", ("crawl_deadline",)).fetchone()
+        return None if row is None else row[0]
+
+    def _reap(self, conn: sqlite3.Connection, now: float) -> int:
+        # Leases that ran out too often are given up instead of being retried forever.
+        failed = conn.execute(
+            "UPDATE jobs SET state = ?, worker = NULL, error = ? WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+            (FAILED, "lease expired, worker lost", LEASED, now, self.max_attempts),
+        ).rowcount
+        requeued = conn.execute("UPDATE jobs SET state = ?, worker = NULL WHERE state = ? AND lease_expires < ?", (PENDING, LEASED, now)).rowcount
+        return failed + requeued
+
+    def reap_expired(self, now: Optional[float] = None) -> int:
+        """Requeues the jobs whose lease expired (or fails them after max_attempts), returns how many."""
+        now = now or time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            reaped = self._reap(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return reaped
+
+    def abandon(self, error: str) -> int:
+        """Fails every pending and leased job with error, returns how many."""
+        return self._write("UPDATE jobs SET state = ?, worker = NULL, error = ?, lease_expires = NULL WHERE state IN (?, ?)", (FAILED, error, PENDING, LEASED))
+
+    def claim(self, worker_id: str, now: Optional[float] = None) -> Optional[Job]:
+        """Leases the next pending or expired job to worker_id, None if there is nothing to claim."""
+        now = now or time.time()
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can't claim the same row.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._reap(conn, now)
+            row = conn.execute("SELECT id, channel_name, source, channel_id, attempts FROM jobs WHERE state = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, row[0]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(job_id=row[0], channel_name=row[1], source=row[2], channel_id=row[3], attempts=row[4] + 1)
+
+    def heartbeat(self, job_id: int, worker_id: str, now: Optional[float] = None) -> bool:
+        """Extends the lease, False if the job is no longer leased to worker_id."""
+        now = now or time.time()
+        return self._write("UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = ? AND worker = ?", (now + self.lease_seconds, job_id, LEASED, worker_id)) == 1
+
+    def complete(self, job_id: int, worker_id: str, videos: List[VideoInfo], error: Optional[str] = None) -> bool:
+        """
+        Stores the videos of the job (and the error of a partial result), False (and
+        nothing stored) if the lease was lost to another worker.
+        """
+        result = json.dumps(VideoInfo.to_plain_list(videos), ensure_ascii=False)
+        return self._write("UPDATE jobs SET state = ?, result = ?, error = ?, lease_expires = NULL WHERE id = ? AND state = ? AND worker = ?", (DONE, result, error, job_id, LEASED, worker_id)) == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        return self._write("UPDATE jobs SET state = ?, error = ?, lease_expires = NULL WHERE id = ? AND state = ? AND worker = ?", (FAILED, error, job_id, LEASED, worker_id)) == 1
+
+    def counts(self) -> Dict[str, int]:
+        out = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for state, count in self._connect().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+            out[state] = count
+        return out
+
+    def finished(self) -> bool:
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def results(self) -> Tuple[List[VideoInfo], List[Tuple[str, str]]]:
+        """The videos of the finished jobs and the (channel_name, error) of the failed and partial ones."""
+        videos: List[VideoInfo] = []
+        bad_channels: List[Tuple[str, str]] = []
+        for state, name, result, error in self._connect().execute("SELECT state, channel_name, result, error FROM jobs ORDER BY id"):
+            if state == DONE:
+                videos.extend(VideoInfo.from_list_of_dicts(json.loads(result)))
+            if state == FAILED or (state == DONE and error):
+                bad_channels.append((name, error or ""))
+        return videos, bad_channels
+
+    def crawled_channels(self) -> List[Tuple[str, str, List[VideoInfo]]]:
+        """The (source, channel_id, videos) of the jobs that finished without an error."""
+        return [
+            (source, channel_id, VideoInfo.from_list_of_dicts(json.loads(result)))
+            for source, channel_id, result in self._connect().execute("SELECT source, channel_id, result FROM jobs WHERE state = ? AND error IS NULL ORDER BY id", (DONE,))
+        ]
+
+
+class _Heartbeat:
+    """Renews the leases of the jobs a worker process holds until they finish."""
+
+    def __init__(self, queue: JobQueue, worker_id: str) -> None:
+        self.queue = queue
+        self.worker_id = worker_id
+        self.jobs: Set[int] = set()
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="vidcrawler-heartbeat", daemon=True)
+
+    def _run(self) -> None:
+        while not self.stop.wait(self.queue.lease_seconds / 3):
+            with self.lock:
+                jobs = list(self.jobs)
+            for job_id in jobs:
+                if not self.queue.heartbeat(job_id, self.worker_id):
+                    sys.stderr.write(f"Lost the lease of job {job_id}\n")
+
+
+def run_worker(
+    queue_path: str,
+    worker_id: Optional[str] = None,
+    threads: int = 4,
+    lease_seconds: float = DEFAULT_LEASE,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    parse_processes: Optional[int] = 0,
+    channel_timeout: Optional[float] = DEFAULT_CHANNEL_TIMEOUT,
+) -> int:
+    """
+    Claims and crawls jobs on `threads` threads until the queue is finished,
+    returns the number of jobs this worker completed or failed. Each channel gets
+    channel_timeout seconds, cut to what is left of the coordinator's crawl timeout.
+    """
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    worker_id = worker_id or default_worker_id()
+    # The coordinator's deadline is wall clock time, the crawl measures time.monotonic().
+    deadline = queue.crawl_deadline()
+    crawl_deadline = None if deadline is None else time.monotonic() + deadline - time.time()
+    heartbeat = _Heartbeat(queue, worker_id)
+    heartbeat.thread.start()
+    handled = [0]
+    handled_lock = threading.Lock()
+
+    def work() -> None:
+        while True:
+            job = queue.claim(worker_id)
+            if job is None:
+                if queue.finished():
+                    return
+                time.sleep(poll_interval)  # Jobs are leased by others, one may expire.
+                continue
+            with heartbeat.lock:
+                heartbeat.jobs.add(job.job_id)
+            videos: List[VideoInfo] = []
+            bad_channels: List[Tuple[str, str]] = []
+            try:
+                crawl_channel(job.channel_name, job.source, job.channel_id, videos, bad_channels, channel_timeout=channel_timeout, crawl_deadline=crawl_deadline)
+            finally:
+                with heartbeat.lock:
+                    heartbeat.jobs.discard(job.job_id)
+            error = bad_channels[0][1] if bad_channels else None
+            if error is not None and not videos:
+                queue.fail(job.job_id, worker_id, error)
+            else:
+                queue.complete(job.job_id, worker_id, videos, error=error)
+            with handled_lock:
+                handled[0] += 1
+
+    print(f"Worker {worker_id} on {queue.path}")
+    if parse_processes != 0:
+        enable_parse_pool(parse_processes)
+    try:
+        workers = [threading.Thread(target=work, name=f"vidcrawler-{i}", daemon=True) for i in range(max(1, threads))]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            while thread.is_alive():
+                thread.join(timeout=0.1)
+    finally:
+        heartbeat.stop.set()
+        disable_parse_pool()
+    print(f"Worker {worker_id} handled {handled[0]} jobs")
+    return handled[0]
+
+
+def coordinate(
+    channels: List[Tuple[str, str, str]],
+    queue_path: str,
+    lease_seconds: float = DEFAULT_LEASE,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    poll_schedule: Optional[PollSchedule] = None,
+    crawl_timeout: Optional[float] = None,
+    idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+) -> str:
+    """
+    Queues the channels, waits for the workers to finish them and returns the
+    merged json string, in the same format as crawl_video_sites(). The poll
+    schedule and the bad channel registry pick the channels to queue as they do
+    for a local crawl. Jobs still unfinished STRAGGLER_GRACE seconds after the
+    crawl_timeout, or after idle_timeout seconds without any live lease (no
+    worker is running), are reported as bad channels.
+    """
+    videos: List[VideoInfo] = []
+    bad_channels: List[Tuple[str, str]] = []
+    channels = select_channels_to_crawl(channels, videos, bad_channels, poll_schedule)
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    start = time.time()
+    queue.enqueue(channels, crawl_deadline=None if crawl_timeout is None else start + crawl_timeout)
+    print(f"Queued {len(channels)} channels in {queue.path}, start workers with: vidcrawler worker --job-queue {queue.path}")
+    last_counts: Dict[str, int] = {}
+    idle_since = start
+    while True:
+        now = time.time()
+        queue.reap_expired(now)
+        counts = queue.counts()
+        if counts[PENDING] == 0 and counts[LEASED] == 0:
+            break
+        if counts != last_counts:
+            print(f"Jobs: {counts}")
+            last_counts = counts
+        if counts[LEASED] > 0:
+            idle_since = now
+        if crawl_timeout is not None and now - start >= crawl_timeout + STRAGGLER_GRACE:
+            print(f"Abandoned {queue.abandon('abandoned, still running at the crawl deadline')} jobs at the crawl deadline")
+            break
+        if idle_timeout is not None and now - idle_since >= idle_timeout:
+            print(f"Abandoned {queue.abandon(f'no worker claimed the job in {idle_timeout:.0f} seconds')} jobs, no worker is running")
+            break
+        time.sleep(poll_interval)
+    crawled, failed = queue.results()
+    videos.extend(crawled)
+    bad_channels.extend(failed)
+    if poll_schedule is not None:
+        for source, channel_id, channel_videos in queue.crawled_channels():
+            poll_schedule.record(source, channel_id, channel_videos)
+    bad_channels.sort()
+    print_bad_channels(bad_channels)
+    return json.dumps(VideoInfo.to_plain_list(videos), indent=2, sort_keys=True, ensure_ascii=False)
@@ -0,0 +1,62 @@
+"""
+Last good results per channel.
+
+Every channel that is crawled without an error stores its videos here. Channels
+that are not crawled, because the circuit breaker of their source is open or
+the bad channel registry is backing them off, are written from their last
+results so the output still covers them. Unlike the poll schedule this store
+keeps no timing, writing it never changes when a channel is due.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import os
+import threading
+from typing import List, Optional
+
+from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
+
+from .cache_dir import cache_path
+from .video_info import VideoInfo
+
+DB_LAST_RESULTS = cache_path("last_results.db")
+
+
+class LastResults:
+    """Sqlite backed (source, channel_id) -> videos of the last successful crawl."""
+
+    def __init__(self, path: str = DB_LAST_RESULTS) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = KeyValueDB(path, "last_results")
+
+    def record(self, source: str, channel_id: str, videos: List[VideoInfo]) -> None:
+        self._db.set(f"{source}|{channel_id}", VideoInfo.to_plain_list(videos))
+
+    def get(self, source: str, channel_id: str, channel_name: str) -> List[VideoInfo]:
+        """The videos of the last successful crawl of the channel, attributed to channel_name."""
+        videos = VideoInfo.from_list_of_dicts(self._db.get(f"{source}|{channel_id}") or [])
+        for vid in videos:
+            vid.channel_name = channel_name
+        return videos
+
+
+_RESULTS_LOCK = threading.Lock()
+_RESULTS: Optional[LastResults] = None
+
+
+def enable_last_results(path: str = DB_LAST_RESULTS) -> LastResults:
+    global _RESULTS  # pylint: disable=global-statement
+    with _RESULTS_LOCK:
+        _RESULTS = LastResults(path)
+        return _RESULTS
+
+
+def disable_last_results() -> None:
+    global _RESULTS  # pylint: disable=global-statement
+    with _RESULTS_LOCK:
+        _RESULTS = None
+
+
+def get_last_results() -> Optional[LastResults]:
+    return _RESULTS
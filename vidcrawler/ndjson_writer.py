@@ -0,0 +1,83 @@
+"""
+Streams crawled videos to a newline delimited json file while the crawl runs.
+
+Crawl threads hand the videos of each finished channel to extend(), which only
+blocks once max_buffered videos are waiting to be written. A single writer
+thread appends one json object per line and flushes whenever it catches up, so
+consumers can tail the file while the crawl is still going.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import json
+import queue
+import threading
+from typing import Iterable, List, Optional
+
+from .video_info import VideoInfo
+
+DEFAULT_MAX_BUFFERED = 1024
+
+_CLOSE = object()
+
+
+class NdjsonWriter:
+    """Bounded, thread safe VideoInfo -> ndjson file writer."""
+
+    def __init__(self, path: str, max_buffered: int = DEFAULT_MAX_BUFFERED, append: bool = False) -> None:
+        self.path = path
+        self.count = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_buffered)
+        self._error: Optional[BaseException] = None
+        self._file = open(path, encoding="utf-8", mode="a" if append else "w")  # pylint: disable=consider-using-with
+        self._thread = threading.Thread(target=self._run, name="vidcrawler-ndjson", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _CLOSE:
+                break
+            if self._error is not None:
+                continue  # Keep draining so producers never block on a dead writer.
+            try:
+                self._file.write(json.dumps(item.to_dict(), sort_keys=True, ensure_ascii=False) + "\n")
+                self.count += 1
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as err:  # pylint: disable=broad-except
+                self._error = err
+        self._file.close()
+
+    def extend(self, videos: Iterable[VideoInfo]) -> None:
+        if self._error is not None:
+            raise OSError(f"Writing {self.path} failed: {self._error}") from self._error
+        for vid in videos:
+            self._queue.put(vid)
+
+    def close(self) -> None:
+        """Waits for the buffered videos to be written, raises if any write failed."""
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        if self._error is not None:
+            raise OSError(f"Writing {self.path} failed: {self._error}") from self._error
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_ndjson(path: str) -> List[VideoInfo]:
+    """Reads a file written by NdjsonWriter, a partially written last line is ignored."""
+    out: List[VideoInfo] = []
+    with open(path, encoding="utf-8", mode="r") as filed:
+        for line in filed:
+            if not line.endswith("\n"):
+                break
+            line = line.strip()
+            if line:
+                out.append(VideoInfo.from_dict(json.loads(line)))
+    return out
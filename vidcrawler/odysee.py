@@ -7,9 +7,10 @@ Odysee scrapper.
 from typing import List
 
 import feedparser  # type: ignore
-import requests  # type: ignore
 
+from .conditional_get import fetch_if_modified, store_if_modified
 from .date import iso_fmt, now_local
+from .feed_reader import RSS, iter_feed_entries
 from .video_info import VideoInfo
 
 _TIMEOUT = 10
@@ -49,12 +50,13 @@ def fetch_odysee_today(channel_name: str, channel: str) -> List[VideoInfo]:
     """Fetches the latest videos from odysee.com."""
     url: str = f"https://lbryfeed.melroy.org/channel/odysee/{channel}"
     channel_url: str = f"https://odysee.com/@{channel}"
-    resp = requests.get(url, timeout=_TIMEOUT)
+    cache_key = f"{channel_name}|{url}"
+    conditional = fetch_if_modified(url, key=cache_key, timeout=_TIMEOUT, user_agent=None, raise_for_status=True)
+    if conditional.cached is not None:  # Not modified.
+        return VideoInfo.from_list_of_dicts(conditional.cached)
     now_str: str = iso_fmt(now_local())
-    resp.raise_for_status()
-    feed = feedparser.parse(resp.text)
     out: List[VideoInfo] = []
-    for entry in feed.entries:
+    for entry in iter_feed_entries(conditional.result.html, RSS, after=conditional.window_start):
         vo = _parse_rss_entry(entry)
         vo.channel_name = channel_name
         vo.channel_url = channel_url
@@ -62,4 +64,5 @@ def fetch_odysee_today(channel_name: str, channel: str) -> List[VideoInfo]:
         vo.date_lastupdated = now_str
         if vo:
             out.append(vo)
+    store_if_modified(cache_key, conditional, VideoInfo.to_plain_list(out))
     return out
@@ -0,0 +1,174 @@
+"""
+Content addressed cache of parse results.
+
+Channel pages and feeds often come back byte for byte identical between runs,
+even from sites without http validators. Parse functions decorated with
+@cached_parse(version) look their result up by a blake2b hash of their
+arguments (the response body plus e.g. the channel name), the function name and
+the version, so identical input skips the parse entirely. Bump the version when
+a parser changes what it extracts. Results are pickled, zlib compressed and kept
+in sqlite, the least recently used are evicted past the byte budget. With the
+parse pool enabled run_parse() looks the cache up before handing the document to
+a worker.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from .cache_dir import cache_path
+
+DB_PARSE_CACHE = cache_path("parse_cache.db")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS parses_accessed_at ON parses (accessed_at);
+"""
+
+
+def parse_key(fn: Callable[..., Any], version: int, args: Tuple[Any, ...]) -> str:
+    digest = hashlib.blake2b(f"{fn.__module__}.{fn.__qualname__}|{version}".encode("utf-8"), digest_size=20)
+    for arg in args:
+        digest.update(b"\0")
+        digest.update(arg.encode("utf-8", "surrogatepass") if isinstance(arg, str) else repr(arg).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Thread and process safe key -> parse result cache."""
+
+    def __init__(self, path: str = DB_PARSE_CACHE, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            # Long timeout because other crawler processes may hold the write lock.
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, what: str) -> None:
+        with self.lock:
+            counts = self.counts.setdefault(name, {"hits": 0, "misses": 0})
+            counts[what] += 1
+
+    def get(self, name: str, key: str) -> Tuple[bool, Any]:
+        """Returns (True, result) on a hit, (False, None) otherwise."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM parses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE parses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self._count(name, "misses")
+            return False, None
+        try:
+            value = pickle.loads(zlib.decompress(row[0]))
+        except Exception:  # pylint: disable=broad-except
+            # Written by a version of the code whose classes no longer unpickle.
+            self._count(name, "misses")
+            return False, None
+        self._count(name, "hits")
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO parses (key, value, size, accessed_at) VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the budget so that every put doesn't trigger an eviction.
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        for key, size in conn.execute("SELECT key, size FROM parses ORDER BY accessed_at ASC").fetchall():
+            if freed >= target:
+                break
+            conn.execute("DELETE FROM parses WHERE key = ?", (key,))
+            freed += size
+
+    def size_bytes(self) -> int:
+        with self._connect() as conn:
+            return int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits and misses per parse function in this process."""
+        with self.lock:
+            return {name: dict(counts) for name, counts in sorted(self.counts.items())}
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: Optional[ParseCache] = None
+
+
+def enable_parse_cache(path: str = DB_PARSE_CACHE, max_bytes: int = DEFAULT_MAX_BYTES) -> ParseCache:
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        _CACHE = ParseCache(path, max_bytes=max_bytes)
+        return _CACHE
+
+
+def disable_parse_cache() -> None:
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        _CACHE = None
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    return _CACHE
+
+
+def cached_call(fn: Callable[..., T], args: Tuple[Any, ...], compute: Callable[[], T]) -> T:
+    """compute() for fn(*args), through the parse cache when fn is @cached_parse and the cache is enabled."""
+    cache = _CACHE
+    version: Optional[int] = getattr(fn, "parse_version", None)
+    if cache is None or version is None:
+        return compute()
+    key = parse_key(fn, version, args)
+    found, value = cache.get(f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}", key)
+    if found:
+        return value
+    value = compute()
+    cache.put(key, value)
+    return value
+
+
+def cached_parse(version: int) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Caches the results of a module level parse function by the content of its arguments."""
+
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            return cached_call(wrapper, args + tuple(sorted(kwargs.items())), lambda: fn(*args, **kwargs))
+
+        wrapper.parse_version = version  # type: ignore
+        return wrapper
+
+    return decorator
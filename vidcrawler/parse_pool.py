@@ -0,0 +1,74 @@
+"""
+Process pool for the CPU bound parse stage of a crawl.
+
+The scrapers fetch documents on their I/O threads and hand them to run_parse().
+While the pool is enabled the parse runs in a worker process, so parsing scales
+with the number of cores instead of competing for the GIL with the threads that
+do the fetching. Parse functions must be module level and take and return
+picklable values. With the pool disabled run_parse() calls the function inline.
+"""
+
+# pylint: disable=line-too-long
+
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+from .parse_cache import cached_call
+
+T = TypeVar("T")
+
+_POOL_LOCK = threading.Lock()
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def default_parse_processes() -> int:
+    return os.cpu_count() or 1
+
+
+def enable_parse_pool(max_workers: Optional[int] = None) -> None:
+    """Starts routing run_parse() to a pool of max_workers processes (defaults to the core count)."""
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        # Spawn rather than fork, the crawler forks from a process full of threads.
+        _POOL = ProcessPoolExecutor(max_workers=max_workers or default_parse_processes(), mp_context=multiprocessing.get_context("spawn"))
+
+
+def disable_parse_pool() -> None:
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def parse_pool_enabled() -> bool:
+    return _POOL is not None
+
+
+def run_parse(fn: Callable[..., T], *args: Any) -> T:
+    """Runs fn(*args) in the parse pool if it is enabled, inline otherwise."""
+    pool = _POOL
+    if pool is None:
+        return fn(*args)
+    # Cached parses are looked up here, the workers do not see the parse cache.
+    return cached_call(fn, args, lambda: _run_in_pool(pool, fn, args))
+
+
+def _run_in_pool(pool: ProcessPoolExecutor, fn: Callable[..., T], args: Tuple[Any, ...]) -> T:
+    # A pool shut down under us or a crashed worker must not lose the document.
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool as err:
+        sys.stderr.write(f"Parse pool broken ({err}), parsing {fn.__name__} inline\n")
+    except RuntimeError as err:
+        if pool is _POOL:
+            raise
+        sys.stderr.write(f"Parse pool shut down ({err}), parsing {fn.__name__} inline\n")
+    return fn(*args)
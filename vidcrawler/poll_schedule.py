@@ -0,0 +1,109 @@
+"""
+Adaptive per-channel polling schedule.
+
+Each crawled channel records the publish times of the videos it listed. The mean
+gap between recent uploads (stretched when the channel has been quiet for longer
+than that) estimates how often it uploads, and the channel is polled
+POLLS_PER_UPLOAD times per expected upload, clamped between a floor and a
+ceiling. Channels that are not due are skipped and their last results are reused
+so the output still covers every channel.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
+
+from .cache_dir import cache_path
+from .date import parse_datetime
+from .video_info import VideoInfo
+
+DB_POLL_SCHEDULE = cache_path("poll_schedule.db")
+DEFAULT_MIN_INTERVAL = 30 * 60
+DEFAULT_MAX_INTERVAL = 24 * 60 * 60
+# Polls per expected upload, higher means new videos are picked up sooner.
+POLLS_PER_UPLOAD = 4
+# Upload times kept per channel for the rate estimate.
+MAX_UPLOADS = 20
+
+
+def _publish_times(videos: List[VideoInfo]) -> List[float]:
+    out: List[float] = []
+    for vid in videos:
+        try:
+            date = parse_datetime(vid.date_published, tzinfo="UTC")
+        except Exception:  # pylint: disable=broad-except
+            continue
+        out.append(date.timestamp())
+    return out
+
+
+class PollSchedule:
+    """Sqlite backed schedule, one entry per (source, channel_id)."""
+
+    def __init__(self, path: str = DB_POLL_SCHEDULE, min_interval: float = DEFAULT_MIN_INTERVAL, max_interval: float = DEFAULT_MAX_INTERVAL) -> None:
+        assert 0 < min_interval <= max_interval
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = KeyValueDB(path, "poll_schedule")
+
+    def _entry(self, source: str, channel_id: str) -> Optional[Dict]:
+        return self._db.get(f"{source}|{channel_id}")
+
+    def poll_interval(self, uploads: List[float], first_crawl: float, now: float) -> float:
+        """Seconds until the next poll of a channel with the given upload times."""
+        uploads = sorted(uploads)
+        quiet_since = uploads[-1] if uploads else first_crawl
+        gaps = [b - a for a, b in zip(uploads, uploads[1:]) if b > a]
+        expected = sum(gaps) / len(gaps) if gaps else now - quiet_since
+        # A channel that went quiet for longer than its usual gap is slowing down.
+        expected = max(expected, now - quiet_since)
+        return min(self.max_interval, max(self.min_interval, expected / POLLS_PER_UPLOAD))
+
+    def is_due(self, source: str, channel_id: str, now: Optional[float] = None) -> bool:
+        entry = self._entry(source, channel_id)
+        if entry is None:
+            return True
+        return (now or time.time()) >= entry["next_due"]
+
+    def split(self, channels: List[Tuple[str, str, str]], now: Optional[float] = None) -> Tuple[List[Tuple[str, str, str]], List[Tuple[str, str, str]]]:
+        """Splits (channel_name, source, channel_id) entries into (due, skipped)."""
+        now = now or time.time()
+        due: List[Tuple[str, str, str]] = []
+        skipped: List[Tuple[str, str, str]] = []
+        for channel in channels:
+            (due if self.is_due(channel[1], channel[2], now) else skipped).append(channel)
+        return due, skipped
+
+    def record(self, source: str, channel_id: str, videos: List[VideoInfo], now: Optional[float] = None) -> float:
+        """Records a successful crawl of the channel, returns the seconds until it is due again."""
+        now = now or time.time()
+        entry = self._entry(source, channel_id) or {"first_crawl": now, "uploads": []}
+        uploads = sorted(set(entry["uploads"]) | set(_publish_times(videos)))[-MAX_UPLOADS:]
+        interval = self.poll_interval(uploads, entry["first_crawl"], now)
+        self._db.set(
+            f"{source}|{channel_id}",
+            {
+                "first_crawl": entry["first_crawl"],
+                "uploads": uploads,
+                "last_crawl": now,
+                "next_due": now + interval,
+                "results": VideoInfo.to_plain_list(videos),
+            },
+        )
+        return interval
+
+    def last_results(self, source: str, channel_id: str, channel_name: str) -> List[VideoInfo]:
+        """The videos of the last successful crawl, attributed to channel_name."""
+        entry = self._entry(source, channel_id)
+        if entry is None:
+            return []
+        videos = VideoInfo.from_list_of_dicts(entry["results"])
+        for vid in videos:
+            vid.channel_name = channel_name
+        return videos
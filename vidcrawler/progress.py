@@ -0,0 +1,192 @@
+"""
+Live crawl progress.
+
+The spider reports every channel start and finish here. Per source it counts the
+channels pending, running, done, skipped and failed, the videos found and the channel
+latencies, and together with the requests in flight from the http stats that
+gives a snapshot that shows a stall or a slowdown while the crawl runs. The
+snapshot is published by rewriting a status json file every few seconds and/or
+from a local http endpoint (GET /status).
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from .http_stats import get_http_stats
+from .io import write_utf8_atomic
+
+DEFAULT_STATUS_INTERVAL = 5.0
+# Finished channels remembered per source for the latency percentiles.
+MAX_LATENCIES = 10000
+# Per source counts that are summed into the totals.
+_TOTAL_KEYS = ("channels_pending", "channels_running", "channels_done", "channels_skipped", "errors", "timeouts", "videos")
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class SourceProgress:
+    def __init__(self) -> None:
+        self.pending = 0
+        self.running = 0
+        self.done = 0
+        self.skipped = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.videos = 0
+        self.latencies: List[float] = []
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "channels_pending": self.pending,
+            "channels_running": self.running,
+            "channels_done": self.done,
+            "channels_skipped": self.skipped,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "videos": self.videos,
+            "videos_per_sec": round(self.videos / elapsed, 3) if elapsed > 0 else 0.0,
+            "channels_per_min": round(self.done * 60 / elapsed, 3) if elapsed > 0 else 0.0,
+            "channel_latency_p50": round(_quantile(latencies, 0.5), 3),
+            "channel_latency_p95": round(_quantile(latencies, 0.95), 3),
+        }
+
+
+class CrawlProgress:
+    """Thread safe per source channel counters of the running crawl."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.sources: Dict[str, SourceProgress] = {}
+
+    def start(self, channels: List[Tuple[str, str, str]]) -> None:
+        """Starts a new crawl of the (channel_name, source, channel_id) channels."""
+        with self.lock:
+            self.started_at = time.time()
+            self.sources = {}
+            for _, source, _ in channels:
+                self.sources.setdefault(source, SourceProgress()).pending += 1
+
+    def channel_started(self, source: str) -> None:
+        with self.lock:
+            progress = self.sources.setdefault(source, SourceProgress())
+            progress.pending = max(0, progress.pending - 1)
+            progress.running += 1
+
+    def channel_skipped(self, source: str) -> None:
+        """A pending channel that will not be crawled: the crawl is stopping, out of time or the source's circuit is open."""
+        with self.lock:
+            progress = self.sources.setdefault(source, SourceProgress())
+            progress.pending = max(0, progress.pending - 1)
+            progress.skipped += 1
+
+    def channel_finished(self, source: str, num_videos: int, seconds: float, error: bool = False, timed_out: bool = False) -> None:
+        with self.lock:
+            progress = self.sources.setdefault(source, SourceProgress())
+            progress.running = max(0, progress.running - 1)
+            progress.done += 1
+            progress.videos += num_videos
+            progress.errors += int(error)
+            progress.timeouts += int(timed_out)
+            progress.latencies.append(seconds)
+            del progress.latencies[:-MAX_LATENCIES]
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.lock:
+            elapsed = now - self.started_at
+            sources = {name: progress.to_dict(elapsed) for name, progress in sorted(self.sources.items())}
+            latencies = sorted(latency for progress in self.sources.values() for latency in progress.latencies)
+        totals: Dict[str, Any] = {key: sum(source[key] for source in sources.values()) for key in _TOTAL_KEYS}
+        totals["videos_per_sec"] = round(totals["videos"] / elapsed, 3) if elapsed > 0 else 0.0
+        totals["channel_latency_p50"] = round(_quantile(latencies, 0.5), 3)
+        totals["channel_latency_p95"] = round(_quantile(latencies, 0.95), 3)
+        in_flight = get_http_stats().in_flight_counts()
+        totals["requests_in_flight"] = sum(in_flight.values())
+        return {
+            "time": now,
+            "started_at": self.started_at,
+            "elapsed": round(elapsed, 3),
+            "totals": totals,
+            "sources": sources,
+            "requests_in_flight": in_flight,
+        }
+
+
+_PROGRESS = CrawlProgress()
+
+
+def get_crawl_progress() -> CrawlProgress:
+    return _PROGRESS
+
+
+class StatusPublisher:
+    """Rewrites the status json every interval seconds and/or serves it on 127.0.0.1:port/status."""
+
+    def __init__(self, path: Optional[str] = None, port: Optional[int] = None, interval: float = DEFAULT_STATUS_INTERVAL) -> None:
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        if port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), _StatusHandler)
+            self._server.daemon_threads = True
+
+    @property
+    def port(self) -> Optional[int]:
+        return None if self._server is None else self._server.server_address[1]
+
+    def write(self) -> None:
+        if self.path:
+            write_utf8_atomic(self.path, json.dumps(get_crawl_progress().snapshot(), indent=2, sort_keys=True))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self) -> "StatusPublisher":
+        if self._server is not None:
+            threading.Thread(target=self._server.serve_forever, name="vidcrawler-status-http", daemon=True).start()
+            print(f"Crawl status at http://127.0.0.1:{self.port}/status")
+        if self.path:
+            self.write()
+            self._thread = threading.Thread(target=self._run, name="vidcrawler-status", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Writes the final status and stops publishing."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        if self.path.rstrip("/") not in ("", "/status"):
+            self.send_error(404)
+            return
+        body = json.dumps(get_crawl_progress().snapshot(), indent=2, sort_keys=True).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        pass  # Keep the crawl output readable.
@@ -0,0 +1,148 @@
+"""
+Process wide per-host rate limiting.
+
+Every fetch path takes a token from the bucket of the host it is about to hit.
+When a host answers 429 or 503 its rate is halved and, if it sent Retry-After,
+the host is paused for that long. Successful responses slowly restore the rate
+so the crawler settles at the highest throughput the site tolerates.
+"""
+
+# pylint: disable=line-too-long
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_RATE = 5.0  # Requests per second.
+DEFAULT_BURST = 10.0
+# Known hosts that push back early, (requests per second, burst).
+HOST_RATES: Dict[str, Tuple[float, float]] = {
+    "rumble.com": (2.0, 4.0),
+    "www.bitchute.com": (1.0, 2.0),
+    "www.brighteon.com": (4.0, 8.0),
+}
+THROTTLE_STATUS_CODES = (429, 503)
+# Retries for a request that was throttled.
+MAX_THROTTLE_RETRIES = 2
+# Retry-After values above this pause the host for this long and are not retried.
+MAX_RETRY_AFTER = 120.0
+# Floor for the adaptive slowdown, as a fraction of the configured rate.
+_MIN_RATE_FRACTION = 1.0 / 32
+# Fraction of the configured rate restored after each successful request.
+_RECOVERY_FRACTION = 0.05
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header, which is either seconds or an http date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread safe token bucket with multiplicative slowdown and additive recovery."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """Blocks until a token is available, returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                wait = max(self.blocked_until - now, (1.0 - self.tokens) / self.rate)
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self.rate = max(self.base_rate * _MIN_RATE_FRACTION, self.rate / 2.0)
+            self.tokens = 0.0
+            self.updated = now
+            pause = min(retry_after, MAX_RETRY_AFTER) if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+
+    def reward(self) -> None:
+        with self.lock:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * _RECOVERY_FRACTION)
+
+
+class RateLimitRegistry:
+    """Holds one token bucket per host."""
+
+    def __init__(self, default_rate: float = DEFAULT_RATE, default_burst: float = DEFAULT_BURST) -> None:
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.host_rates: Dict[str, Tuple[float, float]] = dict(HOST_RATES)
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def configure_host(self, host: str, rate: float, burst: Optional[float] = None) -> None:
+        with self.lock:
+            self.host_rates[host] = (rate, burst if burst is not None else max(1.0, rate))
+            self.buckets.pop(host, None)
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).hostname or ""
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate, burst = self.host_rates.get(host, (self.default_rate, self.default_burst))
+                bucket = TokenBucket(rate, burst)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        return self.bucket(url).acquire()
+
+    def report(self, url: str, status_code: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Feeds the response status back into the host's bucket. Returns the pause in
+        seconds for throttled responses, None otherwise.
+        """
+        bucket = self.bucket(url)
+        if status_code in THROTTLE_STATUS_CODES:
+            pause = parse_retry_after(retry_after)
+            bucket.penalize(pause)
+            return pause if pause is not None else 0.0
+        if 200 <= status_code < 400:
+            bucket.reward()
+        return None
+
+
+_REGISTRY_LOCK = threading.Lock()
+_REGISTRY: Optional[RateLimitRegistry] = None
+
+
+def get_rate_limiter() -> RateLimitRegistry:
+    global _REGISTRY  # pylint: disable=global-statement
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = RateLimitRegistry()
+        return _REGISTRY
@@ -0,0 +1,199 @@
+"""
+On-disk http response cache shared by every process on the machine.
+
+Bodies are stored zlib compressed in sqlite, keyed by url. Each url gets the
+ttl of the first rule whose regex matches it, and the least recently used
+entries are evicted once the cache grows past its byte budget. Hit and miss
+counters are kept per rule in the same database so the ttls can be tuned per
+source across runs.
+"""
+
+# pylint: disable=line-too-long
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+ENV_HTTP_CACHE = "VIDCRAWLER_HTTP_CACHE"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_RULE = "default"
+
+# (regex, ttl seconds), first match wins. A ttl of 0 disables caching.
+DEFAULT_TTL_RULES: List[Tuple[str, float]] = [
+    (r"youtube\.com/feeds/videos\.xml", 10 * 60),
+    (r"youtube\.com/watch", 24 * 60 * 60),
+    (r"open\.spotify\.com/episode/", 24 * 60 * 60),
+    (r"rumble\.com/(c|user)/", 15 * 60),
+    (r"bitchute\.com/feeds/rss/", 10 * 60),
+    (r"bitchute\.com/channel/", 15 * 60),
+    (r"brighteon\.com/api-v3/channels/", 10 * 60),
+    (r"brighteon\.com/", 60 * 60),
+    (r"tv\.gab\.com/", 10 * 60),
+    (r"spreaker\.com/", 10 * 60),
+    (r"lbryfeed\.melroy\.org/", 10 * 60),
+]
+DEFAULT_TTL = 5 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status_code INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    rule TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    stores INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class ResponseCache:
+    """Thread and process safe url -> (status_code, body) cache."""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_rules: Optional[List[Tuple[str, float]]] = None,
+        default_ttl: float = DEFAULT_TTL,
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        rules = DEFAULT_TTL_RULES if ttl_rules is None else ttl_rules
+        self.ttl_rules = [(pattern, re.compile(pattern), ttl) for pattern, ttl in rules]
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            # Long timeout because other crawler processes may hold the write lock.
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def rule_for(self, url: str) -> Tuple[str, float]:
+        for pattern, regex, ttl in self.ttl_rules:
+            if regex.search(url):
+                return pattern, ttl
+        return DEFAULT_RULE, self.default_ttl
+
+    def _count(self, conn: sqlite3.Connection, rule: str, column: str, amount: int = 1) -> None:
+        conn.execute("INSERT OR IGNORE INTO stats (rule) VALUES (?)", (rule,))
+        conn.execute(f"UPDATE stats SET {column} = {column} + ? WHERE rule = ?", (amount, rule))
+
+    def get(self, url: str) -> Optional[Tuple[int, str]]:
+        """Returns (status_code, body) if the url is cached and fresh."""
+        rule, ttl = self.rule_for(url)
+        if ttl <= 0:
+            return None
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT status_code, body, stored_at FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None or now - row[2] > ttl:
+                self._count(conn, rule, "misses")
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+            self._count(conn, rule, "hits")
+        return int(row[0]), zlib.decompress(row[1]).decode("utf-8")
+
+    def put(self, url: str, status_code: int, body: str) -> None:
+        rule, ttl = self.rule_for(url)
+        if ttl <= 0:
+            return
+        data = zlib.compress(body.encode("utf-8"))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (url, status_code, body, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, status_code, data, len(data), now, now),
+            )
+            self._count(conn, rule, "stores")
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the budget so that every put doesn't trigger an eviction.
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        evicted: Dict[str, int] = {}
+        for url, size in conn.execute("SELECT url, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            if freed >= target:
+                break
+            conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            freed += size
+            rule = self.rule_for(url)[0]
+            evicted[rule] = evicted.get(rule, 0) + 1
+        for rule, count in evicted.items():
+            self._count(conn, rule, "evictions", count)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per rule hit/miss counters, accumulated over every process using this cache."""
+        out: Dict[str, Dict[str, float]] = {}
+        with self._connect() as conn:
+            for rule, hits, misses, stores, evictions in conn.execute("SELECT rule, hits, misses, stores, evictions FROM stats ORDER BY rule"):
+                lookups = hits + misses
+                out[rule] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "stores": stores,
+                    "evictions": evictions,
+                    "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                }
+        return out
+
+    def size_bytes(self) -> int:
+        with self._connect() as conn:
+            return int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0])
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM stats")
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: Optional[ResponseCache] = None
+_CACHE_FROM_ENV_CHECKED = False
+
+
+def enable_response_cache(path: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl_rules: Optional[List[Tuple[str, float]]] = None) -> ResponseCache:
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        _CACHE = ResponseCache(path, max_bytes=max_bytes, ttl_rules=ttl_rules)
+        return _CACHE
+
+
+def disable_response_cache() -> None:
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        _CACHE = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the active cache, enabling it from $VIDCRAWLER_HTTP_CACHE on first use."""
+    global _CACHE, _CACHE_FROM_ENV_CHECKED  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None and not _CACHE_FROM_ENV_CHECKED:
+            _CACHE_FROM_ENV_CHECKED = True
+            env_path = os.environ.get(ENV_HTTP_CACHE)
+            if env_path:
+                _CACHE = ResponseCache(env_path)
+        return _CACHE
@@ -5,20 +5,31 @@ Rumble scrapper.
 # pylint: disable=line-too-long,missing-function-docstring,consider-using-f-string,too-many-locals,invalid-name,no-else-return,fixme,too-many-branches,too-many-statements
 # mypy: ignore-errors
 
+import subprocess
 import sys
 import traceback
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import Iterator, List, Tuple
 
-from bs4 import BeautifulSoup  # type: ignore
+from bs4 import BeautifulSoup, SoupStrainer  # type: ignore
 
+from .crawl_state import channel_state
 from .date import iso_fmt, now_local, timestamp_to_iso8601
-from .fetch_html import FetchResult
-from .fetch_html import fetch_html_using_curl as fetch_html
+from .deadline import PartialResultError, bind_deadline, keep_partial
+from .fetch_html import FetchResult, fetch_html
+from .html_parser import make_soup
+from .parse_cache import cached_parse
+from .parse_pool import run_parse
 from .video_info import VideoInfo
-from .ytdlp import fetch_video_info
+from .ytdlp import fetch_video_info, fetch_video_infos, get_max_processes_per_host
+
+# Only the video tiles of a listing page are built, not the header, footer, scripts and ads around them.
+CHANNEL_PAGE_STRAINER = SoupStrainer("div", class_="videostream thumbnail__grid--item")
+# Videos resolved by one yt-dlp process.
+RESOLVE_BATCH_SIZE = 8
 
 
 @dataclass
@@ -101,11 +112,10 @@ def fetch_rumble_channel_today_legacy(channel_name: str, channel: str) -> List[V
     fetch_response: RumbleResponse = fetch_rumble(channel)
     html_doc = fetch_response.html_doc
     channel_url = fetch_response.channel_url
-    fetch_response = fetch_rumble_channel_url(channel_url)
     if not fetch_response.fetch_result.ok:
         warnings.warn(f"Failed to fetch {channel_url}")
         return []
-    soup = BeautifulSoup(html_doc, "html.parser")
+    soup = make_soup(html_doc, parse_only=CHANNEL_PAGE_STRAINER)
     for article in soup.find_all("div", class_="videostream thumbnail__grid--item"):
         try:
             article_duration_dom = article.find(class_="videostream__status--duration")  # type: ignore
@@ -148,19 +158,23 @@ def fetch_rumble_channel_today_legacy(channel_name: str, channel: str) -> List[V
 
 
 def fetch_rumble_channel_today_partial_result(channel_name: str, channel: str) -> list[PartialVideo]:
-    out: List[PartialVideo] = []
     html_doc: str = ""
     channel_url: str = ""
     # html_doc, channel_url = fetch_rumble(channel)
     response: RumbleResponse = fetch_rumble(channel)
     html_doc = response.html_doc
     channel_url = response.channel_url
-    fetch_response = fetch_rumble_channel_url(channel_url)
-    if not fetch_response.fetch_result.ok:
+    if not response.fetch_result.ok:
         warnings.warn(f"Failed to fetch {channel_url}")
         return []
+    return run_parse(parse_channel_page_today, html_doc, channel_name, channel_url)
 
-    soup = BeautifulSoup(html_doc, "html.parser")
+
+@cached_parse(version=1)
+def parse_channel_page_today(html_doc: str, channel_name: str, channel_url: str) -> list[PartialVideo]:
+    """Parses the videos listed on a channel page, runs in the parse pool."""
+    out: List[PartialVideo] = []
+    soup = make_soup(html_doc, parse_only=CHANNEL_PAGE_STRAINER)
     for article in soup.find_all("div", class_="videostream thumbnail__grid--item"):
         try:
             article_duration_dom = article.find(class_="videostream__status--duration")
@@ -253,6 +267,39 @@ def parse_fuzzy_date(datestr: str) -> datetime:
     return datetime.strptime(datestr, "%B %d, %Y")
 
 
+@cached_parse(version=1)
+def parse_channel_page(html_doc: str, channel_name: str, channel_url: str, after: datetime | None = None) -> list[PartialVideo]:
+    """Parses one page of a paged channel listing, runs in the parse pool."""
+    out: List[PartialVideo] = []
+    soup = make_soup(html_doc, parse_only=CHANNEL_PAGE_STRAINER)
+    for article in soup.find_all("div", class_="videostream thumbnail__grid--item"):
+        try:
+            duration = parse_duration(article)
+            vid_src_suffix = article.find("a", class_="videostream__link link")["href"]
+            vid_src = f"https://rumble.com{vid_src_suffix}"
+            fuzzy_date = parse_date(article)
+            date = parse_fuzzy_date(fuzzy_date)
+            title = parse_title(article)
+            if after is not None and date < after:
+                continue
+            videoid = vid_src.split("/")[-1]
+            videoid = videoid.split("-")[0]
+            partial_video: PartialVideo = PartialVideo(
+                url=vid_src,
+                title=title,
+                duration=duration,
+                videoid=videoid,
+                channel_url=channel_url,
+                channel_name=channel_name,
+                date=date,
+            )
+            out.append(partial_video)
+        except BaseException as e:  # pylint: disable=broad-except
+            s = "".join(traceback.format_exception(None, e, e.__traceback__))
+            sys.stdout.write("Error: %s\nCould not parse\n%s\n\n" % (str(s), str(article)))
+    return out
+
+
 def fetch_rumble_channel_all_partial_result(channel_name: str, channel: str, after: datetime | None = None) -> list[PartialVideo]:
     out: List[PartialVideo] = []
     page = 1
@@ -272,8 +319,8 @@ def fetch_rumble_channel_all_partial_result(channel_name: str, channel: str, aft
             page += 1
             html_doc: str = ""
             current_channel_url = get_channel_url(channel, curr_page, is_user_channel)
-            # html_doc = fetch_rumble_channel_url(current_channel_url)
-            fetch_result: FetchResult = fetch_html(current_channel_url)
+            # The probe above already fetched the first page.
+            fetch_result: FetchResult = fetch_response if curr_page == 1 else fetch_html(current_channel_url)
             if fetch_result.ok:
                 html_doc = fetch_result.html
             else:
@@ -282,32 +329,7 @@ def fetch_rumble_channel_all_partial_result(channel_name: str, channel: str, aft
                     break  # expected result when we've reached the end of the channel.
                 warnings.warn(f"Failed to fetch {current_channel_url}")
                 break
-            soup = BeautifulSoup(html_doc, "html.parser")
-            for article in soup.find_all("div", class_="videostream thumbnail__grid--item"):
-                try:
-                    duration = parse_duration(article)
-                    vid_src_suffix = article.find("a", class_="videostream__link link")["href"]
-                    vid_src = f"https://rumble.com{vid_src_suffix}"
-                    fuzzy_date = parse_date(article)
-                    date = parse_fuzzy_date(fuzzy_date)
-                    title = parse_title(article)
-                    if after is not None and date < after:
-                        continue
-                    videoid = vid_src.split("/")[-1]
-                    videoid = videoid.split("-")[0]
-                    partial_video: PartialVideo = PartialVideo(
-                        url=vid_src,
-                        title=title,
-                        duration=duration,
-                        videoid=videoid,
-                        channel_url=current_channel_url,
-                        channel_name=channel_name,
-                        date=date,
-                    )
-                    out.append(partial_video)
-                except BaseException as e:  # pylint: disable=broad-except
-                    s = "".join(traceback.format_exception(None, e, e.__traceback__))
-                    sys.stdout.write("Error: %s\nCould not parse\n%s\n\n" % (str(s), str(article)))
+            out.extend(run_parse(parse_channel_page, html_doc, channel_name, current_channel_url, after))
         except KeyboardInterrupt:
             raise
         except SystemExit:  # pylint: disable=try-except-raise
@@ -317,10 +339,8 @@ def fetch_rumble_channel_all_partial_result(channel_name: str, channel: str, aft
     return out
 
 
-def resolve(rumble_partial: PartialVideo) -> VideoInfo:
+def _to_video_info(rumble_partial: PartialVideo, video_obj: dict) -> VideoInfo:
     vid_src = rumble_partial.url
-    sys.stdout.write("  visiting video %s (%s)\n" % (rumble_partial.channel_name, vid_src))
-    video_obj = fetch_video_info(vid_src)
     video_id = video_obj["id"]
     title = video_obj["fulltitle"]
     iframe_src = rumble_video_id_to_embed_url(video_id)
@@ -358,13 +378,87 @@ def resolve(rumble_partial: PartialVideo) -> VideoInfo:
     return o
 
 
+def resolve(rumble_partial: PartialVideo) -> VideoInfo:
+    vid_src = rumble_partial.url
+    sys.stdout.write("  visiting video %s (%s)\n" % (rumble_partial.channel_name, vid_src))
+    return _to_video_info(rumble_partial, fetch_video_info(vid_src))
+
+
+def _resolve_batch(batch: List[PartialVideo]) -> Tuple[List[PartialVideo], dict]:
+    sys.stdout.write("  visiting %d videos of %s\n" % (len(batch), batch[0].channel_name))
+    try:
+        return batch, fetch_video_infos([partial.url for partial in batch])
+    except subprocess.CalledProcessError as err:
+        # The other batches still count, the caller sees these videos as unresolved.
+        warnings.warn(f"yt-dlp could not resolve any of {len(batch)} videos of {batch[0].channel_name}: {err.stderr}")
+        return batch, {}
+    except subprocess.TimeoutExpired:
+        warnings.warn(f"yt-dlp timed out resolving {len(batch)} videos of {batch[0].channel_name}")
+        return batch, {}
+
+
+def iter_resolved(partials: List[PartialVideo], batch_size: int = RESOLVE_BATCH_SIZE) -> Iterator[Tuple[PartialVideo, VideoInfo]]:
+    """
+    Resolves the partials batch_size videos per yt-dlp process, with as many
+    processes in parallel as the per host limit allows, yielding every partial
+    with its VideoInfo as its batch completes. Videos yt-dlp fails on, or whole
+    batches it fails on, are skipped.
+    """
+    batches = [partials[i : i + batch_size] for i in range(0, len(partials), batch_size)]
+    if not batches:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(len(batches), get_max_processes_per_host()), thread_name_prefix="rumble-resolve")
+    try:
+        futures = [executor.submit(bind_deadline(_resolve_batch), batch) for batch in batches]
+        for future in as_completed(futures):
+            batch, video_objs = future.result()
+            for partial in batch:
+                video_obj = video_objs.get(partial.url)
+                if video_obj is not None:
+                    yield partial, _to_video_info(partial, video_obj)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def resolve_many(partials: List[PartialVideo], batch_size: int = RESOLVE_BATCH_SIZE) -> List[VideoInfo]:
+    """Bulk resolve(), in the order of partials, without the videos yt-dlp failed on."""
+    resolved = {partial.url: vinfo for partial, vinfo in iter_resolved(partials, batch_size)}
+    return [resolved[partial.url] for partial in partials if partial.url in resolved]
+
+
 def fetch_rumble_channel_today(channel_name: str, channel: str) -> List[VideoInfo]:
-    # use the partial result, then full resolve
+    # use the partial result, then resolve the unknown videos in bulk
     partial_result = fetch_rumble_channel_today_partial_result(channel_name, channel)
     output: List[VideoInfo] = []
-    for partial in partial_result:
-        vinfo = resolve(partial)
-        output.append(vinfo)
+    with channel_state("rumble", channel) as state, keep_partial(output):
+        vinfos: dict[str, VideoInfo] = {}
+        pending: List[PartialVideo] = []
+        for partial in partial_result:
+            vinfo = state.lookup(partial.url)
+            if vinfo is None:
+                pending.append(partial)
+                continue
+            vinfos[partial.url] = vinfo
+            output.append(vinfo)
+        for partial, vinfo in iter_resolved(pending):
+            state.store(partial.url, vinfo)
+            vinfos[partial.url] = vinfo
+            output.append(vinfo)
+        unresolved = 0
+        for partial in pending:
+            if partial.url in vinfos:
+                continue
+            # A known video that was only picked for a refresh keeps what is known about it.
+            known = state.known(partial.url)
+            if known is None:
+                unresolved += 1
+            else:
+                vinfos[partial.url] = known
+        # Batches complete in any order, the channel's videos are listed as on the page.
+        output[:] = [vinfos[partial.url] for partial in partial_result if partial.url in vinfos]
+    if unresolved:
+        # Reported as a channel error, a channel losing most of its videos must not look healthy.
+        raise PartialResultError(f"yt-dlp could not resolve {unresolved} of {len(partial_result)} videos", partial=output)
     return output
 
 
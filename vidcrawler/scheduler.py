@@ -0,0 +1,98 @@
+"""
+Channel scheduler of the crawl threads.
+
+A bounded pool of workers pulls (channel_name, source, channel_id) jobs from one
+shared queue. A worker takes the first pending job whose source is below its
+concurrency cap, so a source with many or slow channels keeps every idle worker
+busy instead of serializing on a single thread, while no source gets more
+simultaneous channels than it tolerates. run() can be given a timeout after
+which the jobs that are still running or pending are abandoned.
+"""
+
+# pylint: disable=line-too-long
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+ChannelJob = Tuple[str, str, str]  # (channel_name, source, channel_id)
+
+DEFAULT_MAX_WORKERS = 32
+
+
+class ChannelScheduler:
+    """Runs run_job for every job on at most max_workers threads, max_per_source at a time per source."""
+
+    def __init__(
+        self,
+        run_job: Callable[[str, str, str], None],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_per_source: int = 1,
+        source_limits: Optional[Dict[str, int]] = None,
+    ) -> None:
+        assert max_workers > 0 and max_per_source > 0
+        self.run_job = run_job
+        self.max_workers = max_workers
+        self.max_per_source = max_per_source
+        self.source_limits: Dict[str, int] = dict(source_limits or {})
+        self._cond = threading.Condition()
+        self._pending: List[ChannelJob] = []
+        self._running: Dict[str, int] = {}
+        self._active: List[ChannelJob] = []
+
+    def limit_for(self, source: str) -> int:
+        return self.source_limits.get(source, self.max_per_source)
+
+    def _next_job(self) -> Optional[ChannelJob]:
+        # Called with self._cond held.
+        while self._pending:
+            for i, job in enumerate(self._pending):
+                source = job[1]
+                if self._running.get(source, 0) < self.limit_for(source):
+                    del self._pending[i]
+                    self._running[source] = self._running.get(source, 0) + 1
+                    self._active.append(job)
+                    return job
+            # Every pending job belongs to a source at its cap, wait for one to finish.
+            self._cond.wait()
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+            if job is None:
+                return
+            try:
+                self.run_job(*job)
+            finally:
+                with self._cond:
+                    self._running[job[1]] -= 1
+                    if job in self._active:  # Not there once run() abandoned it.
+                        self._active.remove(job)
+                    self._cond.notify_all()
+
+    def run(self, jobs: List[ChannelJob], timeout: Optional[float] = None) -> List[ChannelJob]:
+        """
+        Blocks until every job has run or timeout seconds passed. Returns the jobs
+        that were abandoned, still running (their threads are left behind) or never started.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._pending.extend(jobs)
+        threads = []
+        for i in range(max(1, min(self.max_workers, len(jobs)))):
+            thread = threading.Thread(target=self._worker, name=f"vidcrawler-{i}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        # Joining with a timeout keeps the main thread responsive to KeyboardInterrupt.
+        for thread in threads:
+            while thread.is_alive():
+                if end is not None and time.monotonic() >= end:
+                    with self._cond:
+                        abandoned = self._active + self._pending
+                        self._pending = []
+                        self._active = []
+                    return abandoned
+                thread.join(timeout=0.1)
+        return []
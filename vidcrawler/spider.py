@@ -3,20 +3,29 @@
 # pylint: disable=line-too-long,missing-function-docstring,consider-using-f-string,too-many-locals,invalid-name,no-else-return
 
 import json
-import queue
 import random
-import signal
-import sys
 import threading
 import time
 import traceback
-from typing import Any, Dict, List, Tuple
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from .bad_channels import get_bad_channel_registry
 from .bitchute import fetch_bitchute_today
 from .brighteon import fetch_brighteon_today
+from .circuit_breaker import CircuitOpenError, get_source_breakers
+from .deadline import DeadlineExceeded, PartialResultError, deadline_at
+from .fetch_html import configure_http_pool
 from .gabtv import fetch_gabtv_today
+from .last_results import get_last_results
+from .ndjson_writer import DEFAULT_MAX_BUFFERED, NdjsonWriter
 from .odysee import fetch_odysee_today
+from .parse_pool import disable_parse_pool, enable_parse_pool, parse_pool_enabled
+from .poll_schedule import PollSchedule
+from .progress import get_crawl_progress
 from .rumble import fetch_rumble_channel_today
+from .scheduler import DEFAULT_MAX_WORKERS, ChannelScheduler
 from .spotify import fetch_spotify_today
 from .spreaker import fetch_spreaker_today
 from .video_info import VideoInfo
@@ -42,146 +51,218 @@ CRAWLER_MAP = {
     SPOTIFY: fetch_spotify_today,
 }
 
+# Concurrency defaults, channels of one source and http connections to one host at a time.
+DEFAULT_MAX_PER_SOURCE = 16
+DEFAULT_MAX_PER_HOST = 16
+# Deadlines. A channel gets channel_timeout seconds, cut to what is left of the
+# crawl_timeout. Channels still running STRAGGLER_GRACE seconds after the crawl
+# deadline are abandoned.
+DEFAULT_CHANNEL_TIMEOUT = 10 * 60
+STRAGGLER_GRACE = 30
+
 _SCRAPE_RANDOMIZE_ORDER = True
-_YT_SCRAPER_ENABLE_THREADS = True
-_YT_SCRAPER_ENABLE_THREADS = False
 
 # type: ignore
 
 
-def _fetch_all(
-    source_name: str,
-    fetch_list: List[Tuple[str, str]],
-    out_queue: queue.Queue,
-    bad_channels: queue.Queue,
+def crawl_channel(
+    channel_name: str,
+    source: str,
+    channel_id: str,
+    out_videos: Any,
+    out_bad_channels: List[Tuple[str, str]],
+    poll_schedule: Optional[PollSchedule] = None,
+    stop: Optional[threading.Event] = None,
+    channel_timeout: Optional[float] = None,
+    crawl_deadline: Optional[float] = None,
+    aliases: Sequence[str] = (),
 ) -> None:
-    callback = CRAWLER_MAP[source_name]
-    if _SCRAPE_RANDOMIZE_ORDER:
-        random.shuffle(fetch_list)
-
-    def do_fetch(fetch_list: List, callback: Any) -> None:
-        for channel_name, channel_id in fetch_list:
-            try:
-                videos = callback(channel_name, channel_id)  # type: ignore
-                for vid in videos:
-                    out_queue.put(vid)
-            except KeyboardInterrupt:
-                sys.exit(1)
-            except BaseException as e:
-                traceback.print_exc()
-                entry = (channel_name, str(e))
-                bad_channels.put(entry)
-                continue
-
-    if source_name != YOUTUBE:
-        do_fetch(fetch_list, callback)
+    """
+    Crawls one channel into out_videos (a list or anything with extend()), failures are recorded as bad channels.
+    The crawl runs under a deadline of channel_timeout seconds, or less if the crawl_deadline (time.monotonic()) is
+    closer. A channel that runs out of time keeps the videos it resolved and is reported as timed out, one whose
+    scraper raises PartialResultError keeps the videos it carries and is reported with its error. Other
+    names of the same (source, channel_id) in aliases get a copy of its videos and of its errors.
+    """
+    channel_videos = _AliasedVideos(out_videos, channel_name, aliases)
+    channel_errors = _AliasedErrors(out_bad_channels, channel_name, aliases)
+    progress = get_crawl_progress()
+    if stop is not None and stop.is_set():
+        progress.channel_skipped(source)
+        return  # Draining, channels that have not started yet are dropped.
+    if crawl_deadline is not None and time.monotonic() >= crawl_deadline:
+        channel_errors.record("skipped, crawl deadline reached")
+        progress.channel_skipped(source)
         return
-    if not _YT_SCRAPER_ENABLE_THREADS:
-        do_fetch(fetch_list, callback)
+    breakers = get_source_breakers()
+    results = get_last_results()
+    if breakers is not None and not breakers.allow(source):
+        # The source keeps failing, don't wait for this channel to fail as well.
+        if results is not None:
+            channel_videos.extend(results.get(source, channel_id, channel_name))
+        progress.channel_skipped(source)
         return
-    # YouTube and threads enabled.
-    num_workers = 4
-    thread_data = [[] for _ in range(num_workers)]  # type: ignore
-    for i, data in enumerate(fetch_list):
-        idx = i % num_workers
-        thread_data[idx].append(data)
-    threads = []
-    for tdata in thread_data:
-        thread = threading.Thread(target=do_fetch, args=(tdata, callback))
-        thread.daemon = True
-        thread.start()
-        threads.append(thread)
-    for t in threads:
-        t.join()
-
-
-def _yield_thread_for_keyboard_interrupt() -> None:
-    if sys.platform == "win32":
-        time.sleep(0.1)
-    else:
-        try:
-            # might be missing on some platforms.
-            signal.pause()  # pylint: disable-all
-        except BaseException:
-            time.sleep(0.1)
+    registry = get_bad_channel_registry()
+    ends = [end for end in (crawl_deadline, None if channel_timeout is None else time.monotonic() + channel_timeout) if end is not None]
+    callback = CRAWLER_MAP[source]
+    progress.channel_started(source)
+    start = time.monotonic()
+    try:
+        with deadline_at(min(ends) if ends else None):
+            videos = callback(channel_name, channel_id)
+        channel_videos.extend(videos)
+    except DeadlineExceeded as e:
+        channel_videos.extend(e.partial)
+        channel_errors.record(f"timed out ({e}), kept {len(e.partial)} videos")
+        progress.channel_finished(source, len(e.partial), time.monotonic() - start, timed_out=True)
+        if breakers is not None:
+            breakers.record_failure(source)
+        if registry is not None and not e.partial:
+            registry.record_failure(channel_name, source, channel_id, str(e))
+        return
+    except PartialResultError as e:
+        channel_videos.extend(e.partial)
+        channel_errors.record(f"{e}, kept {len(e.partial)} videos")
+        progress.channel_finished(source, len(e.partial), time.monotonic() - start, error=True)
+        if registry is not None and not e.partial:
+            registry.record_failure(channel_name, source, channel_id, str(e))
+        return
+    except Exception as e:  # pylint: disable=broad-except
+        if not isinstance(e, CircuitOpenError):
+            traceback.print_exc()
+        channel_errors.record(str(e))
+        progress.channel_finished(source, 0, time.monotonic() - start, error=True)
+        if breakers is not None:
+            breakers.record_failure(source)
+        # A host that is down is not the channel's fault.
+        if registry is not None and not isinstance(e, CircuitOpenError):
+            registry.record_failure(channel_name, source, channel_id, str(e))
+        return
+    progress.channel_finished(source, len(videos), time.monotonic() - start)
+    if breakers is not None:
+        breakers.record_success(source)
+    if registry is not None:
+        registry.record_success(source, channel_id)
+    if results is not None:
+        results.record(source, channel_id, videos)
+    if poll_schedule is not None:
+        poll_schedule.record(source, channel_id, videos)
 
 
 def _threaded_fetch_channels(
     channels: List[Tuple[str, str, str]],
-    out_videos: List[VideoInfo],
-    out_bad_channels: List[Tuple[str, str]],
-) -> None:
-    # Partition the list by source type (bitchute, youtube, ...)
-    # for each source fetch all videos.
-    partitioned: Dict[str, Any] = {}
-    for channel_name, source, channel_id in channels:
-        partitioned.setdefault(source, [])
-        partitioned[source].append((channel_name, channel_id))
-    queue_out: queue.Queue = queue.Queue()
-    queue_bad_channels: queue.Queue = queue.Queue()
-    # Launch threads but also makes the main thread responsive to the keyboard interrupt.
-    threads = []
-    for source, array_data in partitioned.items():
-        thread = threading.Thread(
-            target=_fetch_all,
-            args=(source, array_data, queue_out, queue_bad_channels),
-        )
-        thread.daemon = True
-        thread.start()
-        threads.append(thread)
-    while True:  # Weird loop allows KeyboardInterrupt
-        finish_cnt = 0
-        for t in threads:
-            if t.is_alive():
-                finish_cnt += 1
-        if finish_cnt == len(threads):
-            break
-        _yield_thread_for_keyboard_interrupt()
-    # Busy loop here allows keyboard interrupts to filter through to the
-    # top and halt the execution of the program right away.
-    while len(threads):
-        for i, thread in enumerate(threads):
-            if not thread.is_alive():
-                thread.join()
-                threads.pop(i)
-                break  # Start the outer loop again
-        time.sleep(0.1)
-    while not queue_out.empty():
-        out_videos.append(queue_out.get_nowait())
-    for c in list(queue_bad_channels.queue):
-        out_bad_channels.append(c)
-
-
-def _singlethreaded_fetch(
+    crawl_one: Callable[[str, str, str], None],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_per_source: int = DEFAULT_MAX_PER_SOURCE,
+    timeout: Optional[float] = None,
+) -> List[Tuple[str, str, str]]:
+    """Returns the channels abandoned after timeout seconds."""
+    channels = list(channels)
+    if _SCRAPE_RANDOMIZE_ORDER:
+        random.shuffle(channels)
+    scheduler = ChannelScheduler(
+        crawl_one,
+        max_workers=max_workers,
+        max_per_source=max_per_source,
+    )
+    return scheduler.run(channels, timeout=timeout)
+
+
+def _coalesce_duplicate_channels(
     channels: List[Tuple[str, str, str]],
-    out_videos: List[VideoInfo],
-    out_bad_channels: List[Tuple[str, str]],
-) -> None:
-    partitioned: Dict[str, Any] = {}
+) -> Tuple[List[Tuple[str, str, str]], Dict[Tuple[str, str], List[str]]]:
+    """
+    Entries that point at the same (source, channel_id) are crawled once. Returns the
+    unique entries and, for each crawled (source, channel_id), the other names it is listed under.
+    """
+    unique: List[Tuple[str, str, str]] = []
+    primary: Dict[Tuple[str, str], str] = {}
+    aliases: Dict[Tuple[str, str], List[str]] = {}
     for channel_name, source, channel_id in channels:
-        partitioned.setdefault(source, [])
-        partitioned[source].append((channel_name, channel_id))
-    queue_out: queue.Queue = queue.Queue()
-    queue_bad_channels: queue.Queue = queue.Queue()
-    for source, array_data in partitioned.items():
-        _fetch_all(source, array_data, queue_out, queue_bad_channels)
-    while not queue_out.empty():
-        out_videos.append(queue_out.get_nowait())
-    for c in list(queue_bad_channels.queue):
-        out_bad_channels.append(c)
-
-
-def crawl_video_sites(channels: List[Tuple[str, str, str]], use_threads: bool = True) -> str:  # type: ignore
-    vid_infos: List[VideoInfo] = []
-    bad_channels: List[Tuple[str, str]] = []
-    if use_threads:
-        _threaded_fetch_channels(channels, vid_infos, bad_channels)
-    else:
-        _singlethreaded_fetch(channels, vid_infos, bad_channels)
-    # apply_fetch_images(vid_infos)
-    out_data: List[Dict] = VideoInfo.to_plain_list(vid_infos)  # type: ignore
-    json_str = json.dumps(out_data, indent=2, sort_keys=True, ensure_ascii=False)
-    bad_channels.sort()
+        key = (source, channel_id)
+        if key in primary:
+            if channel_name != primary[key] and channel_name not in aliases.get(key, []):
+                aliases.setdefault(key, []).append(channel_name)
+            continue
+        primary[key] = channel_name
+        unique.append((channel_name, source, channel_id))
+    return unique, aliases
+
+
+class _AliasedVideos:
+    """Forwards the videos of one channel to out, together with a copy for every alias of the channel."""
+
+    def __init__(self, out: Any, channel_name: str, aliases: Sequence[str]) -> None:
+        self.out = out
+        self.channel_name = channel_name
+        self.aliases = aliases
+
+    def extend(self, videos: List[VideoInfo]) -> None:
+        videos = list(videos)
+        self.out.extend(videos + [replace(vid, channel_name=alias) for alias in self.aliases for vid in videos])
+
+
+class _AliasedErrors:
+    """Records the errors of one channel under its name and under every alias of the channel."""
+
+    def __init__(self, out: List[Tuple[str, str]], channel_name: str, aliases: Sequence[str]) -> None:
+        self.out = out
+        self.channel_name = channel_name
+        self.aliases = aliases
+
+    def record(self, err: str) -> None:
+        self.out.extend((name, err) for name in [self.channel_name, *self.aliases])
+
+
+class _ClosableVideos:
+    """Forwards videos to out. Once closed, videos from abandoned channels that finish late are dropped."""
+
+    def __init__(self, out: Any) -> None:
+        self.out = out
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def extend(self, videos: List[VideoInfo]) -> None:
+        with self.lock:
+            if not self.closed:
+                self.out.extend(videos)
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+
+
+def select_channels_to_crawl(
+    channels: List[Tuple[str, str, str]],
+    out_videos: Any,
+    bad_channels: List[Tuple[str, str]],
+    poll_schedule: Optional[PollSchedule] = None,
+) -> List[Tuple[str, str, str]]:
+    """
+    Returns the channels that should be crawled now. Channels the poll_schedule says are not due get their last
+    results in out_videos. Channels the bad channel registry is backing off are reported in bad_channels and get their
+    last good results in out_videos too.
+    """
+    if poll_schedule is not None:
+        channels, skipped = poll_schedule.split(channels)
+        print(f"Polling {len(channels)} due channels, reusing the last results of {len(skipped)} others")
+        for channel_name, source, channel_id in skipped:
+            out_videos.extend(poll_schedule.last_results(source, channel_id, channel_name))
+    registry = get_bad_channel_registry()
+    if registry is not None:
+        channels, backed_off = registry.split(channels)
+        results = get_last_results()
+        for (channel_name, source, channel_id), entry in backed_off:
+            if results is not None:
+                out_videos.extend(results.get(source, channel_id, channel_name))
+            retry = datetime.fromtimestamp(entry["retry_after"]).isoformat(timespec="minutes")
+            bad_channels.append((channel_name, f"backing off after {entry['failures']} failures until {retry}, last error: {entry['last_error']}"))
+        if backed_off:
+            print(f"Backing off {len(backed_off)} bad channels")
+    return channels
+
+
+def print_bad_channels(bad_channels: List[Tuple[str, str]]) -> None:
     if bad_channels:
         print("#############")
         print("# Bad channels:")
@@ -190,4 +271,138 @@ def crawl_video_sites(channels: List[Tuple[str, str, str]], use_threads: bool =
         print("#############")
     else:
         print("No bad channels detected!")
+
+
+def _run_crawl(
+    channels: List[Tuple[str, str, str]],
+    out_videos: Any,
+    bad_channels: List[Tuple[str, str]],
+    use_threads: bool,
+    max_per_source: int,
+    max_per_host: Optional[int],
+    max_workers: int,
+    parse_processes: Optional[int],
+    poll_schedule: Optional[PollSchedule],
+    stop: Optional[threading.Event],
+    channel_timeout: Optional[float],
+    crawl_timeout: Optional[float],
+) -> None:
+    """Crawls the channels into out_videos, anything with an extend() method."""
+    channels = select_channels_to_crawl(channels, out_videos, bad_channels, poll_schedule)
+    channels, aliases = _coalesce_duplicate_channels(channels)
+    get_crawl_progress().start(channels)
+    videos = _ClosableVideos(out_videos)
+    crawl_deadline = None if crawl_timeout is None else time.monotonic() + crawl_timeout
+    scheduler_timeout = None if crawl_timeout is None else crawl_timeout + STRAGGLER_GRACE
+
+    def crawl_one(channel_name: str, source: str, channel_id: str) -> None:
+        crawl_channel(
+            channel_name,
+            source,
+            channel_id,
+            out_videos=videos,
+            out_bad_channels=bad_channels,
+            poll_schedule=poll_schedule,
+            stop=stop,
+            channel_timeout=channel_timeout,
+            crawl_deadline=crawl_deadline,
+            aliases=aliases.get((source, channel_id), ()),
+        )
+
+    # A pool that is already running (the daemon keeps one warm) is left alone.
+    own_parse_pool = parse_processes != 0 and not parse_pool_enabled()
+    if own_parse_pool:
+        enable_parse_pool(parse_processes)
+    configure_http_pool(max_per_host)
+    try:
+        if use_threads:
+            abandoned = _threaded_fetch_channels(channels, crawl_one, max_workers=max_workers, max_per_source=max_per_source, timeout=scheduler_timeout)
+        else:
+            abandoned = _threaded_fetch_channels(channels, crawl_one, max_workers=1, max_per_source=1, timeout=scheduler_timeout)
+    finally:
+        configure_http_pool(None)
+        videos.close()
+        if own_parse_pool:
+            disable_parse_pool()
+    for channel_name, source, channel_id in abandoned:
+        for name in [channel_name, *aliases.get((source, channel_id), [])]:
+            bad_channels.append((name, "abandoned, still running at the crawl deadline"))
+    breakers = get_source_breakers()
+    if breakers is not None:
+        for source, count in sorted(breakers.take_skipped().items()):
+            print(f"Circuit open for {source}: skipped {count} channels, reused their last results")
+    bad_channels.sort()
+    print_bad_channels(bad_channels)
+
+
+def crawl_video_sites(  # type: ignore
+    channels: List[Tuple[str, str, str]],
+    use_threads: bool = True,
+    max_per_source: int = DEFAULT_MAX_PER_SOURCE,
+    max_per_host: Optional[int] = DEFAULT_MAX_PER_HOST,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    parse_processes: Optional[int] = 0,
+    poll_schedule: Optional[PollSchedule] = None,
+    stop: Optional[threading.Event] = None,
+    channel_timeout: Optional[float] = DEFAULT_CHANNEL_TIMEOUT,
+    crawl_timeout: Optional[float] = None,
+) -> str:
+    """
+    Crawls the channels and returns the json string of all the videos found.
+    The channels run on max_workers threads, at most max_per_source channels of
+    a source at a time (use_threads=False runs them one by one), with at most
+    max_per_host connections per host (None: no limit).
+    Html is parsed on the crawl threads unless parse_processes is set, then in a pool of
+    that many processes (None: one per core). The pool's workers are spawned and import
+    the calling script, which must guard its crawl with if __name__ == "__main__". With a poll_schedule only the channels that are
+    due are crawled, the others contribute the results of their last crawl. Once
+    stop is set the channels that have not started are skipped. Each channel gets
+    channel_timeout seconds, the whole crawl crawl_timeout seconds (plus a grace
+    period for stragglers), channels out of time are listed as bad channels.
+    """
+    vid_infos: List[VideoInfo] = []
+    bad_channels: List[Tuple[str, str]] = []
+    _run_crawl(channels, vid_infos, bad_channels, use_threads, max_per_source, max_per_host, max_workers, parse_processes, poll_schedule, stop, channel_timeout, crawl_timeout)
+    # apply_fetch_images(vid_infos)
+    out_data: List[Dict] = VideoInfo.to_plain_list(vid_infos)  # type: ignore
+    json_str = json.dumps(out_data, indent=2, sort_keys=True, ensure_ascii=False)
     return json_str
+
+
+def stream_video_sites(
+    channels: List[Tuple[str, str, str]],
+    ndjson_path: str,
+    use_threads: bool = True,
+    max_per_source: int = DEFAULT_MAX_PER_SOURCE,
+    max_per_host: Optional[int] = DEFAULT_MAX_PER_HOST,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    parse_processes: Optional[int] = 0,
+    max_buffered: int = DEFAULT_MAX_BUFFERED,
+    poll_schedule: Optional[PollSchedule] = None,
+    stop: Optional[threading.Event] = None,
+    channel_timeout: Optional[float] = DEFAULT_CHANNEL_TIMEOUT,
+    crawl_timeout: Optional[float] = None,
+) -> int:
+    """
+    Same crawl as crawl_video_sites, but every video is written to ndjson_path as
+    one json object per line as soon as its channel completes, with at most
+    max_buffered videos held in memory. Returns the number of videos written.
+    """
+    bad_channels: List[Tuple[str, str]] = []
+    with NdjsonWriter(ndjson_path, max_buffered=max_buffered) as writer:
+        _run_crawl(channels, writer, bad_channels, use_threads, max_per_source, max_per_host, max_workers, parse_processes, poll_schedule, stop, channel_timeout, crawl_timeout)
+    return writer.count
+
+
+def load_crawl_channels(path: str) -> List[Tuple[str, str, str]]:
+    """Reads a crawl input json, a list of (channel_name, source, channel_id), dropping unknown sources."""
+    with open(path, encoding="utf-8", mode="r") as filed:
+        data = json.loads(filed.read())
+    out: List[Tuple[str, str, str]] = []
+    for tup in data:
+        assert len(tup) == 3, "expected a List[Tuple[str, str, str]]"
+        if tup[1] not in CRAWLER_MAP:
+            print(f"Unknown source: {tup[1]} (ignoring)")
+            continue
+        out.append((tup[0], tup[1], tup[2]))
+    return out
@@ -6,15 +6,19 @@ Spotify scraper
 
 import sys
 from datetime import datetime
-from typing import List
-
-from bs4 import BeautifulSoup  # type: ignore
+from typing import Dict, List
 
+from .crawl_state import channel_state
 from .date import iso_fmt
+from .deadline import keep_partial
 from .fetch_html import fetch_html_using_request_lib as fetch_html
+from .html_parser import make_soup
+from .parse_cache import cached_parse
+from .parse_pool import run_parse
 from .video_info import VideoInfo
 
 _TIMEOUT_EPISODE = 20  # Wow these can take a long time.
+_EPISODE_META = ("og:image", "og:title", "og:description", "music:release_date", "music:duration", "og:url")
 
 # TODO: Allow spotify scraper to access the database and check to see if
 # the episode is already there.
@@ -25,57 +29,77 @@ def now_local() -> datetime:
     return datetime.now()
 
 
+@cached_parse(version=1)
+def parse_episode_urls(html_doc: str) -> List[str]:
+    """Episode urls listed on a show page, runs in the parse pool."""
+    html_dom = make_soup(html_doc)
+    music_doms = html_dom.findAll("meta", {"name": "music:song"})  # type: ignore
+    return [str(e.attrs["content"]) for e in music_doms]
+
+
+@cached_parse(version=1)
+def parse_episode_meta(episode_html: str) -> Dict[str, str]:
+    """Meta properties of an episode page, runs in the parse pool."""
+    episode_dom = make_soup(episode_html)  # type: ignore
+    out: Dict[str, str] = {}
+    for name in _EPISODE_META:
+        dom = episode_dom.find("meta", {"name": name})
+        out[name] = str(dom["content"])  # type: ignore
+    return out
+
+
 def fetch_spotify_today(channel_name: str, channel: str) -> List[VideoInfo]:
     output: List[VideoInfo] = []
     now_datestr = iso_fmt(now_local())
     channel_url = f"https://open.spotify.com/show/{channel}"
     sys.stdout.write(f"Spotify crawler visiting {channel_name} ({channel_url})\n")
     html_doc = fetch_html(channel_url).html
-    html_dom = BeautifulSoup(html_doc, "html.parser")
-    music_doms = html_dom.findAll("meta", {"name": "music:song"})  # type: ignore
-    episode_urls = [e.attrs["content"] for e in music_doms]
-    for episide_url in episode_urls:
-        sys.stdout.write(f"  Spotify crawler visiting episode {episide_url}\n")
-        episode_html = fetch_html(episide_url, timeout=_TIMEOUT_EPISODE)
-        episode_dom = BeautifulSoup(episode_html, "html.parser")  # type: ignore
-
-        def extract_meta_property(name: str) -> str:
-            dom = episode_dom.find("meta", {"name": name})  # pylint: disable=cell-var-from-loop
-            return str(dom["content"])  # type: ignore
-
-        img_url = extract_meta_property("og:image")
-        title = extract_meta_property("og:title")
-        description = extract_meta_property("og:description")
-        release_date = extract_meta_property("music:release_date")
-        duration = extract_meta_property("music:duration")
-        url = extract_meta_property("og:url")
-        # example:
-        #   "4rJBoD4BeeYFd8eLhrDRM" is extracted from
-        #   "https://open.spotify.com/episode/4rJBoD4BeeYFd8eLhrDRM"
-        spotify_id = url.split("episode")[1].replace("/", "")
-        title = extract_meta_property("og:title")
-        vid_url = f"https://open.spotify.com/episode/{spotify_id}"
-        iframe_url = f"https://open.spotify.com/embed/episode/{spotify_id}"
-        vid: VideoInfo = VideoInfo(
-            channel_name=channel_name,
-            source="spotify.com",
-            date_published=release_date,
-            date_discovered=now_datestr,
-            date_lastupdated=now_datestr,
-            url=vid_url,
-            channel_url=channel_url,
-            title=title,
-            duration=duration,
-            description=description,
-            img_src=img_url,
-            iframe_src=iframe_url,
-            views="?",
-            profile_img_src="",
-        )
-        output.append(vid)
+    episode_urls = run_parse(parse_episode_urls, html_doc)
+    with channel_state("spotify", channel) as state, keep_partial(output):
+        for episide_url in episode_urls:
+            known = state.lookup(episide_url)
+            if known is None:
+                known = _fetch_episode(channel_name, channel_url, episide_url, now_datestr)
+                state.store(episide_url, known)
+            output.append(known)
     return output
 
 
+def _fetch_episode(channel_name: str, channel_url: str, episide_url: str, now_datestr: str) -> VideoInfo:
+    sys.stdout.write(f"  Spotify crawler visiting episode {episide_url}\n")
+    episode_html = fetch_html(episide_url, timeout=_TIMEOUT_EPISODE).html
+    meta = run_parse(parse_episode_meta, episode_html)
+    img_url = meta["og:image"]
+    title = meta["og:title"]
+    description = meta["og:description"]
+    release_date = meta["music:release_date"]
+    duration = meta["music:duration"]
+    url = meta["og:url"]
+    # example:
+    #   "4rJBoD4BeeYFd8eLhrDRM" is extracted from
+    #   "https://open.spotify.com/episode/4rJBoD4BeeYFd8eLhrDRM"
+    spotify_id = url.split("episode")[1].replace("/", "")
+    vid_url = f"https://open.spotify.com/episode/{spotify_id}"
+    iframe_url = f"https://open.spotify.com/embed/episode/{spotify_id}"
+    vid: VideoInfo = VideoInfo(
+        channel_name=channel_name,
+        source="spotify.com",
+        date_published=release_date,
+        date_discovered=now_datestr,
+        date_lastupdated=now_datestr,
+        url=vid_url,
+        channel_url=channel_url,
+        title=title,
+        duration=duration,
+        description=description,
+        img_src=img_url,
+        iframe_src=iframe_url,
+        views="?",
+        profile_img_src="",
+    )
+    return vid
+
+
 def unit_test() -> None:
     fetch_spotify_today(channel_name="Joe Rogan", channel="4rOoJ6Egrf8K2IrywzwOMk")
 
@@ -7,11 +7,10 @@ Scraper for spreaker.com
 import sys
 from typing import List
 
-import feedparser  # type: ignore
-
 from vidcrawler.date import iso_fmt, now_local
 
-from .fetch_html import fetch_html_using_request_lib as fetch_html
+from .conditional_get import fetch_if_modified, store_if_modified
+from .feed_reader import RSS, iter_feed_entries
 from .video_info import VideoInfo
 
 # EXPERIMENTAL - parses sara carter from spreaker.
@@ -47,15 +46,18 @@ def rss_element_to_video_info(channel_name: str, rss_element: dict) -> VideoInfo
 def fetch_spreaker_today(channel_name: str, channel: str) -> List[VideoInfo]:
     url = f"https://www.spreaker.com/show/{channel}/episodes/feed"
     sys.stdout.write("Spreaker visiting %s (%s)\n" % (channel, url))
-    fetch_result = fetch_html(url)
-    feed = feedparser.parse(fetch_result.html)
+    cache_key = f"{channel_name}|{url}"
+    conditional = fetch_if_modified(url, key=cache_key, user_agent=None, raise_for_status=True)
+    if conditional.cached is not None:  # Not modified.
+        return VideoInfo.from_list_of_dicts(conditional.cached)
     output: List[VideoInfo] = []
-    for entry in feed.entries:
+    for entry in iter_feed_entries(conditional.result.html, RSS, after=conditional.window_start):
         try:
             vid = rss_element_to_video_info(channel_name=channel_name, rss_element=entry)
             output.append(vid)
         except BaseException as err:  # pylint: disable=broad-except
             sys.stderr.write(f"{__file__}: Error while parsing {channel_name} entry:\n {str(entry['title'])}:\n because of {err}")
+    store_if_modified(cache_key, conditional, VideoInfo.to_plain_list(output))
     return output
 
 
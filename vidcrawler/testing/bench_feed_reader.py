@@ -0,0 +1,64 @@
+"""
+Benchmarks the streaming feed reader against feedparser.
+
+Runs on synthetic feeds of every known shape by default, pass recorded feeds to measure real ones. Run with:
+    python -m vidcrawler.testing.bench_feed_reader [--repeat N] [--entries N] [--feed youtube|rss FEED.xml ...]
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import sys
+import time
+from typing import Callable, List, Tuple
+
+import feedparser  # type: ignore
+
+from vidcrawler.feed_reader import FEED_SHAPES, RSS, YOUTUBE, parse_feed
+from vidcrawler.testing.feed_fixtures import (
+    bitchute_feed,
+    brighteon_feed,
+    odysee_feed,
+    spreaker_feed,
+    youtube_feed,
+)
+
+
+def _bench(parse: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the streaming feed reader vs feedparser.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--entries", type=int, default=15, help="Entries of the synthetic feeds (youtube feeds have 15).")
+    parser.add_argument("--feed", nargs=2, action="append", metavar=("SHAPE", "PATH"), default=[], help="Recorded feed and its shape, can be repeated.")
+    args = parser.parse_args()
+    feeds: List[Tuple[str, str, str]] = []
+    for shape, path in args.feed:
+        if shape not in FEED_SHAPES:
+            parser.error(f"Unknown feed shape {shape}, expected one of {', '.join(FEED_SHAPES)}")
+        with open(path, encoding="utf-8") as file:
+            feeds.append((path, shape, file.read()))
+    if not feeds:
+        feeds = [
+            ("youtube", YOUTUBE, youtube_feed(args.entries)),
+            ("bitchute", RSS, bitchute_feed(args.entries)),
+            ("brighteon", RSS, brighteon_feed(args.entries)),
+            ("spreaker", RSS, spreaker_feed(args.entries)),
+            ("odysee", RSS, odysee_feed(args.entries)),
+        ]
+    print(f"{'feed':>12}{'entries':>9}{'feedparser':>14}{'streaming':>14}{'speedup':>9}")
+    for name, shape, content in feeds:
+        entries = len(parse_feed(content, shape).entries)
+        slow = _bench(lambda content=content: feedparser.parse(content), args.repeat)  # type: ignore
+        fast = _bench(lambda content=content, shape=shape: parse_feed(content, shape), args.repeat)  # type: ignore
+        print(f"{name[-12:]:>12}{entries:>9}{slow * 1000:>12.2f}ms{fast * 1000:>12.2f}ms{slow / fast:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
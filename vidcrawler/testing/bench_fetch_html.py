@@ -0,0 +1,59 @@
+"""
+Benchmarks the pooled keep-alive fetcher against the curl subprocess fetcher.
+
+Run with:
+    python -m vidcrawler.testing.bench_fetch_html [--count N] [--url URL]
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import sys
+import time
+from typing import Callable
+
+from vidcrawler.fetch_html import (
+    FetchResult,
+    curl_available,
+    fetch_html_pooled,
+    fetch_html_using_curl,
+)
+from vidcrawler.testing.simple_http_server import simple_response_server_thread
+
+_BODY = "<html><body>" + ("x" * 64 * 1024) + "</body></html>"
+
+
+def _bench(name: str, fetcher: Callable[[str], FetchResult], url: str, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        result = fetcher(url)
+        assert result.ok, f"{name} failed with status code {result.status_code}"
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {count} fetches in {elapsed:.3f}s ({1000 * elapsed / count:.2f} ms/fetch)")
+    return elapsed
+
+
+def _run(url: str, count: int) -> None:
+    pooled = _bench("pooled", fetch_html_pooled, url, count)
+    if not curl_available():
+        print("    curl: not installed, skipping")
+        return
+    curl = _bench("curl", fetch_html_using_curl, url, count)
+    print(f" speedup: {curl / pooled:.1f}x")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark pooled fetch vs curl.")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--url", type=str, default=None, help="Defaults to a local server.")
+    args = parser.parse_args()
+    if args.url:
+        _run(args.url, args.count)
+        return 0
+    with simple_response_server_thread(port=0, response_text_fcn=lambda: _BODY) as server:
+        _run(f"http://localhost:{server.port}", args.count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Benchmarks the parse of every site with html.parser against lxml.
+
+Run with:
+    python -m vidcrawler.testing.bench_html_parser [--repeat N] [--site NAME]
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from vidcrawler.html_parser import HTML_PARSER, LXML, lxml_available, set_html_parser
+from vidcrawler.testing.test_html_parser import SITE_PARSES
+
+
+def _bench(parse: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark html.parser vs lxml per site.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--site", choices=sorted(SITE_PARSES), default=None)
+    args = parser.parse_args()
+    backends = [HTML_PARSER] + ([LXML] if lxml_available() else [])
+    if len(backends) == 1:
+        print("lxml is not installed (pip install vidcrawler[fast]), only html.parser is measured")
+    sites = {args.site: SITE_PARSES[args.site]} if args.site else SITE_PARSES
+    print(f"{'site':>18}" + "".join(f"{backend:>14}" for backend in backends) + ("     speedup" if len(backends) > 1 else ""))
+    for site, parse in sites.items():
+        timings: Dict[str, float] = {}
+        for backend in backends:
+            set_html_parser(backend)
+            parse()  # Warm up.
+            timings[backend] = _bench(parse, args.repeat)
+        row = f"{site:>18}" + "".join(f"{timings[backend] * 1000:>12.2f}ms" for backend in backends)
+        if len(backends) > 1:
+            row += f"{timings[HTML_PARSER] / timings[LXML]:>11.1f}x"
+        print(row)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
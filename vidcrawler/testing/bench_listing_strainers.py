@@ -0,0 +1,71 @@
+"""
+Benchmarks building the whole DOM of a listing page against only the subtrees its parser needs.
+
+Runs on synthetic pages by default, pass saved pages to measure real ones. Run with:
+    python -m vidcrawler.testing.bench_listing_strainers [--repeat N] [--rumble PAGE.html] [--bitchute PAGE.html] [--gabtv PAGE.html]
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Optional, Tuple
+
+from vidcrawler import bitchute, gabtv, rumble
+from vidcrawler.html_parser import get_html_parser, make_soup
+from vidcrawler.testing.html_fixtures import (
+    bitchute_channel_page,
+    gabtv_channel_page,
+    rumble_channel_page,
+)
+
+
+def _bench(html_doc: str, strainer: Any, repeat: int) -> Tuple[float, int]:
+    """Seconds per parse and peak bytes allocated while building the soup."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        make_soup(html_doc, parse_only=strainer)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    soup = make_soup(html_doc, parse_only=strainer)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del soup
+    return elapsed, peak
+
+
+def _read(path: Optional[str], default: str) -> str:
+    if path is None:
+        return default
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark full vs strained parsing of listing pages.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rumble", type=str, default=None, help="Saved rumble channel page.")
+    parser.add_argument("--bitchute", type=str, default=None, help="Saved bitchute channel page.")
+    parser.add_argument("--gabtv", type=str, default=None, help="Saved gab tv channel page.")
+    args = parser.parse_args()
+    pages: Dict[str, Tuple[str, Any]] = {
+        "rumble": (_read(args.rumble, rumble_channel_page(num_videos=25, padding=200)), rumble.CHANNEL_PAGE_STRAINER),
+        "bitchute": (_read(args.bitchute, bitchute_channel_page(num_videos=25, padding=200)), bitchute.CHANNEL_PAGE_STRAINER),
+        "gabtv": (_read(args.gabtv, gabtv_channel_page(num_episodes=25, padding=200)), gabtv.EPISODE_LIST_STRAINER),
+    }
+    print(f"Parsing with {get_html_parser()}")
+    print(f"{'page':>10}{'KB':>8}{'full':>12}{'strained':>12}{'speedup':>9}{'full peak':>12}{'strained peak':>15}")
+    for name, (html_doc, strainer) in pages.items():
+        full_time, full_peak = _bench(html_doc, None, args.repeat)
+        strained_time, strained_peak = _bench(html_doc, strainer, args.repeat)
+        print(
+            f"{name:>10}{len(html_doc) // 1024:>8}{full_time * 1000:>10.2f}ms{strained_time * 1000:>10.2f}ms"
+            f"{full_time / strained_time:>8.1f}x{full_peak // 1024:>10}KB{strained_peak // 1024:>13}KB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
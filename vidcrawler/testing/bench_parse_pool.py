@@ -0,0 +1,58 @@
+"""
+Benchmarks parsing rumble channel pages on crawl threads against the parse pool.
+
+Run with:
+    python -m vidcrawler.testing.bench_parse_pool [--pages N] [--threads N] [--processes N]
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vidcrawler.parse_pool import (
+    default_parse_processes,
+    disable_parse_pool,
+    enable_parse_pool,
+    run_parse,
+)
+from vidcrawler.rumble import parse_channel_page
+from vidcrawler.testing.html_fixtures import rumble_channel_page
+
+
+def _bench(name: str, html_doc: str, pages: int, threads: int) -> float:
+    def parse_one(_: int) -> int:
+        return len(run_parse(parse_channel_page, html_doc, "bench", "https://rumble.com/c/bench"))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        counts = list(executor.map(parse_one, range(pages)))
+    elapsed = time.perf_counter() - start
+    assert all(count == counts[0] for count in counts)
+    print(f"{name:>8}: {pages} pages on {threads} threads in {elapsed:.3f}s ({pages / elapsed:.1f} pages/s)")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark inline parsing vs the parse pool.")
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=default_parse_processes())
+    args = parser.parse_args()
+    html_doc = rumble_channel_page(num_videos=50)
+    inline = _bench("inline", html_doc, args.pages, args.threads)
+    enable_parse_pool(args.processes)
+    try:
+        # Warm up so that process start up is not measured.
+        _bench("warmup", html_doc, args.processes, args.processes)
+        pooled = _bench("pool", html_doc, args.pages, args.threads)
+    finally:
+        disable_parse_pool()
+    print(f" speedup: {inline / pooled:.1f}x with {args.processes} processes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
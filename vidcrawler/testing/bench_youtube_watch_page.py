@@ -0,0 +1,48 @@
+"""
+Benchmarks the json fast path of the youtube watch page parser against the DOM path.
+
+Runs on a synthetic page the size of a real one by default. Run with:
+    python -m vidcrawler.testing.bench_youtube_watch_page [--repeat N] [--page SAVED.html]
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import sys
+import time
+from typing import Callable
+
+from vidcrawler.testing.html_fixtures import youtube_video_page
+from vidcrawler.youtube import parse_youtube_video_dom, parse_youtube_video_json
+
+
+def _bench(name: str, parse: Callable[[str], object], html_doc: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(html_doc)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{name:>5}: {elapsed * 1000:.2f}ms per page")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the json vs DOM youtube watch page parser.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page", type=str, default=None, help="Saved youtube watch page.")
+    args = parser.parse_args()
+    if args.page:
+        with open(args.page, encoding="utf-8") as file:
+            html_doc = file.read()
+    else:
+        html_doc = youtube_video_page(padding=8000)
+    print(f"Page of {len(html_doc) // 1024} KB")
+    if parse_youtube_video_json(html_doc) is None:
+        print("The page has no usable ytInitialPlayerResponse, the json path falls back to the DOM")
+    fast = _bench("json", parse_youtube_video_json, html_doc, args.repeat)
+    dom = _bench("dom", parse_youtube_video_dom, html_doc, max(1, args.repeat // 4))
+    print(f"speedup: {dom / fast:.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Synthetic feeds shaped like the ones the scrapers read, for offline tests and benchmarks.
+
+Entries are newest first, one day apart, starting at 2023-11-30.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+_NEWEST = datetime(2023, 11, 30, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def _date(i: int) -> datetime:
+    return _NEWEST - timedelta(days=i)
+
+
+def _rfc822(i: int) -> str:
+    return _date(i).strftime("%a, %d %b %Y %H:%M:%S +0000")
+
+
+def youtube_feed(num_entries: int = 15, channel_id: str = "UCabc") -> str:
+    entries: List[str] = []
+    for i in range(num_entries):
+        vid = f"vid{i:08d}"
+        entries.append(
+            f"""
+ <entry>
+  <id>yt:video:{vid}</id>
+  <yt:videoId>{vid}</yt:videoId>
+  <yt:channelId>{channel_id}</yt:channelId>
+  <title>Video {i} &amp; friends: "quoted" &lt;tag&gt;</title>
+  <link rel="alternate" href="https://www.youtube.com/watch?v={vid}"/>
+  <author>
+   <name>Some Channel</name>
+   <uri>https://www.youtube.com/channel/{channel_id}</uri>
+  </author>
+  <published>{_date(i).isoformat()}</published>
+  <updated>{_date(i).isoformat()}</updated>
+  <media:group>
+   <media:title>Video {i} &amp; friends: "quoted" &lt;tag&gt;</media:title>
+   <media:content url="https://www.youtube.com/v/{vid}?version=3" type="application/x-shockwave-flash" width="640" height="390"/>
+   <media:thumbnail url="https://i{i % 4}.ytimg.com/vi/{vid}/hqdefault.jpg" width="480" height="360"/>
+   <media:description>Description of video {i}.
+Second line with a link https://example.com/{i} &amp; more.</media:description>
+   <media:community>
+    <media:starRating count="{i * 3}" average="5.00" min="1" max="5"/>
+    <media:statistics views="{0 if i == 0 else i * 1000}"/>
+   </media:community>
+  </media:group>
+ </entry>"""
+        )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+ <link rel="self" href="http://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"/>
+ <id>yt:channel:{channel_id}</id>
+ <yt:channelId>{channel_id}</yt:channelId>
+ <title>Some Channel</title>
+ <link rel="alternate" href="https://www.youtube.com/channel/{channel_id}"/>
+ <author>
+  <name>Some Channel</name>
+  <uri>https://www.youtube.com/channel/{channel_id}</uri>
+ </author>
+ <published>2015-01-01T00:00:00+00:00</published>{"".join(entries)}
+</feed>
+"""
+
+
+def _rss(channel_link: str, items: List[str], namespaces: str = "") -> str:
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"{namespaces}>
+<channel>
+<title>Some Channel</title>
+<link>{channel_link}</link>
+<description>Feed of Some Channel</description>
+<language>en</language>
+{"".join(items)}
+</channel>
+</rss>
+"""
+
+
+def bitchute_feed(num_entries: int = 15) -> str:
+    items = [
+        f"""<item>
+<title>Bitchute video {i} &amp; more</title>
+<link>https://www.bitchute.com/embed/vid{i}/</link>
+<description>&lt;p&gt;About video {i}&lt;/p&gt;</description>
+<pubDate>{_rfc822(i)}</pubDate>
+<guid>vid{i}</guid>
+<enclosure url="https://static.bitchute.com/thumb{i}.jpg" type="image/jpeg" length="0"/>
+</item>
+"""
+        for i in range(num_entries)
+    ]
+    return _rss("https://www.bitchute.com/channel/some_channel/", items)
+
+
+def brighteon_feed(num_entries: int = 15) -> str:
+    items = [
+        f"""<item>
+<title>Brighteon video {i}</title>
+<link>https://www.brighteon.com/vid-{i}</link>
+<description><![CDATA[<p><a href="https://www.brighteon.com/vid-{i}"><img src="https://photos.brighteon.com/thumbnail/vid-{i}.jpg" alt="thumb"></a></p><p>About video {i}</p>]]></description>
+<pubDate>{_rfc822(i)}</pubDate>
+<guid isPermaLink="false">/vid-{i}</guid>
+</item>
+"""
+        for i in range(num_entries)
+    ]
+    return _rss("https://www.brighteon.com/channels/some_channel", items)
+
+
+def spreaker_feed(num_entries: int = 15) -> str:
+    items = [
+        f"""<item>
+<title>Episode {i}</title>
+<link>https://www.spreaker.com/episode/ep{i}</link>
+<description>Episode {i} notes</description>
+<pubDate>{_rfc822(i)}</pubDate>
+<guid isPermaLink="false">https://api.spreaker.com/episode/{i}</guid>
+<enclosure url="https://api.spreaker.com/download/episode/{i}/ep{i}.mp3" length="0" type="audio/mpeg"/>
+<itunes:subtitle>Episode {i} subtitle</itunes:subtitle>
+<itunes:duration>{i % 3}:{i % 60:02d}:00</itunes:duration>
+<itunes:image href="https://d3wo5wojvuv7l.cloudfront.net/images.spreaker.com/ep{i}.jpg"/>
+</item>
+"""
+        for i in range(num_entries)
+    ]
+    return _rss("https://www.spreaker.com/show/some_show", items, ' xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"')
+
+
+def odysee_feed(num_entries: int = 15) -> str:
+    items = [
+        f"""<item>
+<title>Odysee video {i}</title>
+<link>https://odysee.com/@some_channel/video-{i}</link>
+<description>About video {i}</description>
+<pubDate>{_rfc822(i)}</pubDate>
+<guid isPermaLink="false">video-{i}</guid>
+<enclosure url="https://thumbs.odycdn.com/video-{i}.webp" length="0" type="image/webp"/>
+</item>
+"""
+        for i in range(num_entries)
+    ]
+    return _rss("https://odysee.com/@some_channel", items)
@@ -0,0 +1,97 @@
+"""
+Synthetic pages shaped like the ones the scrapers parse, for offline tests and benchmarks.
+"""
+
+# pylint: disable=line-too-long,missing-function-docstring
+
+from typing import List
+
+_PADDING = '<div class="ad-slot"><span>sponsored</span><script>var x = {"a": [1, 2, 3]};</script></div>'
+
+
+def rumble_channel_page(num_videos: int = 25, padding: int = 20) -> str:
+    articles: List[str] = []
+    for i in range(num_videos):
+        articles.append(
+            f"""
+<div class="videostream thumbnail__grid--item">
+  <a class="videostream__link link" href="/v{i}abc-video-number-{i}.html"><img src="https://sp.rmbl.ws/thumb{i}.jpg"></a>
+  <div class="videostream__status--duration">{i % 60}:{i % 60:02d}</div>
+  <div class="videostream__status">November {i % 28 + 1}, 2023</div>
+  <h3 class="thumbnail__title">Video &amp; number {i}</h3>
+  <div class="videostream__data">
+    <span class="videostream__data--item videostream__date" title="November {i % 28 + 1}, 2023">{i} days ago</span>
+    <span class="videostream__data--item videostream__views">{i * 100} views</span>
+  </div>
+</div>"""
+        )
+    return "<html><head><title>Channel</title></head><body>" + _PADDING * padding + '<div class="thumbnail__grid">' + "".join(articles) + "</div>" + _PADDING * padding + "</body></html>"
+
+
+def bitchute_channel_page(num_videos: int = 25, padding: int = 20) -> str:
+    videos: List[str] = []
+    for i in range(num_videos):
+        videos.append(
+            f"""
+<div class="channel-videos-container">
+  <div class="channel-videos-image"><img data-src="https://static.bitchute.com/thumb{i}.jpg"></div>
+  <span class="video-duration">{i % 60}:{i % 60:02d}</span>
+  <div class="channel-videos-title"><a class="spa" href="/video/vid{i}/">Bitchute video {i}</a></div>
+  <span class="video-views">  {i * 10}  </span>
+</div>"""
+        )
+    details = '<div class="details"><p class="name"><a href="/some_channel/">Some channel</a></p></div>'
+    return "<html><body>" + _PADDING * padding + details + "".join(videos) + _PADDING * padding + "</body></html>"
+
+
+def spotify_show_page(num_episodes: int = 10) -> str:
+    metas = "".join(f'<meta name="music:song" content="https://open.spotify.com/episode/ep{i}">' for i in range(num_episodes))
+    return f"<html><head>{metas}</head><body>{_PADDING * 20}</body></html>"
+
+
+def spotify_episode_page(episode_id: str = "ep0") -> str:
+    metas = {
+        "og:image": f"https://i.scdn.co/image/{episode_id}",
+        "og:title": f"Episode {episode_id}",
+        "og:description": "An episode",
+        "music:release_date": "2023-11-06",
+        "music:duration": "3600",
+        "og:url": f"https://open.spotify.com/episode/{episode_id}",
+    }
+    head = "".join(f'<meta name="{name}" content="{value}">' for name, value in metas.items())
+    return f"<html><head>{head}</head><body>{_PADDING * 20}</body></html>"
+
+
+def gabtv_channel_page(num_episodes: int = 25, padding: int = 20) -> str:
+    episodes: List[str] = []
+    for i in range(num_episodes):
+        episodes.append(
+            f"""
+<div class="tv-episode" data-episode-id="ep{i}">
+  <a href="/watch?v=ep{i}"><img src="https://tv.gab.com/thumb{i}.jpg"></a>
+  <div class="studio-episode-published"><span>{i * 7} views</span><span>{i} days ago</span></div>
+</div>"""
+        )
+    return "<html><body>" + _PADDING * padding + '<div class="tv-channel-episode-list">' + "".join(episodes) + "</div>" + _PADDING * padding + "</body></html>"
+
+
+def youtube_video_page(video_id: str = "abc", padding: int = 20, live: bool = False) -> str:
+    initial_data = f'{{"contents": {{"videoId": "{video_id}", "owner": {{"thumbnails": [{{"url": "https://yt3.ggpht.com/s88-c-k"}}, {{"url": "https://yt3.ggpht.com/s176-c-k"}}]}}}}}}'
+    details = f'{{"videoId": "{video_id}", "title": "A \\"quoted\\" title; with </b> in it", "lengthSeconds": "3723", "viewCount": "12345"' + (', "isLive": true' if live else "") + "}"
+    microformat = '{"playerMicroformatRenderer": {"publishDate": "2023-11-06T12:00:00+00:00", "uploadDate": "2023-11-06T12:00:00+00:00"}}'
+    player_response = f'{{"videoDetails": {details}, "microformat": {microformat}, "playabilityStatus": {{"status": "OK", "liveStreamability": {{"isLiveNow":{"true" if live else "false"}}}}}}}'
+    head = (
+        '<meta itemprop="startDate" content="2023-11-06T12:00:00+00:00">'
+        '<meta itemprop="interactionCount" content="12345">'
+        '<meta itemprop="duration" content="PT1H2M3S">'
+    )
+    scripts = f"<script>var ytInitialPlayerResponse = {player_response};var meta = document.createElement('meta');</script><script>var ytInitialData = {initial_data};</script>"
+    return f"<html><head>{head}</head><body>{_PADDING * padding}{scripts}</body></html>"
+
+
+def brighteon_entry_summary(video_id: str = "abc") -> str:
+    return f'<p><a href="https://www.brighteon.com/{video_id}"><img src="https://photos.brighteon.com/thumbnail/{video_id}.jpg" alt="thumb"></a></p><p>About &amp; more<br>second line</p>'
+
+
+def youtube_bot_video_divs(num_videos: int = 10) -> List[str]:
+    return [f'<div id="details"><h3><a id="video-title-link" title=" Video: number {i} " href="/watch?v=yt{i}">Video {i}</a></h3></div>' for i in range(num_videos)]
@@ -10,30 +10,56 @@ import socketserver
 import threading
 from contextlib import contextmanager
 from http import HTTPStatus
-from typing import Any, Callable, Generator, List, Optional
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
 
 import requests
 
 StringFunctor = Callable[[], str]
+# Takes the request path and headers, returns (status code, response headers, body).
+ResponseFunctor = Callable[[str, Dict[str, str]], Tuple[int, Dict[str, str], str]]
 
 _TIMEOUT = 10
 
 
-def make_handler_class(response_text_fcn: StringFunctor) -> Any:
+def make_handler_class(response_text_fcn: StringFunctor, response_fcn: Optional[ResponseFunctor] = None) -> Any:
     class Handler(http.server.SimpleHTTPRequestHandler):
+        # HTTP/1.1 so that clients can keep the connection alive between requests.
+        protocol_version = "HTTP/1.1"
+
         def do_GET(self):
-            self.send_response(HTTPStatus.OK)
+            status: int = HTTPStatus.OK
+            headers: Dict[str, str] = {}
+            if response_fcn is not None:
+                status, headers, text = response_fcn(self.path, dict(self.headers))
+            else:
+                text = response_text_fcn()
+            data = text.encode("utf-8")
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(data)))
             self.end_headers()
-            data = response_text_fcn().encode("utf-8")
-            self.wfile.write(data)
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client stopped reading early.
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass
 
     return Handler
 
 
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
 class ServerThread(threading.Thread):
     def __init__(self, tcp_server: socketserver.TCPServer):
         threading.Thread.__init__(self)
         self.tcp_server: socketserver.TCPServer = tcp_server
+        self.port: int = tcp_server.server_address[1]
         _alive_servers.append(self)
 
     def run(self):
@@ -60,17 +86,21 @@ def _exit_dead_servers():
 def simple_response_server_thread(
     port: int,
     response_text_fcn: StringFunctor = lambda: "Hello World!",
+    response_fcn: Optional[ResponseFunctor] = None,
 ) -> Generator[ServerThread, None, None]:
     """
+    Pass port=0 to bind any free port, which is then available as
+    server_thread.port. Pass response_fcn to control the status code and
+    headers of the response.
+
     Example:
         with simple_response_server_thread(port=53925, response_text_fcn=lambda: "this should match!!!!"):
             resp = requests.get("http://localhost:53925")
             resp.raise_for_status()
             assert resp.text == "this should match!!!!"
     """
-    handler_class = make_handler_class(response_text_fcn=response_text_fcn)
-    tcp_server: socketserver.TCPServer = socketserver.TCPServer(("", port), handler_class)
-    tcp_server.allow_reuse_address = True
+    handler_class = make_handler_class(response_text_fcn=response_text_fcn, response_fcn=response_fcn)
+    tcp_server: socketserver.TCPServer = _TCPServer(("", port), handler_class)
 
     try:
         server_thread = ServerThread(tcp_server)
@@ -0,0 +1,110 @@
+"""
+Tests the persistent bad channel registry and its backoff.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+from vidcrawler import spider
+from vidcrawler.bad_channels import (
+    BadChannelRegistry,
+    disable_bad_channel_registry,
+    enable_bad_channel_registry,
+)
+from vidcrawler.cmd import bad_channels_main
+from vidcrawler.last_results import disable_last_results, enable_last_results
+from vidcrawler.spider import crawl_video_sites
+from vidcrawler.video_info import VideoInfo
+
+HOUR = 3600.0
+NOW = 1_700_000_000.0
+CHANNELS = [("good", "youtube", "good"), ("dead", "youtube", "dead")]
+
+
+def _crawler(channel_name: str, _: str) -> List[VideoInfo]:
+    if channel_name == "dead":
+        raise ValueError("channel was removed")
+    date = "2023-11-06T00:00:00+00:00"
+    return [VideoInfo(channel_name=channel_name, title=channel_name, url=f"https://x/{channel_name}", views="1", date_published=date, date_discovered=date, date_lastupdated=date)]
+
+
+class BadChannelRegistryTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "bad_channels.db")
+
+    def tearDown(self) -> None:
+        disable_bad_channel_registry()
+        disable_last_results()
+        self.tmpdir.cleanup()
+
+    def test_exponential_backoff(self) -> None:
+        registry = BadChannelRegistry(self.path, base_delay=HOUR, max_delay=10 * HOUR, failure_threshold=1)
+        retries = [registry.record_failure("dead", "youtube", "dead", "gone", now=NOW)["retry_after"] - NOW for _ in range(6)]
+        self.assertEqual([HOUR, 2 * HOUR, 4 * HOUR, 8 * HOUR, 10 * HOUR, 10 * HOUR], retries)
+        entry = registry.get("youtube", "dead")
+        assert entry is not None
+        self.assertEqual((6, "gone"), (entry["failures"], entry["last_error"]))
+        due, backed_off = registry.split(CHANNELS, now=NOW + 9 * HOUR)
+        self.assertEqual(([CHANNELS[0]], [CHANNELS[1]]), (due, [channel for channel, _ in backed_off]))
+        self.assertEqual(CHANNELS, registry.split(CHANNELS, now=NOW + 10 * HOUR)[0])
+        registry.record_success("youtube", "dead")
+        self.assertIsNone(registry.get("youtube", "dead"))
+
+    def test_backoff_starts_after_the_failure_threshold(self) -> None:
+        registry = BadChannelRegistry(self.path, base_delay=HOUR, failure_threshold=3)
+        retries = [registry.record_failure("dead", "youtube", "dead", "gone", now=NOW)["retry_after"] - NOW for _ in range(4)]
+        self.assertEqual([0.0, 0.0, HOUR, 2 * HOUR], retries)
+
+    def test_crawl_backs_off_dead_channels(self) -> None:
+        registry = enable_bad_channel_registry(self.path, base_delay=HOUR, failure_threshold=2)
+        crawler = mock.Mock(side_effect=_crawler)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}):
+            crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0)
+            self.assertEqual(2, crawler.call_count)  # One failure is not enough to back off.
+            crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0)
+            self.assertEqual(4, crawler.call_count)
+            crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0)
+            self.assertEqual(5, crawler.call_count)  # The dead channel was skipped.
+            # Once the backoff has passed the channel is retried.
+            registry.record_failure("dead", "youtube", "dead", "gone", now=NOW)
+            crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0)
+            self.assertEqual(7, crawler.call_count)
+        entry = registry.get("youtube", "dead")
+        assert entry is not None
+        self.assertEqual(4, entry["failures"])
+
+    def test_backed_off_channels_reuse_their_last_results(self) -> None:
+        enable_bad_channel_registry(self.path, base_delay=HOUR, failure_threshold=1)
+        enable_last_results(os.path.join(self.tmpdir.name, "last_results.db"))
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": lambda name, _: _crawler("up", "")}):
+            crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0)  # The dead channel was still up.
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _crawler}), mock.patch("traceback.print_exc"):
+            crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0)
+            out = json.loads(crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0))
+        self.assertEqual([("dead", "up"), ("good", "good")], sorted((vid["channel_name"], vid["title"]) for vid in out))
+
+    def test_cli_list_and_reset(self) -> None:
+        registry = BadChannelRegistry(self.path)
+        registry.record_failure("dead", "youtube", "dead", "gone")
+        registry.record_failure("other", "rumble", "other", "gone")
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            bad_channels_main(["list", "--bad-channels", self.path, "--source", "youtube"])
+            bad_channels_main(["reset", "--bad-channels", self.path, "--channel", "dead"])
+        self.assertIn("dead", out.getvalue())
+        self.assertNotIn("other", out.getvalue().splitlines()[0])
+        self.assertIn("Reset 1 bad channels", out.getvalue())
+        self.assertEqual(["other"], [entry["channel_name"] for entry in registry.entries()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Tests that the databases default to the user's cache directory.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import unittest
+from unittest import mock
+
+import vidcrawler
+from vidcrawler.bad_channels import DB_BAD_CHANNELS
+from vidcrawler.cache_dir import ENV_CACHE_DIR, cache_path, user_cache_dir
+from vidcrawler.circuit_breaker import DB_CIRCUIT_BREAKER
+from vidcrawler.conditional_get import DB_CONDITIONAL_GET
+from vidcrawler.crawl_state import DB_CRAWL_STATE
+from vidcrawler.last_results import DB_LAST_RESULTS
+from vidcrawler.parse_cache import DB_PARSE_CACHE
+from vidcrawler.poll_schedule import DB_POLL_SCHEDULE
+
+
+class CacheDirTester(unittest.TestCase):
+    def test_databases_are_outside_the_package(self) -> None:
+        package_dir = os.path.dirname(os.path.abspath(vidcrawler.__file__))
+        for path in [DB_BAD_CHANNELS, DB_CIRCUIT_BREAKER, DB_CONDITIONAL_GET, DB_CRAWL_STATE, DB_LAST_RESULTS, DB_PARSE_CACHE, DB_POLL_SCHEDULE]:
+            self.assertFalse(os.path.abspath(path).startswith(package_dir + os.sep), path)
+
+    def test_environment_overrides(self) -> None:
+        with mock.patch.dict(os.environ, {ENV_CACHE_DIR: os.path.join("some", "dir")}):
+            self.assertEqual(os.path.abspath(os.path.join("some", "dir")), user_cache_dir())
+            self.assertEqual(os.path.abspath(os.path.join("some", "dir", "x.db")), cache_path("x.db"))
+        with mock.patch.dict(os.environ, {ENV_CACHE_DIR: ""}):
+            self.assertTrue(user_cache_dir().endswith("vidcrawler"))
+
+
+if __name__ == "__main__":
+    unittest.main()
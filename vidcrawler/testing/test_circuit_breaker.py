@@ -0,0 +1,109 @@
+"""
+Tests the per source and per host circuit breakers.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import socket
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+import requests
+
+from vidcrawler import spider
+from vidcrawler.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BreakerBoard,
+    CircuitOpenError,
+    disable_source_breakers,
+    enable_source_breakers,
+)
+from vidcrawler.fetch_html import http_get
+from vidcrawler.last_results import disable_last_results, enable_last_results
+from vidcrawler.spider import crawl_video_sites
+from vidcrawler.video_info import VideoInfo
+
+NOW = 1_700_000_000.0
+CHANNELS = [(f"c{i}", "rumble", f"c{i}") for i in range(5)]
+
+
+def _crawler(channel_name: str, _: str) -> List[VideoInfo]:
+    date = "2023-11-06T00:00:00+00:00"
+    return [VideoInfo(channel_name=channel_name, title=channel_name, url=f"https://x/{channel_name}", views="1", date_published=date, date_discovered=date, date_lastupdated=date)]
+
+
+def _down(channel_name: str, _: str) -> List[VideoInfo]:
+    raise ConnectionError(f"{channel_name}: site is down")
+
+
+class CircuitBreakerTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "breakers.db")
+
+    def tearDown(self) -> None:
+        disable_source_breakers()
+        disable_last_results()
+        self.tmpdir.cleanup()
+
+    def test_open_half_open_closed(self) -> None:
+        board = BreakerBoard(failure_threshold=2, cooldown=60)
+        board.record_failure("rumble", now=NOW)
+        self.assertTrue(board.allow("rumble", now=NOW))
+        board.record_failure("rumble", now=NOW)
+        self.assertEqual(OPEN, board.state("rumble"))
+        self.assertFalse(board.allow("rumble", now=NOW + 59))
+        self.assertTrue(board.allow("rumble", now=NOW + 60))  # The probe.
+        self.assertEqual(HALF_OPEN, board.state("rumble"))
+        self.assertFalse(board.allow("rumble", now=NOW + 61))  # Only one probe at a time.
+        board.record_failure("rumble", now=NOW + 62)
+        self.assertFalse(board.allow("rumble", now=NOW + 63))  # Failed probe, open again.
+        self.assertTrue(board.allow("rumble", now=NOW + 122))
+        board.record_success("rumble")
+        self.assertEqual(CLOSED, board.state("rumble"))
+        self.assertEqual({"rumble": 3}, board.take_skipped())
+
+    def test_state_is_persisted(self) -> None:
+        board = BreakerBoard(failure_threshold=1, cooldown=60, path=self.path)
+        board.record_failure("rumble", now=NOW)
+        reloaded = BreakerBoard(failure_threshold=1, cooldown=60, path=self.path)
+        self.assertEqual(OPEN, reloaded.state("rumble"))
+
+    def test_open_source_is_skipped_with_last_results(self) -> None:
+        results = enable_last_results(os.path.join(self.tmpdir.name, "last_results.db"))
+        board = enable_source_breakers(self.path, failure_threshold=2, cooldown=3600)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"rumble": _crawler}):
+            first = json.loads(crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0))
+        down = mock.Mock(side_effect=_down)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"rumble": down}):
+            second = json.loads(crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0))
+        self.assertEqual(2, down.call_count)
+        self.assertEqual(3, len(second))  # The channels skipped by the open circuit reuse their last results.
+        self.assertEqual(OPEN, board.state("rumble"))
+        self.assertEqual(["c4"], [vid.channel_name for vid in results.get("rumble", "c4", "c4")])
+        # A later run after the cooldown probes the source and closes the circuit.
+        board.breakers["rumble"].opened_at -= 3600
+        with mock.patch.dict(spider.CRAWLER_MAP, {"rumble": _crawler}):
+            third = json.loads(crawl_video_sites(CHANNELS, use_threads=False, parse_processes=0))
+        self.assertEqual(CLOSED, board.state("rumble"))
+        self.assertEqual(len(first), len(third))
+
+    def test_failing_host_fails_fast(self) -> None:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+        board = BreakerBoard(failure_threshold=2, cooldown=60)
+        with mock.patch("vidcrawler.fetch_html.get_host_breakers", return_value=board):
+            for _ in range(2):
+                self.assertRaises(requests.ConnectionError, http_get, url)
+            self.assertRaises(CircuitOpenError, http_get, url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Tests conditional GET against a local server that honors ETags.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import tempfile
+import unittest
+from typing import Dict, List, Tuple
+
+from vidcrawler.conditional_get import fetch_if_modified, store_if_modified
+from vidcrawler.feed_reader import disable_crawl_window, enable_crawl_window
+from vidcrawler.testing.simple_http_server import simple_response_server_thread
+
+_ETAG = '"v1"'
+
+
+class ConditionalGetTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cache_path = os.path.join(self.tmpdir.name, "conditional.db")
+        self.requests: List[Dict[str, str]] = []
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def _respond(self, path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], str]:  # pylint: disable=unused-argument
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == _ETAG:
+            return 304, {"ETag": _ETAG}, ""
+        return 200, {"ETag": _ETAG}, "<rss>feed</rss>"
+
+    def test_not_modified_returns_stored_payload(self) -> None:
+        with simple_response_server_thread(port=0, response_fcn=self._respond) as server:
+            url = f"http://localhost:{server.port}/feed"
+            first = fetch_if_modified(url, cache_path=self.cache_path)
+            self.assertIsNone(first.cached)
+            self.assertEqual("<rss>feed</rss>", first.result.html)
+            store_if_modified(url, first, [{"title": "parsed"}], cache_path=self.cache_path)
+            second = fetch_if_modified(url, cache_path=self.cache_path)
+        self.assertEqual([{"title": "parsed"}], second.cached)
+        self.assertNotIn("If-None-Match", self.requests[0])
+        self.assertEqual(_ETAG, self.requests[1]["If-None-Match"])
+
+    def test_no_validators_without_payload(self) -> None:
+        with simple_response_server_thread(port=0, response_fcn=self._respond) as server:
+            url = f"http://localhost:{server.port}/feed"
+            fetch_if_modified(url, cache_path=self.cache_path)
+            second = fetch_if_modified(url, cache_path=self.cache_path)
+        self.assertIsNone(second.cached)
+        self.assertNotIn("If-None-Match", self.requests[1])
+
+    def test_payload_of_another_crawl_window_is_not_replayed(self) -> None:
+        self.addCleanup(disable_crawl_window)
+        with simple_response_server_thread(port=0, response_fcn=self._respond) as server:
+            url = f"http://localhost:{server.port}/feed"
+            enable_crawl_window(7 * 24 * 3600)
+            first = fetch_if_modified(url, cache_path=self.cache_path)
+            self.assertIsNotNone(first.window_start)
+            store_if_modified(url, first, [{"title": "last week"}], cache_path=self.cache_path)
+            self.assertEqual([{"title": "last week"}], fetch_if_modified(url, cache_path=self.cache_path).cached)
+            enable_crawl_window(30 * 24 * 3600)
+            wider = fetch_if_modified(url, cache_path=self.cache_path)
+        self.assertIsNone(wider.cached)
+        self.assertEqual("<rss>feed</rss>", wider.result.html)
+        self.assertNotIn("If-None-Match", self.requests[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests that the crawl state lets scrapers skip videos they already resolved.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from typing import Iterator, List, Tuple
+from unittest import mock
+
+from vidcrawler import rumble
+from vidcrawler.crawl_state import (
+    channel_state,
+    disable_crawl_state,
+    enable_crawl_state,
+)
+from vidcrawler.rumble import PartialVideo, fetch_rumble_channel_today
+from vidcrawler.video_info import VideoInfo
+
+_DATE = "2023-11-06T00:00:00+00:00"
+
+
+def _partials(count: int) -> List[PartialVideo]:
+    return [PartialVideo(url=f"https://rumble.com/v{i}", title=f"t{i}", duration="1:00", videoid="", channel_url="", channel_name="chan", date=datetime(2023, 11, 6)) for i in range(count)]
+
+
+def _resolve(partial: PartialVideo) -> VideoInfo:
+    return VideoInfo(channel_name=partial.channel_name, url=partial.url, title=partial.title, views="5", date_published=_DATE, date_discovered=_DATE, date_lastupdated=_DATE)
+
+
+def _iter_resolved(partials: List[PartialVideo]) -> Iterator[Tuple[PartialVideo, VideoInfo]]:
+    return ((partial, _resolve(partial)) for partial in partials)
+
+
+class CrawlStateTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.state = enable_crawl_state(os.path.join(self.tmpdir.name, "state.db"), refresh_fraction=0.0)
+
+    def tearDown(self) -> None:
+        disable_crawl_state()
+        self.tmpdir.cleanup()
+
+    def test_known_videos_are_not_resolved_again(self) -> None:
+        with mock.patch.object(rumble, "fetch_rumble_channel_today_partial_result", return_value=_partials(3)), mock.patch.object(rumble, "iter_resolved", side_effect=_iter_resolved) as resolve:
+            first = fetch_rumble_channel_today("chan", "chan")
+            resolve.assert_called_once_with(_partials(3))
+        with mock.patch.object(rumble, "fetch_rumble_channel_today_partial_result", return_value=_partials(4)), mock.patch.object(rumble, "iter_resolved", side_effect=_iter_resolved) as resolve:
+            second = fetch_rumble_channel_today("chan", "chan")
+            resolve.assert_called_once_with([_partials(4)[3]])
+        self.assertEqual([vid.url for vid in first], [vid.url for vid in second[:3]])
+        self.assertEqual({"known": 3, "resolved": 4}, self.state.stats())
+
+    def test_refresh_keeps_discovery_date(self) -> None:
+        self.state.refresh_fraction = 1.0
+        with channel_state("rumble", "chan") as state:
+            state.store("a", VideoInfo(url="a", date_discovered="2020-01-01T00:00:00+00:00"))
+        with channel_state("rumble", "chan") as state:
+            self.assertIsNone(state.lookup("a"))
+            refreshed = VideoInfo(url="a", date_discovered=_DATE)
+            state.store("a", refreshed)
+        self.assertEqual("2020-01-01T00:00:00+00:00", refreshed.date_discovered)
+
+    def test_failed_crawl_does_not_save(self) -> None:
+        with self.assertRaises(ValueError):
+            with channel_state("rumble", "chan") as state:
+                state.store("a", VideoInfo(url="a"))
+                raise ValueError("scrape failed")
+        with channel_state("rumble", "chan") as state:
+            self.assertEqual({}, state.videos)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests the long running crawl daemon.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from typing import List
+from unittest import mock
+
+from vidcrawler import spider
+from vidcrawler.daemon import CrawlDaemon
+from vidcrawler.video_info import VideoInfo
+
+OPTIONS = {"use_threads": False, "parse_processes": 0}
+
+
+def _video(channel_name: str) -> VideoInfo:
+    date = "2023-11-06T00:00:00+00:00"
+    return VideoInfo(channel_name=channel_name, title=channel_name, url=f"https://x/{channel_name}", views="1", date_published=date, date_discovered=date, date_lastupdated=date)
+
+
+class CrawlDaemonTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.input_path = os.path.join(self.tmpdir.name, "input.json")
+        self.output_path = os.path.join(self.tmpdir.name, "out.json")
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def _write_input(self, names: List[str], mtime: float) -> None:
+        with open(self.input_path, encoding="utf-8", mode="w") as filed:
+            json.dump([[name, "youtube", name] for name in names], filed)
+        os.utime(self.input_path, (mtime, mtime))
+
+    def _read_output(self) -> List[str]:
+        with open(self.output_path, encoding="utf-8", mode="r") as filed:
+            return sorted(vid["channel_name"] for vid in json.load(filed))
+
+    def test_reloads_changed_input(self) -> None:
+        crawler = mock.Mock(side_effect=lambda name, _: [_video(name)])
+        self._write_input(["a", "b"], mtime=1000)
+        daemon = CrawlDaemon(self.input_path, self.output_path, interval=0, crawl_options=OPTIONS)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}):
+            daemon.serve(max_crawls=1, parse_processes=0)
+            self.assertEqual(["a", "b"], self._read_output())
+            self.assertFalse(daemon.reload_input())
+            self._write_input(["c"], mtime=2000)
+            self.assertTrue(daemon.input_changed())
+            daemon.serve(max_crawls=1, parse_processes=0)
+        self.assertEqual(["c"], self._read_output())
+        self.assertEqual(2, daemon.crawls)
+        self.assertFalse(os.path.exists(self.output_path + ".tmp"))
+
+    def test_invalid_first_input_keeps_previous_output(self) -> None:
+        with open(self.input_path, encoding="utf-8", mode="w") as filed:
+            filed.write('[["a", "youtube"')  # Caught mid-write.
+        with open(self.output_path, encoding="utf-8", mode="w") as filed:
+            json.dump([_video("old").to_dict()], filed)
+        crawler = mock.Mock(side_effect=lambda name, _: [_video(name)])
+        daemon = CrawlDaemon(self.input_path, self.output_path, interval=0, crawl_options=OPTIONS)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}), mock.patch("sys.stderr"):
+            daemon.serve(max_crawls=1, parse_processes=0)
+        crawler.assert_not_called()
+        self.assertEqual(0, daemon.crawls)
+        self.assertEqual(["old"], self._read_output())
+
+    def test_stop_drains_and_keeps_previous_output(self) -> None:
+        self._write_input(["a", "b", "c"], mtime=1000)
+        with open(self.output_path, encoding="utf-8", mode="w") as filed:
+            filed.write("[]")
+        daemon = CrawlDaemon(self.input_path, self.output_path, interval=3600, crawl_options=OPTIONS)
+
+        def crawler(name: str, _: str) -> List[VideoInfo]:
+            daemon.stop()  # SIGTERM while the first channel is being crawled.
+            return [_video(name)]
+
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": mock.Mock(side_effect=crawler)}) as crawlers:
+            thread = threading.Thread(target=daemon.serve, kwargs={"parse_processes": 0})
+            thread.start()
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(1, crawlers["youtube"].call_count)
+        self.assertTrue(daemon.stopped())
+        self.assertEqual(0, daemon.crawls)
+        self.assertEqual([], self._read_output())
+
+
+if __name__ == "__main__":
+    unittest.main()
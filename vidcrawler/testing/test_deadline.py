@@ -0,0 +1,149 @@
+"""
+Tests the per-channel deadlines and the cancellation of stragglers.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from typing import Any, List, Optional, Tuple
+from unittest import mock
+
+from vidcrawler import spider, ytdlp
+from vidcrawler.deadline import (
+    DeadlineExceeded,
+    bind_deadline,
+    check_deadline,
+    clamp_timeout,
+    deadline,
+    keep_partial,
+    remaining,
+)
+from vidcrawler.fetch_html import http_get
+from vidcrawler.spider import crawl_channel, crawl_video_sites
+from vidcrawler.video_info import VideoInfo
+from vidcrawler.ytdlp import _run_ytdlp
+
+
+def _video(channel_name: str, i: int = 0) -> VideoInfo:
+    date = "2023-11-06T00:00:00+00:00"
+    return VideoInfo(channel_name=channel_name, title=f"{i}", url=f"https://x/{channel_name}/{i}", views="1", date_published=date, date_discovered=date, date_lastupdated=date)
+
+
+def _slow_crawler(channel_name: str, _: str) -> List[VideoInfo]:
+    """Resolves one video every 0.1s, forever, checking the deadline like the scrapers' fetches do."""
+    out: List[VideoInfo] = []
+    with keep_partial(out):
+        for i in range(1000):
+            time.sleep(0.1)
+            check_deadline()
+            out.append(_video(channel_name, i))
+    return out
+
+
+class DeadlineTester(unittest.TestCase):
+    def test_clamp_and_nesting(self) -> None:
+        self.assertIsNone(remaining())
+        self.assertEqual(20, clamp_timeout(20))
+        with deadline(10):
+            self.assertLessEqual(clamp_timeout(20) or 0, 10)
+            with deadline(100):
+                self.assertLessEqual(remaining() or 0, 10)  # The enclosing deadline is earlier.
+            self.assertLessEqual(bind_deadline(remaining)() or 0, 10)
+        with deadline(0):
+            self.assertRaises(DeadlineExceeded, clamp_timeout, 20)
+        self.assertIsNone(remaining())
+
+    def test_stuck_subprocess_is_killed(self) -> None:
+        start = time.monotonic()
+        with deadline(0.5):
+            with self.assertRaises(DeadlineExceeded):
+                _run_ytdlp([sys.executable, "-c", "import time; time.sleep(30)"], "https://example.com/video")
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_only_per_video_ytdlp_calls_get_the_default_timeout(self) -> None:
+        timeouts: List[Optional[float]] = []
+
+        def run(cmd_list: List[str], **kwargs: Any) -> subprocess.CompletedProcess:
+            timeouts.append(kwargs["timeout"])
+            return subprocess.CompletedProcess(cmd_list, 0, stdout="abc\n", stderr="")
+
+        with mock.patch.object(ytdlp, "_yt_dlp_exe", return_value="yt-dlp"), mock.patch.object(ytdlp.subprocess, "run", side_effect=run):
+            ytdlp.fetch_videos_from_channel("https://www.youtube.com/channel/abc")
+            with self.assertWarns(UserWarning):
+                ytdlp.fetch_video_infos(["https://rumble.com/v1-video.html"])
+            with deadline(30):
+                ytdlp.fetch_videos_from_channel("https://www.youtube.com/channel/abc")
+        self.assertIsNone(timeouts[0])  # A full channel listing may take a while.
+        self.assertEqual(ytdlp.DEFAULT_TIMEOUT, timeouts[1])
+        self.assertTrue(timeouts[2] is not None and timeouts[2] <= 30)  # Unless a deadline is bound.
+
+    def test_hung_server_is_cut_off(self) -> None:
+        # Accepts connections (through the backlog) but never answers.
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(8)
+            url = f"http://127.0.0.1:{server.getsockname()[1]}/"
+            start = time.monotonic()
+            with deadline(0.5):
+                with self.assertRaises(DeadlineExceeded):
+                    http_get(url, timeout=30)
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_stalled_body_is_cut_off(self) -> None:
+        # Answers with the headers and a few bytes of the body, then goes quiet.
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(8)
+            stop = threading.Event()
+
+            def serve() -> None:
+                conn, _ = server.accept()
+                with conn:
+                    conn.recv(65536)
+                    conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\nabc")
+                    stop.wait(10)
+
+            thread = threading.Thread(target=serve, daemon=True)
+            thread.start()
+            url = f"http://127.0.0.1:{server.getsockname()[1]}/"
+            start = time.monotonic()
+            try:
+                with deadline(0.5):
+                    with self.assertRaises(DeadlineExceeded):
+                        http_get(url, timeout=30)
+            finally:
+                stop.set()
+                thread.join()
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_timed_out_channel_keeps_partial_results(self) -> None:
+        videos: List[VideoInfo] = []
+        bad_channels: List[Tuple[str, str]] = []
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _slow_crawler}):
+            crawl_channel("slow", "youtube", "slow", videos, bad_channels, channel_timeout=0.55)
+        self.assertIn(len(videos), range(3, 7))
+        self.assertEqual("slow", bad_channels[0][0])
+        self.assertIn(f"kept {len(videos)} videos", bad_channels[0][1])
+
+    def test_crawl_deadline_abandons_stragglers(self) -> None:
+        def crawler(channel_name: str, _: str) -> List[VideoInfo]:
+            if channel_name == "stuck":
+                time.sleep(3)  # Ignores its deadline.
+            return [_video(channel_name)]
+
+        channels = [("fine", "youtube", "fine"), ("stuck", "youtube", "stuck")]
+        start = time.monotonic()
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}), mock.patch.object(spider, "STRAGGLER_GRACE", 0.2):
+            out = json.loads(crawl_video_sites(channels, parse_processes=0, crawl_timeout=0.3))
+        self.assertLess(time.monotonic() - start, 2.5)
+        self.assertEqual(["fine"], [vid["channel_name"] for vid in out])
+
+
+if __name__ == "__main__":
+    unittest.main()
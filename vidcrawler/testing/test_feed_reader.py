@@ -0,0 +1,102 @@
+"""
+Tests the streaming feed reader against feedparser.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import contextlib
+import io
+import unittest
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Tuple
+from unittest import mock
+
+import feedparser  # type: ignore
+
+from vidcrawler import bitchute, feed_reader
+from vidcrawler.feed_reader import RSS, YOUTUBE, iter_feed_entries, parse_feed
+from vidcrawler.html_parser import make_soup
+from vidcrawler.testing.feed_fixtures import (
+    bitchute_feed,
+    brighteon_feed,
+    odysee_feed,
+    spreaker_feed,
+    youtube_feed,
+)
+
+# The entry fields each scraper reads.
+YOUTUBE_FIELDS = ["title", "published", "link", "summary", "yt_videoid", "media_statistics", "media_thumbnail", "author_detail"]
+RSS_FIELDS = ["title", "title_detail", "published", "link", "links", "id"]
+FEEDS: List[Tuple[Callable[..., str], str, List[str]]] = [
+    (youtube_feed, YOUTUBE, YOUTUBE_FIELDS),
+    (bitchute_feed, RSS, RSS_FIELDS + ["summary"]),
+    (brighteon_feed, RSS, RSS_FIELDS),
+    (spreaker_feed, RSS, RSS_FIELDS + ["summary", "subtitle", "itunes_duration", "image"]),
+    (odysee_feed, RSS, RSS_FIELDS + ["description"]),
+]
+WINDOW_START = datetime(2023, 11, 27, 0, 0, tzinfo=timezone.utc)  # Keeps the entries of the 30th, 29th, 28th and 27th.
+
+
+def _fields(entry: Any, fields: List[str]) -> List[Any]:
+    return [entry[field] if field != "description" else entry.description for field in fields]
+
+
+class FeedReaderTester(unittest.TestCase):
+    def test_matches_feedparser(self) -> None:
+        for make_feed, shape, fields in FEEDS:
+            with self.subTest(feed=make_feed.__name__):
+                content = make_feed(10)
+                expected = feedparser.parse(content)
+                with mock.patch.object(feed_reader.feedparser, "parse") as fallback:
+                    fast = parse_feed(content, shape)
+                fallback.assert_not_called()
+                self.assertEqual(expected.feed.link, fast.feed.link)
+                self.assertEqual([_fields(entry, fields) for entry in expected.entries], [_fields(entry, fields) for entry in fast.entries])
+
+    def test_html_descriptions_are_not_sanitized(self) -> None:
+        content = brighteon_feed(3)
+        for expected, fast in zip(feedparser.parse(content).entries, parse_feed(content, RSS).entries):
+            expected_img, fast_img = make_soup(expected.summary).img, make_soup(fast.summary).img
+            assert expected_img is not None and fast_img is not None
+            self.assertEqual(expected_img["src"], fast_img["src"])
+            self.assertEqual(make_soup(expected.summary).get_text(), make_soup(fast.summary).get_text())
+
+    def test_stops_at_the_crawl_window(self) -> None:
+        for make_feed, shape, _ in FEEDS:
+            with self.subTest(feed=make_feed.__name__):
+                entries = list(iter_feed_entries(make_feed(10), shape, after=WINDOW_START))
+                self.assertEqual(4, len(entries))
+                self.assertEqual(4, len(list(iter_feed_entries(make_feed(10), shape, after=WINDOW_START.replace(tzinfo=None)))))
+
+    def test_window_is_lazy(self) -> None:
+        content = youtube_feed(10)
+        cut = content.index("<entry>", content.index("vid00000005"))
+        broken = content[:cut] + "<entry><garbage" + content[cut:]
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertEqual(4, len(list(iter_feed_entries(broken, YOUTUBE, after=WINDOW_START))))
+        self.assertEqual("", stderr.getvalue())
+
+    def test_falls_back_to_feedparser(self) -> None:
+        content = youtube_feed(5)
+        # The third entry has no statistics, the first two were already handed out.
+        missing = content.replace('<media:statistics views="2000"/>', "")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            entries = list(iter_feed_entries(missing, YOUTUBE))
+            self.assertEqual(0, len(parse_feed("<html><body>Not found</body></html>", RSS).entries))
+        self.assertEqual([f"vid{i:08d}" for i in range(5)], [entry.yt_videoid for entry in entries])
+        self.assertIn("falling back to feedparser", stderr.getvalue())
+
+    def test_bitchute_parse_rss_feed(self) -> None:
+        content = bitchute_feed(10)
+        with mock.patch.object(feed_reader.feedparser, "parse", wraps=feedparser.parse) as slow:
+            fast = bitchute.parse_rss_feed(content)
+            self.assertEqual(0, slow.call_count)
+            with mock.patch.object(feed_reader, "_iter_fast", side_effect=feed_reader.FeedShapeError("forced")), contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(fast, bitchute.parse_rss_feed(content))
+        self.assertEqual(4, len(bitchute.parse_rss_feed(content, WINDOW_START)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests the pooled html fetcher against a local server.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import re
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from vidcrawler.fetch_html import (
+    FetchResult,
+    RegexFieldMatcher,
+    fetch_coalescing_stats,
+    fetch_html,
+    fetch_html_streaming,
+    get_session,
+)
+from vidcrawler.testing.simple_http_server import simple_response_server_thread
+
+
+class FetchHtmlTester(unittest.TestCase):
+    def test_fetch_html_returns_fetch_result(self) -> None:
+        with simple_response_server_thread(port=0, response_text_fcn=lambda: "hello") as server:
+            result = fetch_html(f"http://localhost:{server.port}")
+        self.assertIsInstance(result, FetchResult)
+        self.assertTrue(result.ok)
+        self.assertEqual("hello", result.html)
+
+    def test_connections_are_kept_alive(self) -> None:
+        # The threading server spawns one thread per accepted connection.
+        connection_threads = set()
+
+        def response() -> str:
+            connection_threads.add(threading.get_ident())
+            return "ok"
+
+        with simple_response_server_thread(port=0, response_text_fcn=response) as server:
+            for _ in range(10):
+                self.assertTrue(fetch_html(f"http://localhost:{server.port}").ok)
+        self.assertEqual(1, len(connection_threads))
+
+    def test_threads_share_the_pool(self) -> None:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            sessions = list(executor.map(lambda _: get_session(), range(16)))
+        adapters = {id(session.get_adapter("https://example.com")) for session in sessions}
+        self.assertEqual(1, len(adapters))
+
+    def test_streaming_stops_once_fields_are_found(self) -> None:
+        body = '<meta itemprop="duration" content="PT4M13S">' + "x" * 1024 * 1024
+        matcher = RegexFieldMatcher({"duration": re.compile(r'itemprop="duration" content="([^"]+)"')})
+        with simple_response_server_thread(port=0, response_text_fcn=lambda: body) as server:
+            result = fetch_html_streaming(f"http://localhost:{server.port}", matcher, chunk_size=4096)
+        self.assertEqual({"duration": "PT4M13S"}, matcher.fields)
+        self.assertLess(len(result.html), len(body) // 4)
+
+    def test_matcher_finds_fields_across_chunks(self) -> None:
+        matcher = RegexFieldMatcher({"views": re.compile(r"(\d+) views"), "duration": re.compile(r'"duration":"([\d:]+)"')})
+        self.assertFalse(matcher("junk 37"))
+        self.assertFalse(matcher("98 views and more junk"))
+        self.assertEqual({"views": "3798"}, matcher.fields)
+        self.assertTrue(matcher('"duration":"22:27"'))
+        self.assertEqual("22:27", matcher.fields["duration"])
+
+    def test_concurrent_identical_fetches_share_one_request(self) -> None:
+        requests_served = []
+        release = threading.Event()
+
+        def response() -> str:
+            requests_served.append(1)
+            release.wait(5)
+            return "slow"
+
+        before = fetch_coalescing_stats()
+        with simple_response_server_thread(port=0, response_text_fcn=response) as server:
+            url = f"http://localhost:{server.port}/coalesce"
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [executor.submit(fetch_html, url) for _ in range(8)]
+                time.sleep(0.5)
+                release.set()
+                results = [future.result() for future in futures]
+        after = fetch_coalescing_stats()
+        self.assertEqual(1, len(requests_served))
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(8, after["calls"] - before["calls"])
+        self.assertEqual(7, after["coalesced"] - before["coalesced"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests that every scraper extracts the same data with the lxml backend as with html.parser.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import unittest
+from typing import Any, Callable, Dict
+from unittest import mock
+
+from feedparser import FeedParserDict
+
+from vidcrawler import bitchute, brighteon, gabtv, html_parser, rumble, spotify, youtube
+from vidcrawler.html_parser import (
+    AUTO,
+    ENV_HTML_PARSER,
+    HTML_PARSER,
+    LXML,
+    get_html_parser,
+    lxml_available,
+    make_soup,
+    resolve_html_parser,
+    set_html_parser,
+)
+from vidcrawler.testing.html_fixtures import (
+    bitchute_channel_page,
+    brighteon_entry_summary,
+    gabtv_channel_page,
+    rumble_channel_page,
+    spotify_episode_page,
+    spotify_show_page,
+    youtube_bot_video_divs,
+    youtube_video_page,
+)
+
+
+def _brighteon_entry() -> Dict[str, Any]:
+    entry = FeedParserDict(published="2023-11-06T12:00:00+00:00", id="/abc", link="https://www.brighteon.com/abc", title="A video", summary=brighteon_entry_summary("abc"))
+    vid = brighteon.parse_entry("https://www.brighteon.com/channels/x", "x", entry).to_dict()
+    del vid["date_discovered"], vid["date_lastupdated"]
+    return vid
+
+
+SITE_PARSES: Dict[str, Callable[[], Any]] = {
+    "rumble": lambda: [partial.to_dict() for partial in rumble.parse_channel_page(rumble_channel_page(), "x", "https://rumble.com/c/x")],
+    "rumble_today": lambda: [partial.to_dict() for partial in rumble.parse_channel_page_today(rumble_channel_page(), "x", "https://rumble.com/c/x")],
+    "bitchute": lambda: bitchute.parse_channel_page(bitchute_channel_page()),
+    "gabtv": lambda: gabtv.parse_views(gabtv_channel_page(), "https://tv.gab.com/channel/x"),
+    "spotify_show": lambda: spotify.parse_episode_urls(spotify_show_page()),
+    "spotify_episode": lambda: spotify.parse_episode_meta(spotify_episode_page()),
+    "youtube_video": lambda: youtube.parse_youtube_video(youtube_video_page()),
+    "youtube_duration": lambda: youtube.parse_duration_meta(youtube_video_page()),
+    "brighteon": _brighteon_entry,
+}
+
+
+class HtmlParserTester(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict(os.environ, {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(set_html_parser, AUTO)
+
+    def test_resolve(self) -> None:
+        self.assertEqual(HTML_PARSER, resolve_html_parser(HTML_PARSER))
+        self.assertRaises(ValueError, resolve_html_parser, "html5lib")
+        with mock.patch.object(html_parser, "lxml_available", return_value=False):
+            self.assertEqual(HTML_PARSER, resolve_html_parser(AUTO))
+            self.assertEqual(HTML_PARSER, resolve_html_parser(LXML))
+        with mock.patch.object(html_parser, "lxml_available", return_value=True):
+            self.assertEqual(LXML, resolve_html_parser(AUTO))
+
+    def test_set_html_parser_reaches_the_environment(self) -> None:
+        self.assertEqual(HTML_PARSER, set_html_parser(HTML_PARSER))
+        self.assertEqual(HTML_PARSER, get_html_parser())
+        self.assertEqual(HTML_PARSER, os.environ[ENV_HTML_PARSER])
+        self.assertEqual(HTML_PARSER, make_soup("<p>x</p>").builder.NAME)
+
+    @unittest.skipUnless(lxml_available(), "lxml is not installed")
+    def test_sites_parse_the_same_with_lxml(self) -> None:
+        for site, parse in SITE_PARSES.items():
+            with self.subTest(site=site):
+                set_html_parser(HTML_PARSER)
+                expected = parse()
+                set_html_parser(LXML)
+                self.assertEqual(LXML, get_html_parser())
+                self.assertTrue(expected)
+                self.assertEqual(expected, parse())
+
+    def test_strained_listing_pages_parse_the_same(self) -> None:
+        strainers = [(rumble, "CHANNEL_PAGE_STRAINER", ["rumble", "rumble_today"]), (bitchute, "CHANNEL_PAGE_STRAINER", ["bitchute"]), (gabtv, "EPISODE_LIST_STRAINER", ["gabtv"])]
+        for backend in [HTML_PARSER] + ([LXML] if lxml_available() else []):
+            set_html_parser(backend)
+            for module, strainer, sites in strainers:
+                for site in sites:
+                    with self.subTest(backend=backend, site=site):
+                        with mock.patch.object(module, strainer, None):
+                            expected = SITE_PARSES[site]()
+                        self.assertTrue(expected)
+                        self.assertEqual(expected, SITE_PARSES[site]())
+        self.assertEqual("https://www.bitchute.com/feeds/rss/some_channel/", bitchute.parse_rss_url(bitchute_channel_page()))
+
+    @unittest.skipUnless(lxml_available(), "lxml is not installed")
+    def test_youtube_bot_parses_the_same_with_lxml(self) -> None:
+        # pylint: disable=import-outside-toplevel
+        try:
+            from vidcrawler import youtube_bot
+        except ImportError as err:
+            self.skipTest(f"youtube_bot dependencies are not installed: {err}")
+        set_html_parser(HTML_PARSER)
+        expected = youtube_bot.parse_youtube_videos(youtube_bot_video_divs())
+        set_html_parser(LXML)
+        self.assertEqual(expected, youtube_bot.parse_youtube_videos(youtube_bot_video_divs()))
+
+
+if __name__ == "__main__":
+    unittest.main()
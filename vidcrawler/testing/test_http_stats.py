@@ -0,0 +1,70 @@
+"""
+Tests the per host http timing statistics.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import tempfile
+import unittest
+
+from vidcrawler.fetch_html import _parse_curl_write_out, fetch_html
+from vidcrawler.http_stats import Histogram, HttpStats, RequestTiming, get_http_stats
+from vidcrawler.testing.simple_http_server import simple_response_server_thread
+
+
+class HttpStatsTester(unittest.TestCase):
+    def test_fetch_records_phases_for_new_connections_only(self) -> None:
+        get_http_stats().reset()
+        with simple_response_server_thread(port=0, response_text_fcn=lambda: "x" * 100) as server:
+            for _ in range(3):
+                self.assertTrue(fetch_html(f"http://localhost:{server.port}/stats").ok)
+        host = get_http_stats().summary()["hosts"]["localhost"]
+        self.assertEqual(3, host["requests"])
+        self.assertEqual(300, host["bytes"])
+        self.assertEqual({"200": 3}, host["status_codes"])
+        self.assertEqual(1, host["new_connections"])
+        self.assertEqual(1, host["phases"]["dns"]["count"])
+        self.assertEqual(1, host["phases"]["connect"]["count"])
+        self.assertEqual(0, host["phases"]["tls"]["count"])
+        self.assertEqual(3, host["phases"]["ttfb"]["count"])
+        self.assertEqual(3, host["phases"]["total"]["count"])
+
+    def test_histogram_quantiles(self) -> None:
+        hist = Histogram()
+        for value in [0.001] * 90 + [3.0] * 10:
+            hist.observe(value)
+        self.assertEqual(0.005, hist.quantile(0.5))
+        self.assertEqual(0.005, hist.quantile(0.9))
+        self.assertEqual(3.0, hist.quantile(0.99))
+        self.assertEqual(100, hist.cumulative()[-1][1])
+
+    def test_exports(self) -> None:
+        stats = HttpStats()
+        stats.record(RequestTiming(host="rumble.com", status_code=200, total=0.3, ttfb=0.2, dns=0.01, connect=0.02, tls=0.05, nbytes=1000))
+        stats.record(RequestTiming(host="rumble.com", status_code=429, total=0.1, ttfb=0.1))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            json_path = os.path.join(tmpdir, "out.http_stats.json")
+            prom_path = os.path.join(tmpdir, "vidcrawler.prom")
+            stats.write_summary_json(json_path)
+            stats.write_prometheus_textfile(prom_path)
+            with open(json_path, encoding="utf-8") as filed:
+                summary = json.load(filed)
+            with open(prom_path, encoding="utf-8") as filed:
+                prom = filed.read()
+        self.assertEqual({"200": 1, "429": 1}, summary["hosts"]["rumble.com"]["status_codes"])
+        self.assertIn('vidcrawler_http_phase_seconds_count{host="rumble.com",phase="total"} 2', prom)
+        self.assertIn('vidcrawler_http_phase_seconds_bucket{host="rumble.com",phase="tls",le="+Inf"} 1', prom)
+        self.assertIn('vidcrawler_http_responses_total{host="rumble.com",code="429"} 1', prom)
+
+    def test_parse_curl_write_out(self) -> None:
+        status_code, timings = _parse_curl_write_out("200 0.004 0.010 0.050 0.120 0.200 5120")
+        self.assertEqual(200, status_code)
+        self.assertEqual(5120, timings["nbytes"])
+        self.assertAlmostEqual(0.006, timings["phases"]["connect"])
+        self.assertAlmostEqual(0.040, timings["phases"]["tls"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests the lease based job queue used by the distributed crawl.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import List
+from unittest import mock
+
+from vidcrawler import spider
+from vidcrawler.job_queue import FAILED, PENDING, JobQueue, coordinate, run_worker
+from vidcrawler.poll_schedule import PollSchedule
+from vidcrawler.video_info import VideoInfo
+
+NOW = 1_700_000_000.0
+CHANNELS = [("a", "youtube", "a"), ("b", "youtube", "b"), ("c", "youtube", "c")]
+
+
+def _video(channel_name: str) -> VideoInfo:
+    date = "2023-11-06T00:00:00+00:00"
+    return VideoInfo(channel_name=channel_name, title=channel_name, url=f"https://x/{channel_name}", views="1", date_published=date, date_discovered=date, date_lastupdated=date)
+
+
+def _crawler(channel_name: str, _: str) -> List[VideoInfo]:
+    if channel_name == "c":
+        raise ValueError("channel is gone")
+    return [_video(channel_name)]
+
+
+class JobQueueTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "jobs.db")
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_expired_lease_is_requeued(self) -> None:
+        queue = JobQueue(self.path, lease_seconds=60)
+        queue.enqueue(CHANNELS[:1])
+        job = queue.claim("crashed", now=NOW)
+        assert job is not None
+        self.assertIsNone(queue.claim("other", now=NOW + 30))
+        self.assertTrue(queue.heartbeat(job.job_id, "crashed", now=NOW + 30))
+        self.assertIsNone(queue.claim("other", now=NOW + 60))  # The heartbeat extended the lease.
+        retry = queue.claim("other", now=NOW + 91)
+        assert retry is not None
+        self.assertEqual((job.job_id, 2), (retry.job_id, retry.attempts))
+        self.assertFalse(queue.complete(job.job_id, "crashed", [_video("a")]))
+        self.assertTrue(queue.complete(retry.job_id, "other", [_video("a")]))
+        self.assertTrue(queue.finished())
+        videos, bad_channels = queue.results()
+        self.assertEqual((["a"], []), ([vid.channel_name for vid in videos], bad_channels))
+
+    def test_gives_up_after_max_attempts(self) -> None:
+        queue = JobQueue(self.path, lease_seconds=10, max_attempts=2)
+        queue.enqueue(CHANNELS[:1])
+        self.assertIsNotNone(queue.claim("w1", now=NOW))
+        self.assertIsNotNone(queue.claim("w2", now=NOW + 11))
+        self.assertIsNone(queue.claim("w3", now=NOW + 22))
+        self.assertEqual(1, queue.counts()[FAILED])
+        self.assertEqual([("a", "lease expired, worker lost")], queue.results()[1])
+
+    def test_workers_and_coordinator(self) -> None:
+        out: List[str] = []
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _crawler}):
+            coordinator = threading.Thread(target=lambda: out.append(coordinate(CHANNELS, self.path, poll_interval=0.01)))
+            coordinator.start()
+            while not os.path.exists(self.path) or JobQueue(self.path).counts()["pending"] == 0:
+                time.sleep(0.01)  # Wait for the coordinator to queue the jobs.
+            handled = [run_worker(self.path, worker_id=f"w{i}", threads=2, poll_interval=0.01) for i in range(2)]
+            coordinator.join(timeout=10)
+        self.assertEqual(3, sum(handled))
+        self.assertEqual(["a", "b"], sorted(vid["channel_name"] for vid in json.loads(out[0])))
+        self.assertEqual([("c", "channel is gone")], JobQueue(self.path).results()[1])
+
+    def test_coordinator_reaps_and_gives_up_without_workers(self) -> None:
+        queue = JobQueue(self.path, lease_seconds=60)
+        queue.enqueue(CHANNELS[:1])
+        self.assertIsNotNone(queue.claim("crashed", now=NOW))
+        self.assertEqual(0, queue.reap_expired(now=NOW + 30))
+        self.assertEqual(1, queue.reap_expired(now=NOW + 61))
+        self.assertEqual(1, queue.counts()[PENDING])
+        with mock.patch("sys.stdout"):
+            out = coordinate(CHANNELS, self.path, poll_interval=0.01, idle_timeout=0.05)
+        self.assertEqual([], json.loads(out))
+        self.assertEqual(["a", "b", "c"], [name for name, _ in JobQueue(self.path).results()[1]])
+
+    def test_workers_share_the_crawl_deadline(self) -> None:
+        queue = JobQueue(self.path)
+        queue.enqueue(CHANNELS[:2], crawl_deadline=time.time() - 1)
+        crawler = mock.Mock(side_effect=_crawler)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}), mock.patch("sys.stdout"):
+            self.assertEqual(2, run_worker(self.path, threads=1, poll_interval=0.01))
+        crawler.assert_not_called()
+        self.assertEqual([("a", "skipped, crawl deadline reached"), ("b", "skipped, crawl deadline reached")], queue.results()[1])
+
+    def test_coordinator_follows_the_poll_schedule(self) -> None:
+        schedule = PollSchedule(os.path.join(self.tmpdir.name, "schedule.db"), min_interval=3600, max_interval=7200)
+        crawler = mock.Mock(side_effect=_crawler)
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}), mock.patch("sys.stdout"):
+            coordinator = threading.Thread(target=coordinate, args=(CHANNELS[:2], self.path), kwargs={"poll_interval": 0.01, "poll_schedule": schedule})
+            coordinator.start()
+            while not os.path.exists(self.path) or JobQueue(self.path).counts()["pending"] == 0:
+                time.sleep(0.01)
+            run_worker(self.path, threads=1, poll_interval=0.01)
+            coordinator.join(timeout=10)
+            # Nothing is due yet, the second crawl reuses the results the workers sent back.
+            again = coordinate(CHANNELS[:2], self.path, poll_interval=0.01, poll_schedule=schedule)
+        self.assertEqual(2, crawler.call_count)
+        self.assertEqual(["a", "b"], sorted(vid["channel_name"] for vid in json.loads(again)))
+
+
+if __name__ == "__main__":
+    unittest.main()
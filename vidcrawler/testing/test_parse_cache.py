@@ -0,0 +1,96 @@
+"""
+Tests the content addressed parse result cache.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+from vidcrawler import parse_pool, rumble
+from vidcrawler.parse_cache import (
+    ParseCache,
+    cached_parse,
+    disable_parse_cache,
+    enable_parse_cache,
+    get_parse_cache,
+)
+from vidcrawler.parse_pool import run_parse
+from vidcrawler.testing.html_fixtures import rumble_channel_page
+
+CALLS: List[str] = []
+
+
+@cached_parse(version=1)
+def _parse_words(html_doc: str) -> List[str]:
+    CALLS.append(html_doc)
+    return html_doc.split()
+
+
+class ParseCacheTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "parse_cache.db")
+        CALLS.clear()
+
+    def tearDown(self) -> None:
+        disable_parse_cache()
+        self.tmpdir.cleanup()
+
+    def test_identical_input_is_not_parsed_again(self) -> None:
+        self.assertEqual(["a", "b"], _parse_words("a b"))  # Disabled, parses every time.
+        enable_parse_cache(self.path)
+        for _ in range(3):
+            self.assertEqual(["a", "b"], _parse_words("a b"))
+        self.assertEqual(["c"], _parse_words("c"))
+        self.assertEqual(["a b", "a b", "c"], CALLS)
+        cache = get_parse_cache()
+        assert cache is not None
+        self.assertEqual({"test_parse_cache._parse_words": {"hits": 2, "misses": 2}}, cache.stats())
+        # A new process (or run) reads the same database.
+        enable_parse_cache(self.path)
+        _parse_words("a b")
+        self.assertEqual(3, len(CALLS))
+
+    def test_site_parser_is_keyed_by_every_argument(self) -> None:
+        enable_parse_cache(self.path)
+        html_doc = rumble_channel_page(num_videos=3)
+        first = rumble.parse_channel_page(html_doc, "x", "https://rumble.com/c/x")
+        again = rumble.parse_channel_page(html_doc, "x", "https://rumble.com/c/x")
+        self.assertEqual(first, again)
+        self.assertIsNot(first[0], again[0])  # Callers may change what they get back.
+        other = rumble.parse_channel_page(html_doc, "y", "https://rumble.com/c/y")
+        self.assertEqual(["y"] * 3, [partial.channel_name for partial in other])
+        cache = get_parse_cache()
+        assert cache is not None
+        self.assertEqual({"hits": 1, "misses": 2}, cache.stats()["rumble.parse_channel_page"])
+
+    def test_version_bump_invalidates(self) -> None:
+        enable_parse_cache(self.path)
+        _parse_words("a b")
+        bumped = cached_parse(version=2)(_parse_words.__wrapped__)  # type: ignore
+        self.assertEqual(["a", "b"], bumped("a b"))
+        self.assertEqual(2, len(CALLS))
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = ParseCache(self.path, max_bytes=4096)
+        for i in range(20):
+            cache.put(f"key{i}", os.urandom(512))
+        self.assertLessEqual(cache.size_bytes(), 4096)
+        self.assertFalse(cache.get("test", "key0")[0])
+        self.assertTrue(cache.get("test", "key19")[0])
+
+    def test_hit_skips_the_parse_pool(self) -> None:
+        enable_parse_cache(self.path)
+        _parse_words("a b")
+        pool = mock.Mock()
+        with mock.patch.object(parse_pool, "_POOL", pool):
+            self.assertEqual(["a", "b"], run_parse(_parse_words, "a b"))
+        pool.submit.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
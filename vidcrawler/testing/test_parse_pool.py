@@ -0,0 +1,59 @@
+"""
+Tests that the parse stage gives the same results in the process pool as inline.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import unittest
+from typing import Any, Callable, List, Tuple
+
+from vidcrawler import bitchute, rumble, spotify
+from vidcrawler.parse_pool import (
+    disable_parse_pool,
+    enable_parse_pool,
+    parse_pool_enabled,
+    run_parse,
+)
+from vidcrawler.testing.html_fixtures import (
+    bitchute_channel_page,
+    rumble_channel_page,
+    spotify_episode_page,
+)
+
+
+class ParsePoolTester(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        enable_parse_pool(2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        disable_parse_pool()
+
+    def test_parse_runs_in_another_process(self) -> None:
+        self.assertTrue(parse_pool_enabled())
+        self.assertNotEqual(os.getpid(), run_parse(os.getpid))
+
+    def test_pool_matches_inline(self) -> None:
+        cases: List[Tuple[Callable[..., Any], Tuple[Any, ...]]] = [
+            (rumble.parse_channel_page_today, (rumble_channel_page(10), "chan", "https://rumble.com/c/chan")),
+            (rumble.parse_channel_page, (rumble_channel_page(10), "chan", "https://rumble.com/c/chan", None)),
+            (bitchute.parse_channel_page, (bitchute_channel_page(10),)),
+            (spotify.parse_episode_meta, (spotify_episode_page("abc"),)),
+        ]
+        for fn, args in cases:
+            inline = fn(*args)
+            self.assertTrue(inline)
+            self.assertEqual(inline, run_parse(fn, *args))
+
+    def test_disabled_pool_parses_inline(self) -> None:
+        disable_parse_pool()
+        try:
+            self.assertEqual(os.getpid(), run_parse(os.getpid))
+        finally:
+            enable_parse_pool(2)
+
+
+if __name__ == "__main__":
+    unittest.main()
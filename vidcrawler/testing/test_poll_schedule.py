@@ -0,0 +1,66 @@
+"""
+Tests the adaptive per-channel polling schedule.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from typing import List
+from unittest import mock
+
+from vidcrawler import spider
+from vidcrawler.poll_schedule import POLLS_PER_UPLOAD, PollSchedule
+from vidcrawler.spider import crawl_video_sites
+from vidcrawler.video_info import VideoInfo
+
+HOUR = 3600.0
+NOW = 1_700_000_000.0
+
+
+def _videos(*hours_ago: float) -> List[VideoInfo]:
+    out = []
+    for hours in hours_ago:
+        date = datetime.fromtimestamp(NOW - hours * HOUR, tz=timezone.utc).isoformat()
+        out.append(VideoInfo(channel_name="chan", title=f"{hours}", url=f"https://x/{hours}", views="1", date_published=date, date_discovered=date, date_lastupdated=date))
+    return out
+
+
+class PollScheduleTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.schedule = PollSchedule(os.path.join(self.tmpdir.name, "schedule.db"), min_interval=HOUR, max_interval=48 * HOUR)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_interval_follows_upload_rate(self) -> None:
+        daily = self.schedule.record("youtube", "daily", _videos(1, 25, 49, 73), now=NOW)
+        hourly = self.schedule.record("youtube", "hourly", _videos(0.5, 1.5, 2.5), now=NOW)
+        monthly = self.schedule.record("youtube", "monthly", _videos(100, 800), now=NOW)
+        self.assertAlmostEqual(24 * HOUR / POLLS_PER_UPLOAD, daily)
+        self.assertEqual(HOUR, hourly)  # Floor.
+        self.assertEqual(48 * HOUR, monthly)  # Ceiling.
+
+    def test_quiet_channel_backs_off(self) -> None:
+        first = self.schedule.record("youtube", "quiet", _videos(5, 6, 7), now=NOW)
+        later = self.schedule.record("youtube", "quiet", [], now=NOW + 40 * HOUR)
+        self.assertEqual(HOUR * 5 / POLLS_PER_UPLOAD, first)
+        self.assertGreater(later, first)
+
+    def test_skipped_channels_reuse_last_results(self) -> None:
+        crawler = mock.Mock(return_value=_videos(1, 25, 49))
+        channels = [("chan", "youtube", "c1")]
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}):
+            first = json.loads(crawl_video_sites(channels, parse_processes=0, poll_schedule=self.schedule))
+            second = json.loads(crawl_video_sites(channels, parse_processes=0, poll_schedule=self.schedule))
+        self.assertEqual(1, crawler.call_count)
+        self.assertEqual(first, second)
+        self.assertFalse(self.schedule.is_due("youtube", "c1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
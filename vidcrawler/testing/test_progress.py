@@ -0,0 +1,71 @@
+"""
+Tests the live crawl progress and its status publisher.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+import requests
+
+from vidcrawler import spider
+from vidcrawler.http_stats import get_http_stats
+from vidcrawler.progress import StatusPublisher, get_crawl_progress
+from vidcrawler.spider import crawl_video_sites
+from vidcrawler.video_info import VideoInfo
+
+
+def _crawler(channel_name: str, _: str) -> List[VideoInfo]:
+    if channel_name == "broken":
+        raise ValueError("channel is gone")
+    date = "2023-11-06T00:00:00+00:00"
+    return [VideoInfo(channel_name=channel_name, title=f"{i}", url=f"https://x/{channel_name}/{i}", views="1", date_published=date, date_discovered=date, date_lastupdated=date) for i in range(3)]
+
+
+class ProgressTester(unittest.TestCase):
+    def test_counts_per_source(self) -> None:
+        channels = [("a", "youtube", "a"), ("b", "youtube", "b"), ("broken", "rumble", "broken")]
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _crawler, "rumble": _crawler}):
+            crawl_video_sites(channels, parse_processes=0)
+        snapshot = get_crawl_progress().snapshot()
+        youtube, rumble = snapshot["sources"]["youtube"], snapshot["sources"]["rumble"]
+        self.assertEqual((0, 0, 2, 6, 0), (youtube["channels_pending"], youtube["channels_running"], youtube["channels_done"], youtube["videos"], youtube["errors"]))
+        self.assertEqual((1, 0), (rumble["channels_done"], rumble["videos"]))
+        self.assertEqual(1, snapshot["totals"]["errors"])
+        self.assertEqual(6, snapshot["totals"]["videos"])
+
+    def test_skipped_channels_leave_pending(self) -> None:
+        channels = [("a", "youtube", "a"), ("b", "youtube", "b")]
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _crawler}):
+            crawl_video_sites(channels, parse_processes=0, crawl_timeout=0)
+        youtube = get_crawl_progress().snapshot()["sources"]["youtube"]
+        self.assertEqual((0, 0, 0, 2), (youtube["channels_pending"], youtube["channels_running"], youtube["channels_done"], youtube["channels_skipped"]))
+
+    def test_in_flight_requests(self) -> None:
+        stats = get_http_stats()
+        with stats.track_in_flight("https://example.com/a"), stats.track_in_flight("https://example.com/b"):
+            self.assertEqual(2, get_crawl_progress().snapshot()["requests_in_flight"]["example.com"])
+        self.assertNotIn("example.com", stats.in_flight_counts())
+
+    def test_publishes_file_and_endpoint(self) -> None:
+        get_crawl_progress().start([("a", "youtube", "a")])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "status.json")
+            publisher = StatusPublisher(path, port=0, interval=0.05).start()
+            try:
+                resp = requests.get(f"http://127.0.0.1:{publisher.port}/status", timeout=5)
+                self.assertEqual(1, resp.json()["totals"]["channels_pending"])
+                self.assertEqual(404, requests.get(f"http://127.0.0.1:{publisher.port}/other", timeout=5).status_code)
+            finally:
+                publisher.stop()
+            with open(path, encoding="utf-8", mode="r") as filed:
+                self.assertEqual(1, json.load(filed)["sources"]["youtube"]["channels_pending"])
+
+
+if __name__ == "__main__":
+    unittest.main()
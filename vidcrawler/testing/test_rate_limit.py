@@ -0,0 +1,62 @@
+"""
+Tests the per-host rate limiter.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import time
+import unittest
+from typing import Dict, List, Tuple
+
+from vidcrawler.fetch_html import fetch_html
+from vidcrawler.rate_limit import (
+    RateLimitRegistry,
+    TokenBucket,
+    get_rate_limiter,
+    parse_retry_after,
+)
+from vidcrawler.testing.simple_http_server import simple_response_server_thread
+
+
+class RateLimitTester(unittest.TestCase):
+    def test_bucket_limits_rate_after_burst(self) -> None:
+        bucket = TokenBucket(rate=20.0, burst=2.0)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        # Two tokens are free, the other four come at 20/s.
+        self.assertGreaterEqual(elapsed, 0.18)
+
+    def test_throttle_halves_rate_and_recovers(self) -> None:
+        registry = RateLimitRegistry(default_rate=8.0, default_burst=8.0)
+        url = "https://example.com/page"
+        self.assertEqual(0.0, registry.report(url, 429, "0"))
+        self.assertEqual(4.0, registry.bucket(url).rate)
+        self.assertIsNone(registry.report(url, 200))
+        self.assertGreater(registry.bucket(url).rate, 4.0)
+
+    def test_parse_retry_after(self) -> None:
+        self.assertEqual(3.0, parse_retry_after("3"))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(0.0, parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+
+    def test_fetch_retries_after_429(self) -> None:
+        statuses: List[int] = [429, 200]
+
+        def respond(path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], str]:  # pylint: disable=unused-argument
+            status = statuses.pop(0)
+            return status, {"Retry-After": "0"} if status == 429 else {}, "body"
+
+        with simple_response_server_thread(port=0, response_fcn=respond) as server:
+            url = f"http://localhost:{server.port}"
+            result = fetch_html(url)
+            self.assertTrue(result.ok)
+            self.assertEqual([], statuses)
+            bucket = get_rate_limiter().bucket(url)
+            self.assertLess(bucket.rate, bucket.base_rate)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests the on-disk response cache.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from vidcrawler.fetch_html import (
+    disable_response_cache,
+    enable_response_cache,
+    fetch_html,
+)
+from vidcrawler.response_cache import ResponseCache
+from vidcrawler.testing.simple_http_server import simple_response_server_thread
+
+
+class ResponseCacheTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "http_cache.sqlite3")
+
+    def tearDown(self) -> None:
+        disable_response_cache()
+        self.tmpdir.cleanup()
+
+    def test_ttl_per_pattern(self) -> None:
+        cache = ResponseCache(self.path, ttl_rules=[(r"/feed", 60), (r"/never", 0)], default_ttl=1)
+        cache.put("http://host/feed", 200, "feed")
+        cache.put("http://host/never", 200, "never")
+        cache.put("http://host/page", 200, "page")
+        self.assertEqual((200, "feed"), cache.get("http://host/feed"))
+        self.assertIsNone(cache.get("http://host/never"))
+        with mock.patch("time.time", return_value=time.time() + 5):
+            self.assertIsNone(cache.get("http://host/page"))
+            self.assertEqual((200, "feed"), cache.get("http://host/feed"))
+        stats = cache.stats()
+        self.assertEqual(2, stats["/feed"]["hits"])
+        self.assertEqual(1, stats["default"]["misses"])
+
+    def test_lru_eviction_past_budget(self) -> None:
+        cache = ResponseCache(self.path, ttl_rules=[])
+        for i in range(3):
+            cache.put(f"http://host/{i}", 200, os.urandom(2048).hex())
+        # Room for three entries but not four.
+        cache.max_bytes = int(cache.size_bytes() * 1.2)
+        self.assertIsNotNone(cache.get("http://host/0"))  # 0 is now the most recently used.
+        cache.put("http://host/3", 200, os.urandom(2048).hex())
+        self.assertIsNotNone(cache.get("http://host/0"))
+        self.assertIsNone(cache.get("http://host/1"))
+        self.assertLessEqual(cache.size_bytes(), cache.max_bytes)
+        self.assertGreater(cache.stats()["default"]["evictions"], 0)
+
+    def test_shared_between_instances(self) -> None:
+        ResponseCache(self.path, ttl_rules=[]).put("http://host/x", 200, "shared")
+        self.assertEqual((200, "shared"), ResponseCache(self.path, ttl_rules=[]).get("http://host/x"))
+
+    def test_fetch_html_uses_cache(self) -> None:
+        calls = []
+
+        def response() -> str:
+            calls.append(1)
+            return "body"
+
+        enable_response_cache(self.path, ttl_rules=[])
+        with simple_response_server_thread(port=0, response_text_fcn=response) as server:
+            url = f"http://localhost:{server.port}/page"
+            self.assertEqual("body", fetch_html(url).html)
+            self.assertEqual("body", fetch_html(url).html)
+        self.assertEqual(1, len(calls))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+"""
+Tests resolving rumble videos in bulk, several per yt-dlp process.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+import warnings
+from datetime import datetime
+from typing import Any, List, Tuple
+from unittest import mock
+
+from vidcrawler import rumble, spider, ytdlp
+from vidcrawler.crawl_state import disable_crawl_state, enable_crawl_state
+from vidcrawler.deadline import PartialResultError
+from vidcrawler.rate_limit import RateLimitRegistry
+from vidcrawler.rumble import PartialVideo, fetch_rumble_channel_today, resolve_many
+from vidcrawler.video_info import VideoInfo
+from vidcrawler.ytdlp import (
+    DEFAULT_MAX_PROCESSES_PER_HOST,
+    fetch_video_infos,
+    set_max_processes_per_host,
+)
+
+# Stands in for yt-dlp --dump-json: logs its run, prints one video per line, fails on "deleted" videos.
+FAKE_YTDLP = """#!{python}
+import json, sys, time
+urls = [arg for arg in sys.argv[1:] if arg.startswith("https://")]
+with open({log!r}, "a", encoding="utf-8") as log:
+    log.write(json.dumps(["start", time.time(), len(urls)]) + "\\n")
+time.sleep(0.2)
+failed = False
+for url in urls:
+    if "deleted" in url:
+        sys.stderr.write("ERROR: [Rumble] %s: Video unavailable\\n" % url)
+        failed = True
+        continue
+    slug = url.split("?")[0].rsplit("/", 1)[-1]
+    info = {{"id": "id-" + slug, "fulltitle": "title " + slug, "description": "", "timestamp": 1700000000, "view_count": 7}}
+    info.update({{"thumbnails": [{{"url": "https://i/" + slug}}], "original_url": url, "webpage_url": "https://rumble.com/" + slug}})
+    print(json.dumps(info))
+with open({log!r}, "a", encoding="utf-8") as log:
+    log.write(json.dumps(["end", time.time(), len(urls)]) + "\\n")
+sys.exit(1 if failed else 0)
+"""
+
+
+def _partials(count: int) -> List[PartialVideo]:
+    return [
+        PartialVideo(
+            url=f"https://rumble.com/v{i}-video.html?e9s=src_v1_cbl", title="", duration="1:00", videoid="", channel_url="https://rumble.com/c/chan", channel_name="chan", date=datetime(2023, 11, 6)
+        )
+        for i in range(count)
+    ]
+
+
+class RumbleResolveTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmpdir.cleanup)
+        self.log = os.path.join(self.tmpdir.name, "runs.log")
+        exe = os.path.join(self.tmpdir.name, "yt-dlp")
+        with open(exe, "w", encoding="utf-8") as file:
+            file.write(FAKE_YTDLP.format(python=sys.executable, log=self.log))
+        os.chmod(exe, os.stat(exe).st_mode | stat.S_IEXEC)
+        limiter = RateLimitRegistry()
+        limiter.configure_host("rumble.com", rate=1000.0, burst=1000.0)
+        patchers: List[Any] = [
+            mock.patch.dict(os.environ, {"PATH": self.tmpdir.name + os.pathsep + os.environ.get("PATH", "")}),
+            mock.patch.object(ytdlp, "get_rate_limiter", return_value=limiter),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(set_max_processes_per_host, DEFAULT_MAX_PROCESSES_PER_HOST)
+
+    def _runs(self) -> List[Tuple[float, float, int]]:
+        """(start, end, urls) of every yt-dlp process."""
+        starts: List[Tuple[float, int]] = []
+        ends: List[float] = []
+        with open(self.log, encoding="utf-8") as file:
+            for line in file:
+                event, when, count = json.loads(line)
+                if event == "start":
+                    starts.append((when, count))
+                else:
+                    ends.append(when)
+        return [(start, end, count) for (start, count), end in zip(sorted(starts), sorted(ends))]
+
+    def test_results_are_mapped_back_to_the_urls_asked_for(self) -> None:
+        urls = ["https://rumble.com/va-a.html?e9s=src_v1_cbl", "https://rumble.com/vb-deleted.html", "https://rumble.com/vc-c.html/"]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            infos = fetch_video_infos(urls)
+        self.assertEqual([urls[0], urls[2]], list(infos))
+        self.assertEqual("id-va-a.html", infos[urls[0]]["id"])
+        self.assertEqual(1, len(self._runs()))
+        self.assertIn("vb-deleted", str(caught[0].message))
+        with self.assertRaises(subprocess.CalledProcessError):
+            fetch_video_infos(["https://rumble.com/vd-deleted.html"])
+
+    def test_resolve_many_batches_within_the_host_limit(self) -> None:
+        set_max_processes_per_host(2)
+        partials = _partials(20)
+        vinfos = resolve_many(partials, batch_size=5)
+        self.assertEqual([partial.url for partial in partials], [vinfo.url for vinfo in vinfos])
+        self.assertEqual("https://rumble.com/embed/id-v3-video.html", vinfos[3].iframe_src)
+        runs = self._runs()
+        self.assertEqual([5, 5, 5, 5], [count for _, _, count in runs])
+        overlap = max(sum(1 for start, end, _ in runs if start <= when < end) for when, _, _ in runs)
+        self.assertEqual(2, overlap)
+
+    def test_failed_videos_are_skipped(self) -> None:
+        partials = _partials(3)
+        partials[1].url = "https://rumble.com/v1-deleted.html"
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            vinfos = resolve_many(partials)
+        self.assertEqual([partials[0].url, partials[2].url], [vinfo.url for vinfo in vinfos])
+
+    def test_unresolved_videos_are_a_channel_error(self) -> None:
+        partials = _partials(10)
+        partials[1].url = "https://rumble.com/v1-deleted.html"
+        for partial in partials[8:]:
+            partial.url = partial.url.replace("-video", "-deleted")  # A whole batch fails.
+        videos: List[VideoInfo] = []
+        bad_channels: List[Tuple[str, str]] = []
+        with mock.patch.object(rumble, "fetch_rumble_channel_today_partial_result", return_value=partials), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            with self.assertRaises(PartialResultError) as ctx:
+                fetch_rumble_channel_today("chan", "chan")
+            self.assertEqual(7, len(ctx.exception.partial))
+            with mock.patch.dict(spider.CRAWLER_MAP, {"rumble": fetch_rumble_channel_today}):
+                spider.crawl_channel("chan", "rumble", "chan", videos, bad_channels)
+        self.assertEqual(7, len(videos))
+        self.assertEqual([("chan", "yt-dlp could not resolve 3 of 10 videos, kept 7 videos")], bad_channels)
+
+    def test_timed_out_batches_are_unresolved(self) -> None:
+        partials = _partials(10)
+
+        def fetch(urls: List[str]) -> dict:
+            if partials[9].url in urls:
+                raise subprocess.TimeoutExpired("yt-dlp", 1.0)
+            return fetch_video_infos(urls)
+
+        with mock.patch.object(rumble, "fetch_video_infos", side_effect=fetch), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            vinfos = resolve_many(partials, batch_size=5)
+        self.assertEqual([partial.url for partial in partials[:5]], [vinfo.url for vinfo in vinfos])
+
+    def test_refreshed_videos_fall_back_to_what_is_known(self) -> None:
+        self.addCleanup(disable_crawl_state)
+        enable_crawl_state(os.path.join(self.tmpdir.name, "state.db"), refresh_fraction=1.0)
+        partials = _partials(3)
+        with mock.patch.object(rumble, "fetch_rumble_channel_today_partial_result", return_value=partials):
+            first = fetch_rumble_channel_today("chan", "chan")
+        # Every known video is picked for a refresh and yt-dlp now fails on all of them.
+        failing = mock.patch.object(rumble, "fetch_video_infos", side_effect=subprocess.CalledProcessError(1, "yt-dlp", stderr="gone"))
+        with mock.patch.object(rumble, "fetch_rumble_channel_today_partial_result", return_value=partials), failing, warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            second = fetch_rumble_channel_today("chan", "chan")
+        self.assertEqual([vinfo.url for vinfo in first], [vinfo.url for vinfo in second])
+        new_video = _partials(4)[3]
+        with mock.patch.object(rumble, "fetch_rumble_channel_today_partial_result", return_value=partials + [new_video]), failing, warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            with self.assertRaises(PartialResultError) as ctx:
+                fetch_rumble_channel_today("chan", "chan")
+        self.assertEqual("yt-dlp could not resolve 1 of 4 videos", str(ctx.exception))
+        self.assertEqual(3, len(ctx.exception.partial))
+
+
+if __name__ == "__main__":
+    unittest.main()
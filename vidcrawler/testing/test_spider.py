@@ -0,0 +1,145 @@
+"""
+Tests the spider using fake crawlers, no network access is needed.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import List, Tuple
+from unittest import mock
+
+from vidcrawler import spider
+from vidcrawler.ndjson_writer import read_ndjson
+from vidcrawler.scheduler import ChannelScheduler
+from vidcrawler.spider import crawl_video_sites, stream_video_sites
+from vidcrawler.video_info import VideoInfo
+
+_SLEEP = 0.2
+
+
+class _FakeCrawler:
+    """Sleeps like a slow channel and records the peak concurrency."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __call__(self, channel_name: str, channel_id: str) -> List[VideoInfo]:
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if channel_id == "bad":
+                raise ValueError("bad channel")
+            time.sleep(_SLEEP)
+            return [VideoInfo(channel_name=channel_name, title=f"{self.source}-{channel_id}", source=self.source)]
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class SpiderTester(unittest.TestCase):
+    def test_channels_of_all_sources_run_concurrently(self) -> None:
+        crawlers = {"youtube": _FakeCrawler("youtube"), "rumble": _FakeCrawler("rumble")}
+        channels = [(f"chan{i}", source, str(i)) for source in crawlers for i in range(20)]
+        with mock.patch.dict(spider.CRAWLER_MAP, crawlers):
+            start = time.time()
+            json_str = crawl_video_sites(channels, max_workers=40, max_per_source=20)
+            elapsed = time.time() - start
+        self.assertEqual(40, len(json.loads(json_str)))
+        # Serially this would take 20 * _SLEEP per source.
+        self.assertLess(elapsed, 5 * _SLEEP)
+
+    def test_connections_per_host_are_limited_during_the_crawl(self) -> None:
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _FakeCrawler("youtube")}), mock.patch.object(spider, "configure_http_pool") as configure:
+            crawl_video_sites([("chan", "youtube", "0")], max_per_host=3)
+        self.assertEqual([mock.call(3), mock.call(None)], configure.call_args_list)
+
+    def test_workers_are_shared_across_sources(self) -> None:
+        crawlers = {"youtube": _FakeCrawler("youtube"), "rumble": _FakeCrawler("rumble")}
+        channels = [(f"chan{i}", "youtube", str(i)) for i in range(16)] + [("r", "rumble", "0"), ("broken", "rumble", "bad")]
+        with mock.patch.dict(spider.CRAWLER_MAP, crawlers):
+            start = time.time()
+            json_str = crawl_video_sites(channels, max_workers=8, max_per_source=4)
+            elapsed = time.time() - start
+        self.assertEqual(17, len(json.loads(json_str)))
+        self.assertLessEqual(crawlers["youtube"].peak, 4)
+        self.assertEqual(4, crawlers["youtube"].peak)
+        # 16 youtube channels, 4 at a time, instead of 16 in a row.
+        self.assertLess(elapsed, 8 * _SLEEP)
+
+    def test_scheduler_source_limits(self) -> None:
+        crawler = _FakeCrawler("youtube")
+
+        def crawl_one(name: str, _: str, cid: str) -> None:
+            crawler(name, cid)
+
+        scheduler = ChannelScheduler(crawl_one, max_workers=8, max_per_source=4, source_limits={"youtube": 2})
+        scheduler.run([(f"chan{i}", "youtube", str(i)) for i in range(6)])
+        self.assertEqual(2, crawler.peak)
+
+    def test_duplicate_channels_are_crawled_once(self) -> None:
+        crawler = mock.Mock(side_effect=lambda name, cid: [VideoInfo(channel_name=name, title=cid, source="youtube")])
+        channels = [("first", "youtube", "same"), ("second", "youtube", "same"), ("other", "youtube", "other")]
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}):
+            out = json.loads(crawl_video_sites(channels))
+        self.assertEqual(2, crawler.call_count)
+        self.assertEqual([("first", "same"), ("other", "other"), ("second", "same")], sorted((d["channel_name"], d["title"]) for d in out))
+
+    def test_aliases_are_per_source(self) -> None:
+        def crawler(name: str, cid: str) -> List[VideoInfo]:
+            if cid == "bad":
+                raise ValueError("bad channel")
+            return [VideoInfo(channel_name=name, title=cid)]
+
+        # "X" is also the name of a youtube channel, only the rumble one has the alias "Y".
+        channels = [("X", "youtube", "yt"), ("X", "rumble", "bad"), ("Y", "rumble", "bad"), ("Z", "rumble", "r"), ("Y", "youtube", "yt2")]
+        bad_channels: List[Tuple[str, str]] = []
+        videos: List[VideoInfo] = []
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler, "rumble": crawler}):
+            spider._run_crawl(channels, videos, bad_channels, True, 4, None, 4, 0, None, None, None, None)  # pylint: disable=protected-access
+        self.assertEqual([("X", "yt"), ("Y", "yt2"), ("Z", "r")], sorted((vid.channel_name, vid.title) for vid in videos))
+        self.assertEqual([("X", "bad channel"), ("Y", "bad channel")], bad_channels)
+
+    def test_python_api_parses_inline_by_default(self) -> None:
+        # A parse pool spawns workers that import the caller's __main__, which may not be guarded.
+        with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": _FakeCrawler("youtube")}), mock.patch.object(spider, "enable_parse_pool") as enable:
+            crawl_video_sites([("chan", "youtube", "0")])
+            enable.assert_not_called()
+            crawl_video_sites([("chan", "youtube", "0")], parse_processes=None)
+            enable.assert_called_once_with(None)
+
+    def test_stream_writes_channels_as_they_complete(self) -> None:
+        release = threading.Event()
+
+        def crawler(name: str, cid: str) -> List[VideoInfo]:
+            if cid == "slow":
+                release.wait(5)
+            date = "2023-11-06T00:00:00+00:00"
+            return [VideoInfo(channel_name=name, title=cid, source="youtube", views="1", date_published=date, date_discovered=date, date_lastupdated=date)]
+
+        channels = [("fast", "youtube", "fast"), ("slow", "youtube", "slow")]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out.ndjson")
+            with mock.patch.dict(spider.CRAWLER_MAP, {"youtube": crawler}):
+                thread = threading.Thread(target=stream_video_sites, args=(channels, path), kwargs={"parse_processes": 0})
+                thread.start()
+                deadline = time.time() + 5
+                while time.time() < deadline and not (os.path.exists(path) and read_ndjson(path)):
+                    time.sleep(0.01)
+                # The fast channel is readable while the slow one is still crawling.
+                self.assertEqual(["fast"], [vid.title for vid in read_ndjson(path)])
+                release.set()
+                thread.join()
+            self.assertEqual(["fast", "slow"], sorted(vid.title for vid in read_ndjson(path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests the json fast path of the youtube watch page parser against the DOM path.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from vidcrawler import youtube
+from vidcrawler.circuit_breaker import CircuitOpenError
+from vidcrawler.testing.html_fixtures import youtube_video_page
+from vidcrawler.youtube import (
+    fetch_youtube_duration_str,
+    parse_youtube_video,
+    parse_youtube_video_dom,
+    parse_youtube_video_json,
+)
+
+DOM_FIELDS = ["date_published", "views", "profile_thumbnail", "is_live"]
+
+
+class YoutubeWatchPageTester(unittest.TestCase):
+    def test_json_matches_dom(self) -> None:
+        for live in (False, True):
+            with self.subTest(live=live):
+                html_doc = youtube_video_page(live=live)
+                fast = parse_youtube_video_json(html_doc)
+                assert fast is not None
+                dom = parse_youtube_video_dom(html_doc)
+                self.assertEqual({key: dom[key] for key in DOM_FIELDS}, {key: fast[key] for key in DOM_FIELDS})
+                self.assertEqual(("3723", "12345", str(live)), (fast["length_seconds"], fast["view_count"], fast["video_is_live"]))
+                self.assertEqual(fast, parse_youtube_video(html_doc))
+
+    def test_falls_back_to_dom(self) -> None:
+        missing = youtube_video_page().replace("ytInitialPlayerResponse", "somethingElse")
+        truncated = youtube_video_page().replace('"viewCount": "12345"}', '"viewCount": "12345"')
+        for html_doc in (missing, truncated):
+            self.assertIsNone(parse_youtube_video_json(html_doc))
+            out = parse_youtube_video(html_doc)
+            self.assertEqual(("2023-11-06T12:00:00+00:00", "12345", "?"), (out["date_published"], out["views"], out["length_seconds"]))
+
+    def test_transient_errors_do_not_cache_the_duration(self) -> None:
+        url = "https://www.youtube.com/watch?v=abc"
+        unavailable = requests.Response()
+        unavailable.status_code = 503
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, "youtube_cache.db")
+            with mock.patch.object(youtube, "fetch_html_streaming", side_effect=CircuitOpenError("www.youtube.com: circuit open")), mock.patch("sys.stdout"):
+                self.assertRaises(CircuitOpenError, fetch_youtube_duration_str, url, cache_path)
+            with mock.patch.object(youtube, "fetch_html_streaming", side_effect=requests.HTTPError("503", response=unavailable)), mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+                self.assertEqual("", fetch_youtube_duration_str(url, cache_path))
+            self.assertIsNone(youtube._try_get_cached_duration(url, cache_path))  # pylint: disable=protected-access
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,20 +17,34 @@ import time
 import traceback
 from typing import Any, List, Optional
 
-import feedparser  # type: ignore
 import requests  # type: ignore
-from bs4 import BeautifulSoup  # type: ignore
 from certifi import where
 from keyvalue_sqlite import KeyValueSqlite as KeyValueDB  # type: ignore
 
+from .circuit_breaker import CircuitOpenError
+from .conditional_get import fetch_if_modified, store_if_modified
 from .date import iso8601_duration_as_seconds, iso_fmt, now_local
+from .deadline import DeadlineExceeded, keep_partial
 from .error import log_error
-from .fetch_html import FetchResult, fetch_html
+from .feed_reader import YOUTUBE as YOUTUBE_FEED
+from .feed_reader import iter_feed_entries
+from .fetch_html import (
+    FetchResult,
+    RegexFieldMatcher,
+    fetch_html,
+    fetch_html_streaming,
+)
+from .html_parser import make_soup
+from .parse_pool import run_parse
 from .video_info import VideoInfo
 
 where()  # This is to avoid a warning from requests about SSL certs.
 
 _ENABLE_PROFILE_FETCH = False
+_PATTERN_META_DURATION = re.compile(r'<meta itemprop="duration" content="([^"]+)"')
+_PATTERN_YT_IMG_URL = re.compile(r"\"(https://yt\d[^\"]+)\"")
+_NEEDLE_INITIAL_DATA = "var ytInitialData = "
+_JSON_DECODER = json.JSONDecoder()
 
 HERE = os.path.dirname(__file__)
 DB_YOUTUBE_CACHE = os.path.join(HERE, "cache", "youtube_cache.db")
@@ -86,20 +100,27 @@ def fetch_youtube_duration_str(url: str, cache_path: Optional[str]) -> str:
             return strfdelta(cached_duration)
         return ""  # Gracefully handle error condition.
     try:
-        fetch_result: FetchResult = fetch_html(url)
+        # The duration meta tag is in the head, so stop reading once it's found.
+        matcher = RegexFieldMatcher({"duration": _PATTERN_META_DURATION})
+        fetch_result: FetchResult = fetch_html_streaming(url, matcher)
         html_doc = fetch_result.html
         assert html_doc, f"{__file__}: Could not fetch html doc from {url}"
-        soup = BeautifulSoup(html_doc, "html.parser")
-        dom = soup.find("meta", {"itemprop": "duration"})
-        assert dom, f"{__file__}: Could not find duration in html doc in {url}"
-        duration_str = dom.attrs["content"]  # type: ignore
+        duration_str = matcher.fields.get("duration")
+        if duration_str is None:
+            # Attributes in an unexpected order, fall back to the DOM.
+            duration_str = run_parse(parse_duration_meta, html_doc)
+            assert duration_str, f"{__file__}: Could not find duration in html doc in {url}"
         duration_seconds = iso8601_duration_as_seconds(duration_str)
         _set_cached_duration(url, duration_seconds, cache_path)
         out = strfdelta(duration_seconds)
         return out
+    except (DeadlineExceeded, CircuitOpenError):
+        raise  # Out of time or a host that is down is not a broken video, don't cache it as one.
     except requests.exceptions.HTTPError as e:
         sys.stderr.write(f'{__file__} Error while processing {url} for duration because "{str(e)}"\n')
-        _set_cached_duration(url, -1, cache_path)
+        status = e.response.status_code if e.response is not None else None
+        if status is None or (status < 500 and status != 429):  # Server errors and throttling pass.
+            _set_cached_duration(url, -1, cache_path)
         return ""
     except Exception as e:  # pylint: disable=broad-except
         # stack_trce = sys.exc_info()[2]
@@ -109,19 +130,31 @@ def fetch_youtube_duration_str(url: str, cache_path: Optional[str]) -> str:
         return ""
 
 
+def parse_duration_meta(html_doc: str) -> Optional[str]:
+    """Returns the iso8601 duration from the meta tags of a watch page, runs in the parse pool."""
+    soup = make_soup(html_doc)
+    dom = soup.find("meta", {"itemprop": "duration"})
+    if not dom:
+        return None
+    return str(dom.attrs["content"])  # type: ignore
+
+
 def _fetch_youtube_channel_via_rss(channel_name: str, channel_id: str) -> List[VideoInfo]:
     url = "https://www.youtube.com/feeds/videos.xml?channel_id=" + channel_id
     sys.stdout.write(f"Youtube visiting {channel_name} ({url})\n")
-    response: FetchResult = fetch_html(url)
+    cache_key = f"{channel_name}|{url}"
+    conditional = fetch_if_modified(url, key=cache_key)
+    if conditional.cached is not None:  # Not modified.
+        return VideoInfo.from_list_of_dicts(conditional.cached)
+    response: FetchResult = conditional.result
     if response.status_code != 200:
         raise OSError(f"Could not fetch {url}")
     content = response.html
     if "was not found on this server" in content:  # TODO: Make less hacky.
         raise OSError(f"Could not fetch {url}")
-    feed = feedparser.parse(content)
     output: List[VideoInfo] = []
     profile_picture = None
-    for entry in feed.entries:
+    for entry in iter_feed_entries(content, YOUTUBE_FEED, after=conditional.window_start):
         views = entry.media_statistics["views"]
         if views == "0":  # Skip views with 0 as they have not be released yet.
             continue
@@ -137,7 +170,7 @@ def _fetch_youtube_channel_via_rss(channel_name: str, channel_id: str) -> List[V
                 sys.stdout.write(f"    Error - vid_html from {entry.link} was None")
             else:
                 try:
-                    vid_info = parse_youtube_video(vid_html)
+                    vid_info = run_parse(parse_youtube_video, vid_html)
                     profile_picture = vid_info.get("profile_thumbnail", None)
                 except AttributeError as err:
                     sys.stdout.write(f"Failed to get photo from {entry.link} because {err}.\n")
@@ -159,6 +192,7 @@ def _fetch_youtube_channel_via_rss(channel_name: str, channel_id: str) -> List[V
             profile_img_src=profile_picture or "",
         )
         output.append(o)
+    store_if_modified(cache_key, conditional, VideoInfo.to_plain_list(output))
     return output
 
 
@@ -223,10 +257,13 @@ def fetch_youtube_today(
     if limit != -1:
         video_list = video_list[0:limit]
     vid: VideoInfo
-    for vid in video_list:
-        # Add in duration with per-video fetch
-        duration_time = fetch_youtube_duration_str(vid.url, cache_path)
-        vid.duration = duration_time
+    resolved: List[VideoInfo] = []
+    with keep_partial(resolved):
+        for vid in video_list:
+            # Add in duration with per-video fetch
+            duration_time = fetch_youtube_duration_str(vid.url, cache_path)
+            vid.duration = duration_time
+            resolved.append(vid)
     delta_time = start_time - time.time()
     if delta_time > 15:
         sys.stdout.write(f"WARNING, youtube scraper took {int(delta_time)} seconds to complete\n")
@@ -260,19 +297,74 @@ def _test_fetch_youtube_video_info(url: str) -> None:
     print("    Video is private: %s" % video_is_private)
 
 
+def _decode_embedded_json(html_doc: str, name: str) -> Optional[dict]:
+    """Decodes the `name = {...}` object assigned in a script of the page without building a DOM."""
+    start = html_doc.find(f"{name} = {{")
+    if start == -1:
+        return None
+    obj, _ = _JSON_DECODER.raw_decode(html_doc, start + len(name) + 3)
+    return obj
+
+
+def _find_profile_thumbnail(html_doc: str) -> Optional[str]:
+    start = html_doc.find(_NEEDLE_INITIAL_DATA)
+    if start == -1:
+        return None
+    end = html_doc.find("</script>", start)
+    for img_url in _PATTERN_YT_IMG_URL.findall(html_doc, start, end if end != -1 else len(html_doc)):
+        if "s176" in img_url:  # For some reason this appears only in the thumbnail image.
+            return img_url
+    return None
+
+
+def parse_youtube_video_json(html_doc: str) -> Optional[dict]:
+    """Extracts the watch page fields from the embedded ytInitialPlayerResponse and ytInitialData, None if they are missing."""
+    try:
+        player_response = _decode_embedded_json(html_doc, "ytInitialPlayerResponse")
+    except ValueError:
+        return None
+    if not player_response:
+        return None
+    details = player_response.get("videoDetails") or {}
+    microformat = (player_response.get("microformat") or {}).get("playerMicroformatRenderer") or {}
+    date_published = (microformat.get("liveBroadcastDetails") or {}).get("startTimestamp") or microformat.get("publishDate")
+    if not date_published or "viewCount" not in details:
+        return None
+    return {
+        "date_published": str(date_published),
+        "views": str(details["viewCount"]),
+        "profile_thumbnail": _find_profile_thumbnail(html_doc) or "?",
+        "is_live": str('"isLiveNow":true' in html_doc),
+        "length_seconds": str(details.get("lengthSeconds", "?")),
+        "view_count": str(details["viewCount"]),
+        "video_is_live": str(bool(details.get("isLive", False))),
+    }
+
+
 # Still experimental
 def parse_youtube_video(html_doc: str) -> dict:
+    """Watch page fields from the embedded json, falls back to the DOM for pages without it."""
+    out = parse_youtube_video_json(html_doc)
+    if out is not None:
+        return out
+    return parse_youtube_video_dom(html_doc)
+
+
+def parse_youtube_video_dom(html_doc: str) -> dict:
     out: dict = {
         "date_published": "?",
         "views": "?",
         "profile_thumbnail": "?",
         "is_live": "?",
+        "length_seconds": "?",
+        "view_count": "?",
+        "video_is_live": "?",
     }
     if '"isLiveNow":true' in html_doc:
         out["is_live"] = "True"
     else:
         out["is_live"] = "False"
-    top_dom = BeautifulSoup(html_doc, "html.parser")  # type: ignore
+    top_dom = make_soup(html_doc)  # type: ignore
     try:
         dom = top_dom.find("meta", {"itemprop": "startDate"})  # type: ignore
         out["date_published"] = str(dom.attrs["content"])  # type: ignore
@@ -292,7 +384,7 @@ def parse_youtube_video(html_doc: str) -> dict:
     except KeyError as ke:
         log_error(str(ke))
     all_scripts = top_dom.find_all("script")
-    needle_initial_data = "var ytInitialData = "
+    needle_initial_data = _NEEDLE_INITIAL_DATA
     # Needed for commented out code, below.
     # needle_player_response = "var ytInitialPlayerResponse = "
     for script in all_scripts:
@@ -300,7 +392,7 @@ def parse_youtube_video(html_doc: str) -> dict:
             continue
         try:
             if script.string.startswith(needle_initial_data):  # type: ignore
-                img_urls = re.findall(r"\"(https://yt\d[^\"]+)\"", script.string)  # type: ignore
+                img_urls = _PATTERN_YT_IMG_URL.findall(script.string)  # type: ignore
                 for img_url in img_urls:
                     if "s176" in img_url:  # For some reason this appears only in the thumbnail image.
                         out["profile_thumbnail"] = img_url
@@ -16,13 +16,13 @@ import warnings
 from typing import Any, Callable, Generator
 
 import requests
-from bs4 import BeautifulSoup  # type: ignore
 from open_webdriver import open_webdriver  # type: ignore
 from selenium.common.exceptions import (
     StaleElementReferenceException as StaleElementException,
 )
 from selenium.webdriver.common.by import By
 
+from vidcrawler.html_parser import make_soup
 from vidcrawler.library import VidEntry
 
 IS_GITHUB_RUNNER = os.environ.get("GITHUB_ACTIONS") == "true"
@@ -82,7 +82,7 @@ def parse_youtube_videos(div_strs: list[str]) -> list[VidEntry]:
         return []
     out: list[VidEntry] = []
     for div_str in div_strs:
-        soup = BeautifulSoup(div_str, "html.parser")
+        soup = make_soup(div_str)
         title_link = soup.find("a", id="video-title-link")
         try:
             title = title_link.get("title")
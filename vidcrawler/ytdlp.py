@@ -2,11 +2,47 @@ import json
 import re
 import shutil
 import subprocess
+import threading
 import warnings
-from typing import Any
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
 
+from vidcrawler.deadline import DeadlineExceeded, clamp_timeout, deadline_passed
+from vidcrawler.rate_limit import MAX_THROTTLE_RETRIES, get_rate_limiter
 from vidcrawler.types import ChannelId, VideoId
 
+_THROTTLED_PATTERN = re.compile(r"HTTP Error (429|503)")
+# The crawl's per-video and batch yt-dlp calls are killed after this long.
+DEFAULT_TIMEOUT = 300.0
+# yt-dlp processes running at the same time against one host, across all channel crawls.
+DEFAULT_MAX_PROCESSES_PER_HOST = 4
+
+_HOST_SLOTS_LOCK = threading.Lock()
+_HOST_SLOTS: Dict[str, threading.BoundedSemaphore] = {}
+_MAX_PROCESSES_PER_HOST = DEFAULT_MAX_PROCESSES_PER_HOST
+
+
+def set_max_processes_per_host(limit: int) -> None:
+    global _MAX_PROCESSES_PER_HOST  # pylint: disable=global-statement
+    assert limit > 0
+    with _HOST_SLOTS_LOCK:
+        _MAX_PROCESSES_PER_HOST = limit
+        _HOST_SLOTS.clear()
+
+
+def get_max_processes_per_host() -> int:
+    return _MAX_PROCESSES_PER_HOST
+
+
+def _host_slots(url: str) -> threading.BoundedSemaphore:
+    host = urlparse(url).hostname or ""
+    with _HOST_SLOTS_LOCK:
+        slots = _HOST_SLOTS.get(host)
+        if slots is None:
+            slots = threading.BoundedSemaphore(_MAX_PROCESSES_PER_HOST)
+            _HOST_SLOTS[host] = slots
+        return slots
+
 
 def _yt_dlp_exe() -> str:
     yt_exe = shutil.which("yt-dlp")
@@ -15,6 +51,58 @@ def _yt_dlp_exe() -> str:
     return yt_exe
 
 
+def _throttled_status(stderr: Optional[str]) -> Optional[int]:
+    """Returns 429/503 if yt-dlp reports the site throttled it."""
+    match = _THROTTLED_PATTERN.search(stderr or "")
+    return int(match.group(1)) if match else None
+
+
+def _run_ytdlp(cmd_list: list[str], url: str, check: bool = True, timeout: Optional[float] = None, requests: int = 1) -> subprocess.CompletedProcess:
+    """
+    Runs yt-dlp under the per-host rate limiter, retrying when the site throttles it.
+    At most get_max_processes_per_host() processes run against the host of url at
+    once, a process fetching several urls takes requests tokens from the limiter.
+    The process is killed after timeout or when the calling channel's deadline
+    passes, whichever comes first. Without either it runs until it is done.
+    """
+    slots = _host_slots(url)
+    wait = clamp_timeout(None, f"waiting to run yt-dlp on {url}")
+    if not slots.acquire(timeout=-1 if wait is None else wait):
+        raise DeadlineExceeded(f"deadline exceeded waiting to run yt-dlp on {url}")
+    try:
+        return _run_ytdlp_attempts(cmd_list, url, check, timeout, requests)
+    finally:
+        slots.release()
+
+
+def _run_ytdlp_attempts(cmd_list: list[str], url: str, check: bool, timeout: Optional[float], requests: int) -> subprocess.CompletedProcess:
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        for _ in range(requests):
+            limiter.acquire(url)
+        try:
+            completed_proc = subprocess.run(cmd_list, capture_output=True, text=True, timeout=clamp_timeout(timeout, f"running yt-dlp on {url}"), shell=False, check=check)
+        except subprocess.TimeoutExpired as err:
+            if deadline_passed():
+                raise DeadlineExceeded(f"deadline exceeded running yt-dlp on {url}") from err
+            raise
+        except subprocess.CalledProcessError as err:
+            status = _throttled_status(err.stderr)
+            if status is None:
+                raise
+            limiter.report(url, status)
+            if attempt >= MAX_THROTTLE_RETRIES:
+                raise
+            attempt += 1
+            continue
+        status = _throttled_status(completed_proc.stderr) if completed_proc.returncode != 0 else None
+        limiter.report(url, status or 200)
+        if status is None or attempt >= MAX_THROTTLE_RETRIES:
+            return completed_proc
+        attempt += 1
+
+
 def fetch_channel_info_ytdlp(video_url: str) -> dict[Any, Any]:
     """Fetch the info."""
     # yt-dlp -J "VIDEO_URL" > video_info.json
@@ -24,7 +112,7 @@ def fetch_channel_info_ytdlp(video_url: str) -> dict[Any, Any]:
         "-J",
         video_url,
     ]
-    completed_proc = subprocess.run(cmd_list, capture_output=True, text=True, shell=False, check=True)
+    completed_proc = _run_ytdlp(cmd_list, video_url)
     if completed_proc.returncode != 0:
         stderr = completed_proc.stderr
         warnings.warn(f"Failed to run yt-dlp with args: {cmd_list}, stderr: {stderr}")
@@ -48,7 +136,7 @@ def fetch_video_info(video_url: str) -> dict:
     # Add browser impersonation for Rumble to avoid HTTP 403 errors
     if "rumble.com" in video_url:
         cmd_list.extend(["--impersonate", "chrome-120"])
-    completed_proc = subprocess.run(cmd_list, capture_output=True, text=True, shell=False, check=True)
+    completed_proc = _run_ytdlp(cmd_list, video_url, timeout=DEFAULT_TIMEOUT)
     if completed_proc.returncode != 0:
         stderr = completed_proc.stderr
         warnings.warn(f"Failed to run yt-dlp with args: {cmd_list}, stderr: {stderr}")
@@ -62,6 +150,48 @@ def fetch_video_info(video_url: str) -> dict:
     return data
 
 
+def _url_key(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.hostname}{parsed.path.rstrip('/')}"
+
+
+def fetch_video_infos(video_urls: list[str]) -> dict[str, dict]:
+    """
+    Fetches the info of several videos with a single yt-dlp process, which pays
+    for the interpreter start up, the extractor imports and the impersonation set
+    up once instead of once per video. Returns the info by the url it was asked
+    for, the videos yt-dlp failed on are missing.
+    """
+    if not video_urls:
+        return {}
+    yt_exe = _yt_dlp_exe()
+    # One json document per line and video, a failing video does not stop the others.
+    cmd_list = [yt_exe, "--dump-json", "--ignore-errors"]
+    # Add browser impersonation for Rumble to avoid HTTP 403 errors
+    if any("rumble.com" in url for url in video_urls):
+        cmd_list.extend(["--impersonate", "chrome-120"])
+    cmd_list.extend(video_urls)
+    completed_proc = _run_ytdlp(cmd_list, video_urls[0], check=False, timeout=DEFAULT_TIMEOUT, requests=len(video_urls))
+    wanted = {_url_key(url): url for url in video_urls}
+    out: dict[str, dict] = {}
+    for line in completed_proc.stdout.splitlines():
+        if not line.startswith("{"):  # OSError: lines on zach's machine
+            continue
+        data = json.loads(line)
+        # original_url is the url as it was passed, webpage_url the canonical one.
+        for found in (data.get("original_url"), data.get("webpage_url")):
+            url = wanted.get(_url_key(found)) if found else None
+            if url is not None:
+                out[url] = data
+                break
+    if not out and completed_proc.returncode != 0:
+        raise subprocess.CalledProcessError(completed_proc.returncode, cmd_list, output=completed_proc.stdout, stderr=completed_proc.stderr)
+    if len(out) < len(video_urls):
+        missing = [url for url in video_urls if url not in out]
+        warnings.warn(f"yt-dlp could not resolve {len(missing)} of {len(video_urls)} videos {missing}, stderr: {completed_proc.stderr}")
+    return out
+
+
 def fetch_channel_url_ytdlp(video_url: str) -> str:
     """Fetch the info."""
     # yt-dlp -J "VIDEO_URL" > video_info.json
@@ -72,7 +202,7 @@ def fetch_channel_url_ytdlp(video_url: str) -> str:
         "channel_url",
         video_url,
     ]
-    completed_proc = subprocess.run(cmd_list, capture_output=True, text=True, timeout=10, shell=False, check=True)
+    completed_proc = _run_ytdlp(cmd_list, video_url, timeout=10)
     if completed_proc.returncode != 0:
         stderr = completed_proc.stderr
         warnings.warn(f"Failed to run yt-dlp with args: {cmd_list}, stderr: {stderr}")
@@ -107,13 +237,7 @@ def fetch_videos_from_channel(channel_url: str) -> list[VideoId]:
         cmd_list.extend(["--impersonate", "chrome-120"])
     cms_str = subprocess.list2cmdline(cmd_list)
     print(f"Running: {cms_str}")
-    completed_proc = subprocess.run(
-        cmd_list,
-        capture_output=True,
-        text=True,
-        shell=False,
-        check=False,
-    )
+    completed_proc = _run_ytdlp(cmd_list, channel_url, check=False)
     # Check if we got any output before checking return code
     stdout = completed_proc.stdout
     stderr = completed_proc.stderr